@@ -0,0 +1,111 @@
+from usage import FIELDS
+
+
+# Instance names the backends create for themselves (warm pool spares,
+# restore staging, LXC restore directories); /create refuses them
+RESERVED_PREFIXES = ("pool-", "restore-", ".")
+
+
+class BackendError(Exception):
+    pass
+
+
+# ---------------- Backend interface ---------------- #
+# Everything the bot core needs from one container host. Statuses are the
+# upper-case LXC/LXD states (RUNNING, STOPPED, ...). nic is
+# {"ip", "prefixlen", "gateway", "parent"} for the VPS's macvlan interface.
+class Backend:
+    kind = "?"
+    pristine = None  # name of the snapshot reinstalls restore, None disables
+    usage_fields = FIELDS  # what usage() reports per instance
+
+    async def resources(self):
+        # -> ({numa node: [cpu ids]}, ram GB, disk GB or None if unknown)
+        raise NotImplementedError
+
+    async def create(self, name: str, os_type: str, disk_gb: int):
+        raise NotImplementedError
+
+    async def configure(self, name: str, nic: dict, ram_gb: int, cpu: int, disk_gb: int, cpuset: str = None):
+        raise NotImplementedError
+
+    async def launch(self, name: str, os_type: str, nic: dict, ram_gb: int = 1, cpu: int = 1,
+                     disk_gb: int = 10, cpuset: str = None, resumed: bool = False):
+        # Create, configure and start; resumed=True when a restart may have
+        # interrupted an earlier attempt
+        if not (resumed and await self.exists(name)):
+            await self.create(name, os_type, disk_gb)
+        await self.configure(name, nic, ram_gb, cpu, disk_gb, cpuset)
+        if await self.status(name) != "RUNNING":
+            await self.start(name)
+
+    async def start(self, name: str):
+        raise NotImplementedError
+
+    async def stop(self, name: str, force: bool = False):
+        raise NotImplementedError
+
+    async def restart(self, name: str):
+        await self.stop(name)
+        await self.start(name)
+
+    async def status(self, name: str):
+        raise NotImplementedError
+
+    async def bulk_status(self):
+        # -> {name: status} for every instance in one call
+        raise NotImplementedError
+
+    async def exists(self, name: str):
+        raise NotImplementedError
+
+    async def exec(self, name: str, command: list, environment: dict = None):
+        # -> (exit code, stdout, stderr)
+        raise NotImplementedError
+
+    async def stream(self, name: str, command: list, environment: dict = None):
+        # -> ExecStream with the command's output as it is written
+        raise NotImplementedError
+
+    async def addresses(self, name: str):
+        # IPv4 addresses currently on eth0
+        raise NotImplementedError
+
+    async def destroy(self, name: str):
+        # Stops and deletes; a missing instance is not an error
+        raise NotImplementedError
+
+    async def snapshot(self, name: str, snapshot: str):
+        raise NotImplementedError
+
+    async def has_snapshot(self, name: str, snapshot: str):
+        raise NotImplementedError
+
+    async def restore(self, name: str, snapshot: str):
+        # Rolls back to the snapshot and starts the instance again
+        raise NotImplementedError
+
+    async def backup(self, name: str, writer):
+        # Feeds the instance to a backups.BackupWriter (from_tar or from_tree)
+        raise NotImplementedError
+
+    async def restore_backup(self, name: str, reader):
+        # Replaces the instance with a backups.BackupReader's content and
+        # leaves it stopped, so the current NIC and limits can be applied first
+        raise NotImplementedError
+
+    async def usage(self):
+        # -> {name: {"cpu": ns, "memory": bytes, "disk": bytes, "rx": bytes, "tx": bytes}} for running instances
+        raise NotImplementedError
+
+    async def events(self):
+        # Yields (name, status or None when unknown) per state change until
+        # the stream is lost, then raises BackendError
+        raise NotImplementedError
+        yield
+
+    def start_background(self):
+        pass
+
+    async def close(self):
+        pass
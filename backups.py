@@ -0,0 +1,632 @@
+import asyncio
+import ctypes
+import grp
+import hashlib
+import json
+import os
+import platform
+import pwd
+import queue
+import shutil
+import stat
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import zstandard  # without it chunks are stored deflated (.zz); both are always readable
+except ImportError:
+    zstandard = None
+
+BLOCK = 1024 * 1024  # dedupe unit: every file is cut into blocks at fixed offsets
+PIPE_BLOCKS = 8  # blocks in flight between the event loop and a backup thread
+WORKERS = 8  # backup threads; a tar-to-tar restore needs two
+GC_GRACE = 6 * 3600  # chunks younger than this survive gc, a running backup may still reference them
+SUFFIXES = {".zst": "zstd", ".zz": "zlib"}
+SUFFIX = ".zst" if zstandard else ".zz"
+ID_FORMAT = "%Y%m%d-%H%M%S"
+# ioprio_set(2) has no Python binding; syscall numbers per architecture
+IOPRIO_SET = {"x86_64": 251, "aarch64": 30}.get(platform.machine())
+IOPRIO_WHO_PROCESS, IOPRIO_CLASS_BE, IOPRIO_LOWEST = 1, 2, 7
+# Kept as TarInfo fields; every other pax header (xattrs, ...) is stored as is
+PAX_FIELDS = {"path", "linkpath", "size", "mtime", "uid", "gid", "uname", "gname"}
+
+
+class BackupError(Exception):
+    pass
+
+
+def _low_priority():
+    # Backup threads run at nice 19 and the lowest best-effort I/O priority
+    # (both per thread on Linux), so running VPS win every contended read
+    tid = threading.get_native_id()
+    try:
+        os.setpriority(os.PRIO_PROCESS, tid, 19)
+    except OSError:
+        pass
+    if IOPRIO_SET:
+        try:
+            ctypes.CDLL(None, use_errno=True).syscall(IOPRIO_SET, IOPRIO_WHO_PROCESS, tid,
+                                                     (IOPRIO_CLASS_BE << 13) | IOPRIO_LOWEST)
+        except (OSError, AttributeError):
+            pass
+
+
+executor = ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix="backup", initializer=_low_priority)
+
+
+async def in_background(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+def _discard(future):
+    # The other end of an aborted pipe fails with BrokenPipeError; nobody waits for it
+    if not future.cancelled():
+        future.exception()
+
+
+_codecs = threading.local()
+
+
+def _compress(data: bytes):
+    if not zstandard:
+        return zlib.compress(data, 6)
+    if not hasattr(_codecs, "zstd"):
+        _codecs.zstd = zstandard.ZstdCompressor(level=3)  # not thread-safe, one per thread
+    return _codecs.zstd.compress(data)
+
+
+def _decompress(blob: bytes, suffix: str):
+    if SUFFIXES[suffix] == "zlib":
+        return zlib.decompress(blob)
+    if not zstandard:
+        raise BackupError("Reading zstd chunks needs the zstandard module")
+    return zstandard.ZstdDecompressor().decompress(blob)
+
+
+def _write_atomic(path: str, data: bytes):
+    tmp = f"{path}.{threading.get_native_id()}.tmp"
+    try:
+        with open(tmp, "wb") as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class Throttle:
+    # Caps one backup's read rate; 0 = unlimited
+    def __init__(self, rate_mb: float = 0):
+        self.rate = rate_mb * 1024 * 1024
+        self.started = time.monotonic()
+        self.done = 0
+
+    def consume(self, size: int):
+        if not self.rate:
+            return
+        self.done += size
+        ahead = self.done / self.rate - (time.monotonic() - self.started)
+        if ahead > 0:
+            time.sleep(ahead)
+
+
+# ---------------- Block streams ---------------- #
+class BlockReader:
+    # File-like read() over a sequence of blocks; subclasses fetch the next
+    # block (None at the end)
+    def __init__(self):
+        self._block = b""
+        self._pos = 0
+        self._eof = False
+
+    def _next(self):
+        raise NotImplementedError
+
+    def read(self, size: int = -1):
+        parts = []
+        while size != 0:
+            if self._pos >= len(self._block):
+                block = None if self._eof else self._next()
+                if block is None:
+                    self._eof = True
+                    break
+                self._block, self._pos = block, 0
+                continue
+            end = len(self._block) if size < 0 else min(len(self._block), self._pos + size)
+            parts.append(self._block[self._pos:end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        return b"".join(parts)
+
+
+class Pipe(BlockReader):
+    # Bounded hand-off of blocks between the event loop and a backup thread.
+    # A full pipe blocks the writer, so a slow disk slows the download (and
+    # a slow upload the reads) instead of blocks piling up in memory.
+    # Either side calls abort() on failure, which unblocks the other.
+    def __init__(self, depth: int = PIPE_BLOCKS):
+        super().__init__()
+        self._queue = queue.Queue(depth)
+        self._aborted = threading.Event()
+        self._pending = bytearray()
+
+    def put(self, block):
+        # None marks the end of the stream
+        while True:
+            if self._aborted.is_set():
+                raise BrokenPipeError("backup stream aborted")
+            try:
+                self._queue.put(block, timeout=0.5)
+                return
+            except queue.Full:
+                pass
+
+    def get(self):
+        while True:
+            if self._aborted.is_set():
+                raise BrokenPipeError("backup stream aborted")
+            try:
+                return self._queue.get(timeout=0.5)
+            except queue.Empty:
+                pass
+
+    def abort(self):
+        self._aborted.set()
+
+    def _next(self):
+        return self.get()
+
+    def write(self, data: bytes):
+        # tarfile writes in small records; they leave in whole blocks
+        self._pending += data
+        if len(self._pending) >= BLOCK:
+            self.put(bytes(self._pending))
+            self._pending.clear()
+        return len(data)
+
+    def finish(self):
+        if self._pending:
+            self.put(bytes(self._pending))
+            self._pending.clear()
+        self.put(None)
+
+    async def aput(self, block):
+        await asyncio.to_thread(self.put, block)
+
+    async def aget(self):
+        return await asyncio.to_thread(self.get)
+
+
+class ChunkReader(BlockReader):
+    # One file's content, decompressed chunk by chunk from the repository
+    def __init__(self, repo, chunks: list, throttle: Throttle):
+        super().__init__()
+        self.repo = repo
+        self.throttle = throttle
+        self._chunks = iter(chunks)
+
+    def _next(self):
+        digest = next(self._chunks, (None,))[0]
+        if digest is None:
+            return None
+        data = self.repo.get(digest)
+        self.throttle.consume(len(data))
+        return data
+
+
+# ---------------- Repository ---------------- #
+# root/chunks/<ab>/<sha256>.zst  compressed blocks, shared by every backup
+# root/manifests/<key>/<id>.json.zst  one per backup: the tar entries with
+# their metadata and the chunk list of each regular file. The key names
+# whose backups these are, e.g. "<owner id>/<vps name>", so a VPS that is
+# deleted and created again for someone else never sees them.
+class Repository:
+    def __init__(self, root: str):
+        self.root = root
+
+    def _chunk_path(self, digest: str, suffix: str = SUFFIX):
+        return os.path.join(self.root, "chunks", digest[:2], digest + suffix)
+
+    def _find(self, digest: str):
+        for suffix in SUFFIXES:
+            path = self._chunk_path(digest, suffix)
+            if os.path.exists(path):
+                return path, suffix
+        return None, None
+
+    def put(self, data: bytes):
+        # -> (digest, compressed bytes written, 0 if the block was already stored)
+        digest = hashlib.sha256(data).hexdigest()
+        path, _ = self._find(digest)
+        if path:
+            try:
+                os.utime(path)  # referenced again, keep it out of a concurrent gc
+            except OSError:
+                pass
+            return digest, 0
+        blob = _compress(data)
+        path = self._chunk_path(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        _write_atomic(path, blob)
+        return digest, len(blob)
+
+    def get(self, digest: str):
+        path, suffix = self._find(digest)
+        if path is None:
+            raise BackupError(f"Chunk {digest} missing from the repository")
+        with open(path, "rb") as f:
+            return _decompress(f.read(), suffix)
+
+    def _key_dir(self, key: str):
+        return os.path.join(self.root, "manifests", key)
+
+    def _ids(self, key: str):
+        # oldest first; -> [(id, path, suffix)]
+        try:
+            files = os.listdir(self._key_dir(key))
+        except FileNotFoundError:
+            return []
+        found = []
+        for file in files:
+            stem, suffix = os.path.splitext(file)
+            if suffix in SUFFIXES and stem.endswith(".json"):
+                found.append((stem[:-len(".json")], os.path.join(self._key_dir(key), file), suffix))
+        return sorted(found)
+
+    def _read_manifest(self, path: str, suffix: str):
+        with open(path, "rb") as f:
+            return json.loads(_decompress(f.read(), suffix))
+
+    def _load(self, key: str, backup_id: str = None):
+        # backup_id=None -> the newest, None if there is no backup
+        ids = self._ids(key)
+        if backup_id is not None:
+            ids = [entry for entry in ids if entry[0] == backup_id]
+            if not ids:
+                raise BackupError(f"Backup {backup_id} of {key} not found")
+        return self._read_manifest(*ids[-1][1:]) if ids else None
+
+    def _save(self, manifest: dict):
+        os.makedirs(self._key_dir(manifest["key"]), exist_ok=True)
+        path = os.path.join(self._key_dir(manifest["key"]), f"{manifest['id']}.json{SUFFIX}")
+        _write_atomic(path, _compress(json.dumps(manifest, separators=(",", ":")).encode()))
+
+    def _age(self, key: str):
+        ids = self._ids(key)
+        return time.time() - os.stat(ids[-1][1]).st_mtime if ids else float("inf")
+
+    def _prune(self, key: str, keep: int):
+        ids = self._ids(key)
+        removed = ids[:-keep] if keep > 0 else []
+        for _, path, _ in removed:
+            os.remove(path)
+        return [backup_id for backup_id, _, _ in removed]
+
+    def _keys(self):
+        base = os.path.join(self.root, "manifests")
+        owners = os.listdir(base) if os.path.isdir(base) else ()
+        return [f"{owner}/{name}" for owner in owners for name in os.listdir(os.path.join(base, owner))]
+
+    def _expire(self, live: set, max_age: float):
+        expired = [key for key in self._keys() if key not in live and self._age(key) > max_age]
+        for key in expired:
+            shutil.rmtree(self._key_dir(key), True)
+        return expired
+
+    def _gc(self, grace: float):
+        # Mark every chunk a manifest references, sweep the rest
+        referenced = set()
+        for dirpath, _, files in os.walk(os.path.join(self.root, "manifests")):
+            for file in files:
+                stem, suffix = os.path.splitext(file)
+                if suffix in SUFFIXES and stem.endswith(".json"):
+                    for entry in self._read_manifest(os.path.join(dirpath, file), suffix)["entries"]:
+                        referenced.update(digest for digest, _ in entry.get("chunks", ()))
+        removed = freed = 0
+        cutoff = time.time() - grace
+        chunks = os.path.join(self.root, "chunks")
+        for prefix in os.listdir(chunks) if os.path.isdir(chunks) else ():
+            for file in os.scandir(os.path.join(chunks, prefix)):
+                digest, suffix = os.path.splitext(file.name)
+                st = file.stat()
+                if suffix in SUFFIXES and digest not in referenced and st.st_mtime < cutoff:
+                    os.remove(file.path)
+                    removed += 1
+                    freed += st.st_size
+        return removed, freed
+
+    async def latest(self, key: str):
+        return await in_background(self._load, key)
+
+    async def load(self, key: str, backup_id: str):
+        return await in_background(self._load, key, backup_id)
+
+    def ids(self, key: str):
+        # newest first, for autocomplete
+        return [backup_id for backup_id, _, _ in reversed(self._ids(key))]
+
+    async def age(self, key: str):
+        # seconds since the newest backup, inf without one
+        return await in_background(self._age, key)
+
+    async def prune(self, key: str, keep: int):
+        # Drops all but the newest `keep` manifests; their chunks go at the next gc
+        return await in_background(self._prune, key, keep)
+
+    async def expire(self, live: set, max_age: float):
+        # Drops every backup of keys not in `live` (deleted VPS) once their
+        # newest backup is older than max_age; their chunks go at the next gc
+        return await in_background(self._expire, live, max_age)
+
+    async def gc(self, grace: float = GC_GRACE):
+        # -> (chunks removed, bytes freed)
+        return await in_background(self._gc, grace)
+
+
+def _entry(info: tarfile.TarInfo):
+    entry = {"name": info.name, "type": info.type.decode("latin-1"), "mode": info.mode,
+             "uid": info.uid, "gid": info.gid, "uname": info.uname, "gname": info.gname,
+             "mtime": info.mtime, "size": info.size if info.isreg() else 0}
+    if info.linkname:
+        entry["linkname"] = info.linkname
+    if info.ischr() or info.isblk():
+        entry["dev"] = [info.devmajor, info.devminor]
+    pax = {k: v for k, v in info.pax_headers.items() if k not in PAX_FIELDS}
+    if pax:
+        entry["pax"] = pax
+    return entry
+
+
+def _info(entry: dict):
+    info = tarfile.TarInfo(entry["name"])
+    info.type = entry["type"].encode("latin-1")
+    info.mode, info.uid, info.gid = entry["mode"], entry["uid"], entry["gid"]
+    info.uname, info.gname = entry.get("uname", ""), entry.get("gname", "")
+    info.mtime, info.size = entry["mtime"], entry["size"]
+    info.linkname = entry.get("linkname", "")
+    if "dev" in entry:
+        info.devmajor, info.devminor = entry["dev"]
+    info.pax_headers = dict(entry.get("pax", {}))
+    return info
+
+
+def _tarinfo(st: os.stat_result, arcname: str, linkname: str, inodes: dict):
+    # tarfile.TarFile.gettarinfo from an lstat result, so nothing is looked up by path
+    mode = st.st_mode
+    if stat.S_ISREG(mode):
+        inode = (st.st_ino, st.st_dev)
+        if st.st_nlink > 1 and inode in inodes and arcname != inodes[inode]:
+            kind, linkname = tarfile.LNKTYPE, inodes[inode]
+        else:
+            kind = tarfile.REGTYPE
+            inodes[inode] = arcname
+    elif stat.S_ISDIR(mode):
+        kind = tarfile.DIRTYPE
+    elif stat.S_ISFIFO(mode):
+        kind = tarfile.FIFOTYPE
+    elif stat.S_ISLNK(mode):
+        kind = tarfile.SYMTYPE
+    elif stat.S_ISCHR(mode):
+        kind = tarfile.CHRTYPE
+    elif stat.S_ISBLK(mode):
+        kind = tarfile.BLKTYPE
+    else:
+        return None
+    info = tarfile.TarInfo(arcname)
+    info.mode, info.uid, info.gid = mode, st.st_uid, st.st_gid
+    info.size = st.st_size if kind == tarfile.REGTYPE else 0
+    info.mtime, info.type, info.linkname = st.st_mtime, kind, linkname
+    try:
+        info.uname = pwd.getpwuid(st.st_uid)[0]
+    except KeyError:
+        pass
+    try:
+        info.gname = grp.getgrgid(st.st_gid)[0]
+    except KeyError:
+        pass
+    if kind in (tarfile.CHRTYPE, tarfile.BLKTYPE):
+        info.devmajor, info.devminor = os.major(st.st_rdev), os.minor(st.st_rdev)
+    return info
+
+
+def _same_file(a: os.stat_result, b: os.stat_result):
+    return (a.st_dev, a.st_ino) == (b.st_dev, b.st_ino)
+
+
+def _listdir(dir_fd: int):
+    with os.scandir(dir_fd) as it:
+        return sorted(entry.name for entry in it)
+
+
+# ---------------- Backup Writer ---------------- #
+# Turns one VPS into a manifest, from either a tar stream (LXD export) or
+# a directory tree (LXC). Regular files are cut into BLOCK-sized blocks at
+# fixed offsets within each file, so a change only costs the blocks it
+# touches and identical files across VPS are stored once. Walking a tree,
+# files whose size, mtime and ctime match the previous backup aren't read
+# at all. Nothing is staged: blocks are hashed and stored as they stream by.
+class BackupWriter:
+    def __init__(self, repo: Repository, key: str, previous: dict = None, rate_mb: float = 0):
+        self.repo = repo
+        self.key = key
+        self.previous = {e["name"]: e for e in previous["entries"]} if previous else {}
+        self.throttle = Throttle(rate_mb)
+        self.entries = []
+        self.stats = {"files": 0, "unchanged": 0, "read": 0, "new": 0, "stored": 0}
+        self.started = time.time()
+
+    def _store(self, f, entry: dict):
+        chunks = []
+        while True:
+            block = f.read(BLOCK)
+            if not block:
+                break
+            self.throttle.consume(len(block))
+            digest, stored = self.repo.put(block)
+            chunks.append([digest, len(block)])
+            self.stats["read"] += len(block)
+            if stored:
+                self.stats["new"] += len(block)
+                self.stats["stored"] += stored
+        entry["chunks"] = chunks
+        entry["size"] = sum(size for _, size in chunks)
+
+    def _ingest_tar(self, pipe: Pipe):
+        try:
+            with tarfile.open(fileobj=pipe, mode="r|") as tar:
+                for info in tar:
+                    entry = _entry(info)
+                    if info.isreg():
+                        self.stats["files"] += 1
+                        self._store(tar.extractfile(info), entry)
+                    self.entries.append(entry)
+        except BaseException:
+            pipe.abort()
+            raise
+
+    def _ingest_tree(self, root: str, skip: tuple):
+        # Walked through directory fds and opened with O_NOFOLLOW, so root
+        # inside the container can't swap a path component for a symlink to
+        # a host file between the lstat and the read
+        inodes = {}  # hard link tracking, as tarfile does it
+        top = os.open(root, os.O_RDONLY | os.O_DIRECTORY)
+        stack = [(top, "", iter(_listdir(top)))]
+        try:
+            while stack:
+                dir_fd, rel, names = stack[-1]
+                name = next(names, None)
+                if name is None:
+                    stack.pop()
+                    os.close(dir_fd)
+                    continue
+                if not rel and name in skip:
+                    continue
+                arcname = os.path.join(rel, name)
+                try:
+                    child = self._ingest_entry(dir_fd, name, arcname, inodes)
+                except OSError:
+                    continue  # removed while walking
+                if child is not None:
+                    try:
+                        stack.append((child, arcname, iter(_listdir(child))))
+                    except OSError:
+                        os.close(child)
+        finally:
+            for dir_fd, _, _ in stack:
+                os.close(dir_fd)
+
+    def _ingest_entry(self, dir_fd: int, name: str, arcname: str, inodes: dict):
+        # -> fd of the directory to descend into, or None
+        st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+        linkname = os.readlink(name, dir_fd=dir_fd) if stat.S_ISLNK(st.st_mode) else ""
+        info = _tarinfo(st, arcname, linkname, inodes)
+        if info is None:
+            return None  # sockets
+        entry = _entry(info)
+        child = None
+        if info.isreg():
+            entry["stat"] = [st.st_size, st.st_mtime_ns, st.st_ctime_ns]
+            previous = self.previous.get(arcname)
+            if previous and previous.get("stat") == entry["stat"]:
+                entry["chunks"] = previous["chunks"]
+                self.stats["unchanged"] += 1
+            else:
+                # O_NONBLOCK so a FIFO swapped in can't hang the open
+                fd = os.open(name, os.O_RDONLY | os.O_NOFOLLOW | os.O_NONBLOCK, dir_fd=dir_fd)
+                with open(fd, "rb") as f:
+                    if not _same_file(os.fstat(fd), st):
+                        return None  # replaced since the lstat
+                    self._store(f, entry)
+            self.stats["files"] += 1
+        elif info.isdir():
+            child = os.open(name, os.O_RDONLY | os.O_DIRECTORY | os.O_NOFOLLOW, dir_fd=dir_fd)
+            if not _same_file(os.fstat(child), st):
+                os.close(child)
+                return None
+        self.entries.append(entry)
+        return child
+
+    async def from_tar(self, blocks):
+        # blocks: async iterator of bytes making up one tar stream
+        pipe = Pipe()
+        ingest = asyncio.ensure_future(in_background(self._ingest_tar, pipe))
+        try:
+            async for block in blocks:
+                await pipe.aput(block)
+            await pipe.aput(None)
+        except BaseException:
+            pipe.abort()
+            if ingest.done() and ingest.exception():
+                raise ingest.exception()  # the real failure, not the aborted pipe
+            ingest.add_done_callback(_discard)
+            raise
+        await ingest
+
+    async def from_tree(self, root: str, skip: tuple = ()):
+        # skip: names left out at the top level
+        await in_background(self._ingest_tree, root, skip)
+
+    async def save(self, backend: str):
+        stats = dict(self.stats, entries=len(self.entries), seconds=round(time.time() - self.started, 1))
+        manifest = {"id": time.strftime(ID_FORMAT, time.gmtime(self.started)), "key": self.key,
+                    "backend": backend, "created": self.started, "stats": stats, "entries": self.entries}
+        await in_background(self.repo._save, manifest)
+        return manifest
+
+
+# ---------------- Backup Reader ---------------- #
+# Replays a manifest as a tar stream, one chunk in memory at a time; the
+# backend either uploads it (LXD import) or extracts it (LXC).
+class BackupReader:
+    def __init__(self, repo: Repository, manifest: dict, rate_mb: float = 0):
+        self.repo = repo
+        self.manifest = manifest
+        self.throttle = Throttle(rate_mb)
+
+    def _write_tar(self, pipe: Pipe):
+        try:
+            with tarfile.open(fileobj=pipe, mode="w|", format=tarfile.PAX_FORMAT) as tar:
+                for entry in self.manifest["entries"]:
+                    info = _info(entry)
+                    tar.addfile(info, ChunkReader(self.repo, entry["chunks"], self.throttle) if info.isreg() else None)
+            pipe.finish()
+        except BaseException:
+            pipe.abort()
+            raise
+
+    def _extract(self, pipe: Pipe, path: str):
+        try:
+            with tarfile.open(fileobj=pipe, mode="r|") as tar:
+                if hasattr(tarfile, "fully_trusted_filter"):
+                    tar.extraction_filter = tarfile.fully_trusted_filter  # device nodes, absolute symlinks
+                tar.extractall(path, numeric_owner=True)
+        except BaseException:
+            pipe.abort()
+            raise
+
+    async def tar_blocks(self):
+        pipe = Pipe()
+        writer = asyncio.ensure_future(in_background(self._write_tar, pipe))
+        try:
+            while (block := await pipe.aget()) is not None:
+                yield block
+        except BaseException:
+            pipe.abort()
+            if writer.done() and writer.exception():
+                raise writer.exception()
+            writer.add_done_callback(_discard)
+            raise
+        await writer
+
+    async def extract(self, path: str):
+        pipe = Pipe()
+        await asyncio.gather(in_background(self._write_tar, pipe), in_background(self._extract, pipe, path))
@@ -0,0 +1,664 @@
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+import aiohttp
+from aiohttp import web
+
+import jobs as jobs_module
+import vpsdb
+from ipam import build_ipam
+from lxd import LXDClient, LXDError, route_of
+from telemetry import registry, span
+from usage import percentile
+
+# Measured on a production host, multiplied by --scale
+LATENCY = {
+    "api": 0.005,      # one LXD REST round trip
+    "info": 0.02,      # lxc-info / lxc-ls
+    "config": 0.01,    # profile and config updates
+    "exec": 0.15,      # lxc exec / lxc-attach of a short command
+    "launch": 4.0,     # create from a cached image / clone a template
+    "download": 30.0,  # lxc-create -t download
+    "boot": 3.0,       # start until init reports running and eth0 is up
+    "start": 1.0,
+    "stop": 1.5,
+    "restart": 2.5,
+    "delete": 1.0,
+    "snapshot": 0.5,
+    "restore": 1.5,
+    "discord": 0.08,   # one Discord REST call
+}
+SUBNETS = [{"cidr": "10.200.0.0/16", "gateway": "10.200.0.1"}]
+# Two LXD hosts of different size for the cluster target, each on its own segment
+CLUSTER_HOSTS = {
+    "big": {"threads": 64, "ram_gb": 512, "subnets": [{"cidr": "10.201.0.0/16", "gateway": "10.201.0.1"}]},
+    "small": {"threads": 16, "ram_gb": 64, "subnets": [{"cidr": "10.202.0.0/16", "gateway": "10.202.0.1"}]},
+}
+SCRATCH = tempfile.mkdtemp(prefix="vps-bench-")
+CALL_KINDS = ("lxd", "subprocess", "discord", "db")
+
+# core.py opens its registry and job DB at import, keep both in the scratch directory
+_real_open_db = vpsdb.open_db
+_db_ids = itertools.count()
+vpsdb.open_db = lambda path, import_from=None: _real_open_db(os.path.join(SCRATCH, f"vps-{next(_db_ids)}.db"))
+
+
+class ScratchJobQueue(jobs_module.JobQueue):
+    def __init__(self, path: str, workers: dict, *args):
+        super().__init__(os.path.join(SCRATCH, f"jobs-{uuid.uuid4().hex[:8]}.db"), workers, *args)
+
+
+jobs_module.JobQueue = ScratchJobQueue
+
+
+# ---------------- Fake backend ---------------- #
+class Backend:
+    def __init__(self, scale: float):
+        self.scale = scale
+        self.instances = {}  # name -> {"status", "ip", "started", "snapshots"}
+
+    async def delay(self, kind: str):
+        await asyncio.sleep(LATENCY[kind] * self.scale)
+
+    def booted(self, inst):
+        return inst["status"] == "RUNNING" and time.monotonic() - inst["started"] >= LATENCY["boot"] * self.scale
+
+    def add(self, name: str, ip: str = None, running: bool = False):
+        self.instances[name] = {"status": "STOPPED", "ip": ip, "started": 0.0, "snapshots": []}
+        if running:
+            self.start(name)
+
+    def start(self, name: str):
+        inst = self.instances[name]
+        if inst["status"] == "RUNNING":
+            raise ValueError("The instance is already running")
+        inst["status"], inst["started"] = "RUNNING", time.monotonic()
+
+    def stop(self, name: str):
+        inst = self.instances[name]
+        if inst["status"] != "RUNNING":
+            raise ValueError("The instance is already stopped")
+        inst["status"] = "STOPPED"
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+    async def json(self, content_type=None):
+        return self.data
+
+    async def read(self):
+        return self.data
+
+
+class FakeLXDSession:
+    # Stands in for the aiohttp session of LXDClient, so the real client code
+    # (and its spans) runs against a simulated daemon
+    closed = False
+
+    def __init__(self, backend: Backend, threads: int = 64, ram_gb: int = 512):
+        self.backend = backend
+        self.threads = threads
+        self.ram_gb = ram_gb
+        self.down = False  # True: every request fails like an unreachable daemon
+        self.profiles = set()
+        self.ops = {}
+
+    @contextlib.asynccontextmanager
+    async def request(self, method: str, url: str, json=None, params=None, **kwargs):
+        if self.down:
+            raise aiohttp.ClientConnectionError("Cannot connect to host (simulated outage)")
+        await self.backend.delay("api")
+        path = "/1.0" + url.split("/1.0", 1)[1]
+        yield FakeResponse(await self.handle(method, path, json or {}, params or {}))
+
+    def get(self, url: str):
+        return self.request("GET", url)
+
+    def sync(self, meta):
+        return {"type": "sync", "status": "Success", "metadata": meta}
+
+    def missing(self):
+        return {"type": "error", "error": "not found", "error_code": 404}
+
+    def op(self, kind: str, fn=lambda: None):
+        op_id = uuid.uuid4().hex
+        self.ops[op_id] = (kind, fn)
+        return {"type": "async", "operation": f"/1.0/operations/{op_id}"}
+
+    async def wait(self, op_id: str):
+        kind, fn = self.ops.pop(op_id)
+        await self.backend.delay(kind)
+        try:
+            return self.sync({"status": "Success", "metadata": fn()})
+        except ValueError as e:
+            return self.sync({"status": "Failure", "err": str(e)})
+
+    async def handle(self, method: str, path: str, body: dict, params: dict):
+        b = self.backend
+        route = f"{method} {route_of(path)}"
+        parts = path.split("/")
+        name = parts[3] if len(parts) > 3 else None
+        inst = b.instances.get(name) if "/instances/" in path else None
+        if route == "GET /1.0/operations/{id}/wait":
+            return await self.wait(name)
+        if route == "GET /1.0/resources":
+            threads = [{"id": i, "numa_node": i // 32} for i in range(self.threads)]
+            return self.sync({"cpu": {"sockets": [{"cores": [{"threads": [t]} for t in threads]}]},
+                              "memory": {"total": self.ram_gb * 1024 ** 3}})
+        if route == "GET /1.0/storage-pools/{id}/resources":
+            return self.sync({"space": {"total": 10 * 1024 ** 4}})
+        if route == "GET /1.0/profiles/{id}":
+            return self.sync({}) if name in self.profiles else self.missing()
+        if route == "POST /1.0/profiles":
+            self.profiles.add(body["name"])
+            return self.sync({})
+        if route == "GET /1.0/instances":
+            return self.sync([{"name": n, "status": i["status"].capitalize(), "state": {}} for n, i in b.instances.items()])
+        if route == "POST /1.0/instances":
+            ip = body["devices"]["eth0"]["ipv4.address"].split("/")[0]
+            return self.op("launch", lambda: b.add(body["name"], ip, body.get("start", False)))
+        if inst is None:
+            return self.missing()
+        if route == "GET /1.0/instances/{id}":
+            return self.sync({"name": name, "status": inst["status"].capitalize()})
+        if route == "PATCH /1.0/instances/{id}":
+            return self.sync({})
+        if route == "POST /1.0/instances/{id}":
+            return self.op("config", lambda: b.instances.__setitem__(body["name"], b.instances.pop(name)))
+        if route == "DELETE /1.0/instances/{id}":
+            return self.op("delete", lambda: b.instances.pop(name))
+        if route == "PUT /1.0/instances/{id}":
+            return self.op("restore")
+        if route == "GET /1.0/instances/{id}/state":
+            addresses = [{"address": inst["ip"]}] if b.booted(inst) else []
+            return self.sync({"status": inst["status"].capitalize(), "network": {"eth0": {"addresses": addresses}}})
+        if route == "PUT /1.0/instances/{id}/state":
+            action = body["action"]
+            fn = {"start": lambda: b.start(name), "stop": lambda: b.stop(name),
+                  "restart": lambda: (b.stop(name), b.start(name))}[action]
+            return self.op(action, fn)
+        if route == "POST /1.0/instances/{id}/exec":
+            init_check = "systemctl" in body["command"][-1]
+            code = 1 if inst["status"] != "RUNNING" or (init_check and not b.booted(inst)) else 0
+            return self.op("exec", lambda: {"return": code, "output": {}})
+        if route == "GET /1.0/instances/{id}/snapshots/{id}":
+            return self.sync({}) if parts[-1] in inst["snapshots"] else self.missing()
+        if route == "POST /1.0/instances/{id}/snapshots":
+            return self.op("snapshot", lambda: inst["snapshots"].append(body["name"]))
+        return self.missing()
+
+
+class FakeLXC:
+    # Replaces LXCBackend.run, answering lxc-* commands like the real tools do;
+    # the backend runs with bindings=False so every call goes through it
+    def __init__(self, backend: Backend, lxc_path: str):
+        self.backend = backend
+        self.lxc_path = lxc_path
+
+    def _write_config(self, name: str):
+        os.makedirs(os.path.join(self.lxc_path, name), exist_ok=True)
+        with open(os.path.join(self.lxc_path, name, "config"), "w") as f:
+            f.write(f"lxc.uts.name = {name}\nlxc.rootfs.path = dir:{self.lxc_path}/{name}/rootfs\n")
+
+    def _ip(self, name: str):
+        with open(os.path.join(self.lxc_path, name, "config")) as f:
+            for line in f:
+                if line.startswith("lxc.net.0.ipv4 ="):
+                    return line.split("=", 1)[1].strip().split("/")[0]
+        return None
+
+    async def run(self, *args):
+        with span("subprocess", args[0]):
+            return await self._run(*args)
+
+    async def _run(self, cmd, *args):
+        b = self.backend
+        name = args[args.index("-n") + 1] if "-n" in args else None
+        inst = b.instances.get(name)
+        if cmd == "lxc-ls":
+            await b.delay("info")
+            if "-1" in args:
+                return 0, "\n".join(b.instances), ""
+            return 0, "\n".join(["NAME STATE"] + [f"{n} {i['status']}" for n, i in b.instances.items()]), ""
+        if cmd in ("lxc-create", "lxc-copy"):
+            await b.delay("download" if cmd == "lxc-create" else "launch")
+            new = args[args.index("-N") + 1] if cmd == "lxc-copy" else name
+            b.add(new)
+            self._write_config(new)
+            return 0, "", ""
+        if inst is None:
+            await b.delay("info")
+            return 1, "", f"{name} doesn't exist"
+        if cmd == "lxc-info":
+            await b.delay("info")
+            if "-sH" in args:
+                return 0, inst["status"], ""
+            if "-iH" in args:
+                return 0, inst["ip"] if b.booted(inst) else "", ""
+            return 0, f"Name: {name}\nState: {inst['status']}", ""
+        if cmd == "lxc-start":
+            await b.delay("start")
+            inst["ip"] = self._ip(name)
+            try:
+                b.start(name)
+            except ValueError as e:
+                return 1, "", str(e)
+            return 0, "", ""
+        if cmd == "lxc-stop":
+            await b.delay("stop")
+            try:
+                b.stop(name)
+            except ValueError as e:
+                return 2, "", str(e)
+            return 0, "", ""
+        if cmd == "lxc-destroy":
+            await b.delay("delete")
+            b.instances.pop(name)
+            return 0, "", ""
+        if cmd == "lxc-attach":
+            await b.delay("exec")
+            init_check = "systemctl" in args[-1]
+            return (1 if inst["status"] != "RUNNING" or (init_check and not b.booted(inst)) else 0), "", ""
+        if cmd == "lxc-snapshot":
+            if "-L" in args:
+                await b.delay("info")
+                return 0, "\n".join(f"{s} (/var/lib/lxc/{name}/snaps) 2024:01:01 00:00:00" for s in inst["snapshots"]), ""
+            if "-r" in args:
+                await b.delay("restore")
+                return 0, "", ""
+            await b.delay("snapshot")
+            inst["snapshots"].append(f"snap{len(inst['snapshots'])}")
+            return 0, "", ""
+        return 127, "", f"{cmd}: not simulated"
+
+
+# ---------------- Fake Discord ---------------- #
+class FakeDiscord:
+    def __init__(self, backend: Backend):
+        self.backend = backend
+        self.ids = itertools.count(10 ** 17)
+
+    async def call(self, route: str):
+        with span("discord", route):
+            await self.backend.delay("discord")
+
+
+class FakeMessage:
+    def __init__(self, discord, route: str):
+        self.discord = discord
+        self.route = route
+        self.id = next(discord.ids)
+
+    async def edit(self, **kwargs):
+        await self.discord.call(f"PATCH {self.route}")
+        return self
+
+    async def delete(self):
+        await self.discord.call(f"DELETE {self.route}")
+
+
+class FakeInteractionResponse:
+    def __init__(self, discord):
+        self.discord = discord
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def _callback(self):
+        if self._done:
+            raise RuntimeError("This interaction has already been responded to before")
+        self._done = True
+        await self.discord.call("POST /interactions/{interaction_id}/{interaction_token}/callback")
+
+    async def send_message(self, content=None, **kwargs):
+        await self._callback()
+
+    async def defer(self, **kwargs):
+        await self._callback()
+
+    async def send_modal(self, modal):
+        await self._callback()
+
+    async def edit_message(self, **kwargs):
+        await self._callback()
+
+
+class FakeFollowup:
+    def __init__(self, discord):
+        self.discord = discord
+
+    async def send(self, content=None, wait: bool = False, **kwargs):
+        await self.discord.call("POST /webhooks/{webhook_id}/{webhook_token}")
+        return FakeMessage(self.discord, "/webhooks/{webhook_id}/{webhook_token}/messages/{message_id}")
+
+
+class FakeInteraction:
+    def __init__(self, discord, user_id: int, channel_id: int = 1):
+        self.id = next(discord.ids)
+        self.user = SimpleNamespace(id=user_id, mention=f"<@{user_id}>")
+        self.channel_id = channel_id
+        self.response = FakeInteractionResponse(discord)
+        self.followup = FakeFollowup(discord)
+        self.message = FakeMessage(discord, "/channels/{channel_id}/messages/{message_id}")
+        self.discord = discord
+
+    async def edit_original_response(self, **kwargs):
+        await self.discord.call("PATCH /webhooks/{webhook_id}/{webhook_token}/messages/@original")
+
+
+class FakeUser:
+    def __init__(self, discord, user_id: int):
+        self.discord = discord
+        self.id = user_id
+
+    async def create_dm(self):
+        await self.discord.call("POST /users/@me/channels")
+        return self
+
+    async def send(self, **kwargs):
+        await self.discord.call("POST /channels/{channel_id}/messages")
+
+
+# ---------------- Targets ---------------- #
+async def fake_resources():
+    # The same host the LXD simulation reports: 64 threads on 2 NUMA nodes, 512GB RAM, 10TB disk
+    return {0: list(range(32)), 1: list(range(32, 64))}, 512, 10240
+
+
+async def start_core(nodes, discord: FakeDiscord):
+    import core
+    core.setup(nodes)
+    core.db.start()
+    await core.cluster.discover()
+    core.jobs.start(resume=False)
+    core.bot.get_user = lambda user_id: FakeUser(discord, user_id)
+    return core
+
+
+async def setup_bot(backend: Backend, discord: FakeDiscord):
+    import bot
+    nodes = bot.nodes()
+    for node in nodes:
+        node.backend.lxd._session = FakeLXDSession(backend)
+        node.ipam = build_ipam(SUBNETS, default_parent=bot.MACVLAN_NETWORK)
+    return await start_core(nodes, discord)
+
+
+async def setup_v2(backend: Backend, discord: FakeDiscord):
+    import v2
+    v2.LXC_PATH = os.path.join(SCRATCH, "lxc")
+    v2.USE_LIBLXC = False
+    nodes = v2.nodes()
+    for node in nodes:
+        node.backend.run = FakeLXC(backend, v2.LXC_PATH).run
+        node.backend.resources = fake_resources
+        node.ipam = build_ipam(SUBNETS, default_parent=v2.MACVLAN_LINK)
+    return await start_core(nodes, discord)
+
+
+async def setup_cluster(backend: Backend, discord: FakeDiscord):
+    # bot.py with two LXD hosts, each its own simulated daemon and instances
+    import bot
+    nodes = []
+    for host, spec in CLUSTER_HOSTS.items():
+        node = bot.make_node(host, {"socket": f"/run/bench-{host}.socket", "subnets": spec["subnets"]})
+        sim = backend if not nodes else Backend(backend.scale)
+        node.backend.lxd._session = FakeLXDSession(sim, spec["threads"], spec["ram_gb"])
+        nodes.append(node)
+    return await start_core(nodes, discord)
+
+
+TARGETS = {"bot": setup_bot, "v2": setup_v2, "cluster": setup_cluster}
+
+
+# ---------------- Scenarios ---------------- #
+def call_counts():
+    return {key: h[-1] for key, h in registry.histograms.items()}
+
+
+async def measure(calls):
+    # Every call starts at once, like that many users pressing enter together
+    latencies, errors = [], 0
+
+    async def timed(fn):
+        nonlocal errors
+        began = time.monotonic()
+        try:
+            await fn()
+        except Exception as e:
+            errors += 1
+            print(f"⚠️ {type(e).__name__}: {e}", file=sys.stderr)
+        latencies.append(time.monotonic() - began)
+
+    before = call_counts()
+    began = time.monotonic()
+    await asyncio.gather(*(timed(fn) for fn in calls))
+    wall = time.monotonic() - began
+    calls_made = {kind: {} for kind in CALL_KINDS}
+    for (kind, name), count in call_counts().items():
+        delta = count - before.get((kind, name), 0)
+        if kind in calls_made and delta:
+            calls_made[kind][name] = delta
+    return {
+        "ops": len(latencies), "errors": errors, "seconds": round(wall, 3),
+        "throughput": round(len(latencies) / wall, 2) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "totals": {kind: sum(calls_made[kind].values()) for kind in CALL_KINDS},
+        "calls": calls_made,
+    }
+
+
+def scenarios(target, discord: FakeDiscord, users: int, creates: int):
+    # Rate limits are left out, the numbers are for the handlers themselves
+    user_ids = [1000 + i for i in range(users)]
+    names = [f"bench{i}" for i in range(creates)]
+    owners = {name: user_ids[i % users] for i, name in enumerate(names)}
+    first = {owner: name for name, owner in reversed(list(owners.items()))}
+
+    def create(name):
+        interaction = FakeInteraction(discord, target.OWNER_ID)
+        owner = SimpleNamespace(id=owners[name], mention=f"<@{owners[name]}>")
+        return lambda: target.create_vps.callback(interaction, name, "bench-pass", owner)
+
+    def manage(user_id):
+        return lambda: target.manage.callback(FakeInteraction(discord, user_id), first[user_id])
+
+    def list_vps(user_id):
+        return lambda: target.list_vps.callback(FakeInteraction(discord, user_id))
+
+    def restart(user_id):
+        async def press():
+            vps = target.db.get(first[user_id])
+            view = target.ManageView(first[user_id], vps["ip"], user_id)
+            await view.restart.callback(FakeInteraction(discord, user_id))
+        return press
+
+    return [
+        ("create", [create(name) for name in names]),
+        ("manage", [manage(u) for u in user_ids if u in first]),
+        ("list", [list_vps(u) for u in user_ids]),
+        ("restart", [restart(u) for u in user_ids if u in first]),
+    ]
+
+
+async def cluster_checks(target):
+    # Placement, routing and fan-out with one host down -> {check: True or what went wrong}
+    sims = {node.name: node.backend.lxd._session for node in target.cluster}
+    records = target.db.items()
+    hosts = {vps["host"] for _, vps in records}
+    checks = {"placement": hosts == set(sims) or f"only placed on {sorted(hosts)}"}
+    misrouted = [name for name, vps in records
+                 if target.node_of(name).name != vps["host"] or name not in sims[vps["host"]].backend.instances]
+    checks["routing"] = not misrouted or f"misrouted: {misrouted[:5]}"
+
+    # Power actions reach the host the record names and no other
+    name, vps = next((n, v) for n, v in records if v["host"] == "small")
+    await target.power_vps(name, "stop")
+    stopped = sims["small"].backend.instances[name]["status"] == "STOPPED"
+    checks["power routing"] = stopped or f"{name} still running on its host"
+    await target.power_vps(name, "start")
+
+    sims["small"].down = True
+    try:
+        gathered = await target.cluster.gather(lambda node: node.backend.bulk_status())
+        checks["gather, host down"] = (isinstance(gathered["small"], Exception)
+                                       and isinstance(gathered["big"], dict)) or f"got {gathered}"
+        statuses = await target.fetch_statuses()
+        on_big = {n for n, v in records if v["host"] == "big"}
+        checks["collect, host down"] = set(statuses) == on_big or f"{len(statuses)} of {len(on_big)} statuses"
+    finally:
+        sims["small"].down = False
+    return checks
+
+
+async def client_checks():
+    # LXDClient end to end against a fake daemon on a real unix socket:
+    # sync and async responses, exec output logs, error and timeout mapping
+    deleted = []
+
+    def sync(meta):
+        return web.json_response({"type": "sync", "status": "Success", "metadata": meta})
+
+    async def instance(request):
+        name = request.match_info["name"]
+        if name == "slow":
+            await asyncio.sleep(2)
+        if name not in ("web1", "slow"):
+            return web.json_response({"type": "error", "error": "not found", "error_code": 404}, status=404)
+        return sync({"name": name, "status": "Running"})
+
+    def operation(op: str):
+        async def handler(request):
+            return web.json_response({"type": "async", "operation": f"/1.0/operations/{op}"})
+        return handler
+
+    async def wait(request):
+        if request.match_info["op"] == "fail":
+            return sync({"status": "Failure", "err": "boom"})
+        if request.match_info["op"] == "long":
+            await asyncio.sleep(1)  # longer than the impatient client's session timeout
+            return sync({"status": "Success", "metadata": {}})
+        logs = {"1": "/1.0/instances/web1/logs/exec.stdout", "2": "/1.0/instances/web1/logs/exec.stderr"}
+        return sync({"status": "Success", "metadata": {"return": 3, "output": logs}})
+
+    async def log(request):
+        if request.method == "DELETE":
+            deleted.append(request.match_info["file"])
+            return sync({})
+        return web.Response(body=b"hello\n" if request.match_info["file"].endswith("stdout") else b"warn\n")
+
+    app = web.Application()
+    app.router.add_get("/1.0/instances/{name}", instance)
+    app.router.add_post("/1.0/instances/web1/exec", operation("exec"))
+    app.router.add_put("/1.0/instances/web1/state", operation("fail"))
+    app.router.add_put("/1.0/instances/slow/state", operation("long"))
+    app.router.add_get("/1.0/operations/{op}/wait", wait)
+    app.router.add_route("*", "/1.0/instances/web1/logs/{file}", log)
+
+    socket = os.path.join(SCRATCH, "lxd.socket")
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.UnixSite(runner, socket).start()
+    client, impatient = LXDClient(socket), LXDClient(socket, timeout=0.5)
+    checks = {}
+
+    async def check(name, coro, expect):
+        try:
+            result = await coro
+        except Exception as e:
+            result = e
+        checks[name] = expect(result) or f"got {result!r}"
+
+    try:
+        await check("client request", client.status("web1"), lambda r: r == "RUNNING")
+        await check("client 404", client.exists("nope"), lambda r: r is False)
+        await check("client error", client.instance("nope"), lambda r: isinstance(r, LXDError) and r.code == 404)
+        await check("client exec", client.exec("web1", ["true"]), lambda r: r == (3, "hello", "warn"))
+        checks["client exec logs"] = sorted(deleted) == ["exec.stderr", "exec.stdout"] or f"deleted {deleted}"
+        await check("client operation failure", client.change_state("web1", "start"),
+                    lambda r: isinstance(r, LXDError) and str(r) == "boom")
+        await check("client timeout", impatient.status("slow"), lambda r: isinstance(r, LXDError))
+        await check("client long operation", impatient.change_state("slow", "start"),
+                    lambda r: isinstance(r, dict) and r.get("status") == "Success")
+    finally:
+        await client.close()
+        await impatient.close()
+        await runner.cleanup()
+    return checks
+
+
+async def bench_target(name: str, args):
+    backend = Backend(args.scale)
+    discord = FakeDiscord(backend)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(sys.stdout if args.verbose else devnull):
+        target = await TARGETS[name](backend, discord)
+        results = {}
+        for scenario, calls in scenarios(target, discord, args.users, args.creates):
+            results[scenario] = await measure(calls)
+        checks = await cluster_checks(target) if name == "cluster" else {}
+        if name == "bot":
+            checks = await client_checks()
+    for scenario, r in results.items():
+        print(f"📊 {name} {scenario}: {r['ops']} ops in {r['seconds']}s ({r['throughput']}/s), "
+              f"p50 {r['p50_ms']}ms p99 {r['p99_ms']}ms, {r['errors']} errors, calls {r['totals']}")
+    for check, outcome in checks.items():
+        print(f"{'✅' if outcome is True else '❌'} {name} {check}" + ("" if outcome is True else f": {outcome}"))
+    if checks:
+        results["checks"] = checks
+    return results
+
+
+def git_revision():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+async def main(args):
+    report = {
+        "revision": git_revision(), "timestamp": round(time.time()), "python": platform.python_version(),
+        "scale": args.scale, "users": args.users, "creates": args.creates, "latency": LATENCY, "results": {},
+    }
+    if args.target != "all":
+        report["results"][args.target] = await bench_target(args.target, args)
+    else:
+        # Both entry points share core.py's bot and singletons, so each runs in its own process
+        for name in TARGETS:
+            out = os.path.join(SCRATCH, f"{name}.json")
+            argv = [sys.executable, os.path.abspath(__file__), "--target", name, "--out", out,
+                    "--users", str(args.users), "--creates", str(args.creates), "--scale", str(args.scale)]
+            subprocess.run(argv + (["--verbose"] if args.verbose else []), check=True)
+            with open(out) as f:
+                report["results"][name] = json.load(f)["results"][name]
+    with open(args.out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="bench.py", description="Benchmark bot.py and v2.py against simulated LXD/LXC and Discord")
+    parser.add_argument("--target", choices=[*TARGETS, "all"], default="all")
+    parser.add_argument("--users", type=int, default=50, help="concurrent users for /manage, /list and Restart")
+    parser.add_argument("--creates", type=int, default=100, help="VPS created at once by the admin")
+    parser.add_argument("--scale", type=float, default=0.05, help="multiplier on LATENCY, 1.0 = production timings")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--verbose", action="store_true", help="keep the bots' own output and JSON span logs")
+    asyncio.run(main(parser.parse_args()))
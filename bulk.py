@@ -0,0 +1,107 @@
+import asyncio
+import csv
+import fnmatch
+import io
+import time
+
+SELECTOR_HELP = "all, owner:<user id>, os:<type>, host:<name>, name:<glob> or a bare name glob"
+
+
+def select(records, selector: str):
+    # records: iterable of (name, dict) -> sorted VPS names matching the selector
+    selector = selector.strip()
+    kind, sep, value = selector.partition(":")
+    if not sep:
+        kind, value = "name", selector
+    if selector == "all":
+        match = lambda name, vps: True
+    elif kind == "owner":
+        match = lambda name, vps: str(vps.get("owner_id")) == value.strip("<@!>")
+    elif kind == "os":
+        match = lambda name, vps: vps.get("os", "ubuntu") == value
+    elif kind == "host":
+        match = lambda name, vps: vps.get("host") == value
+    elif kind == "name":
+        match = lambda name, vps: fnmatch.fnmatchcase(name, value)
+    else:
+        raise ValueError(f"Unknown selector `{selector}`, use {SELECTOR_HELP}")
+    return sorted(name for name, vps in records if match(name, vps))
+
+
+def parse_create_csv(text: str):
+    # Header row required; os, ram_gb, cpu and disk_gb fall back to the /create-vps defaults
+    rows = list(csv.DictReader(io.StringIO(text)))
+    if not rows:
+        raise ValueError("CSV has no rows")
+    specs = []
+    for line, row in enumerate(rows, start=2):
+        row = {k.strip(): (v or "").strip() for k, v in row.items() if k}
+        missing = [c for c in ("name", "password", "owner_id") if not row.get(c)]
+        if missing:
+            raise ValueError(f"Line {line}: missing {', '.join(missing)}")
+        try:
+            specs.append({
+                "name": row["name"], "password": row["password"], "owner_id": int(row["owner_id"]),
+                "os": row.get("os") or "ubuntu", "ram_gb": int(row.get("ram_gb") or 1),
+                "cpu": int(row.get("cpu") or 1), "disk_gb": int(row.get("disk_gb") or 10),
+            })
+        except ValueError as e:
+            raise ValueError(f"Line {line}: {e}")
+    return specs
+
+
+# ---------------- Batch runner ---------------- #
+# Runs fn(item) for every item, at most `concurrency` at a time, retrying
+# failures with backoff. progress(done, failed, total) is called at most
+# every progress_interval seconds and once at the end.
+async def run_batch(items, fn, concurrency: int = 8, retries: int = 2, progress=None,
+                    progress_interval: float = 2.0, key=str):
+    items = list(items)
+    results = {}
+    semaphore = asyncio.Semaphore(max(concurrency, 1))
+    state = {"done": 0, "failed": 0, "reported": 0.0}
+
+    async def report(final: bool = False):
+        now = time.monotonic()
+        if progress is None or (not final and now - state["reported"] < progress_interval):
+            return
+        state["reported"] = now
+        try:
+            await progress(state["done"], state["failed"], len(items))
+        except Exception as e:
+            print(f"⚠️ Batch progress update failed: {e}")
+
+    async def one(item):
+        async with semaphore:
+            error = None
+            for attempt in range(retries + 1):
+                try:
+                    await fn(item)
+                    error = None
+                    break
+                except Exception as e:
+                    error = str(e) or type(e).__name__
+                    if attempt < retries:
+                        await asyncio.sleep(2 ** attempt)
+        results[key(item)] = error
+        state["done"] += 1
+        state["failed"] += error is not None
+        await report()
+
+    await asyncio.gather(*(one(item) for item in items))
+    await report(final=True)
+    return results
+
+
+def summarize(action: str, results: dict, limit: int = 1500):
+    failed = {k: e for k, e in results.items() if e is not None}
+    text = f"📦 Bulk {action}: ✅ {len(results) - len(failed)} ok | ❌ {len(failed)} failed"
+    shown = 0
+    for name, error in sorted(failed.items()):
+        line = f"\n• `{name}`: {error}"
+        if len(text) + len(line) > limit:
+            text += f"\n… and {len(failed) - shown} more"
+            break
+        text += line
+        shown += 1
+    return text
@@ -0,0 +1,131 @@
+import glob
+import os
+
+
+class InsufficientCapacity(ValueError):
+    pass
+
+
+def parse_cpulist(text: str):
+    # "0-3,8-11" -> [0, 1, 2, 3, 8, 9, 10, 11]
+    cpus = []
+    for part in text.strip().split(","):
+        if not part:
+            continue
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.extend(range(int(lo), int(hi) + 1))
+        else:
+            cpus.append(int(part))
+    return cpus
+
+
+def format_cpulist(cpus):
+    return ",".join(str(c) for c in sorted(cpus))
+
+
+# ---------------- Host Capacity ---------------- #
+# Tracks what has been promised to VPSes against the host's cores, RAM and
+# storage, each with its own overcommit ratio. Every VPS is pinned to the
+# least-loaded cores, kept on one NUMA node whenever it fits in one.
+class HostCapacity:
+    def __init__(self, nodes: dict, ram_gb: float, disk_gb: float = 0,
+                 cpu_ratio: float = 4.0, ram_ratio: float = 1.0, disk_ratio: float = 1.0):
+        self.nodes = nodes  # NUMA node -> [cpu ids]
+        self.cores = sorted(c for cpus in nodes.values() for c in cpus)
+        self.ram_gb = ram_gb
+        self.disk_gb = disk_gb  # 0 = not checked
+        self.ratios = {"cpu": cpu_ratio, "ram": ram_ratio, "disk": disk_ratio}
+        self._alloc = {}  # vps name -> (ram_gb, cpu, disk_gb, [cpu ids])
+        self._load = {c: 0 for c in self.cores}
+
+    def physical(self):
+        return {"cpu": len(self.cores), "ram": self.ram_gb, "disk": self.disk_gb}
+
+    def allocated(self):
+        totals = {"cpu": 0, "ram": 0, "disk": 0}
+        for ram_gb, cpu, disk_gb, _ in self._alloc.values():
+            totals["cpu"] += cpu
+            totals["ram"] += ram_gb
+            totals["disk"] += disk_gb
+        return totals
+
+    def limits(self):
+        return {k: v * self.ratios[k] for k, v in self.physical().items()}
+
+    def check(self, ram_gb: float, cpu: int, disk_gb: float):
+        if cpu > len(self.cores):
+            raise InsufficientCapacity(f"{cpu} CPUs requested but the host has {len(self.cores)} cores")
+        used, limits = self.allocated(), self.limits()
+        for key, amount in (("cpu", cpu), ("ram", ram_gb), ("disk", disk_gb)):
+            if key == "disk" and not self.disk_gb:
+                continue
+            if used[key] + amount > limits[key]:
+                free = max(limits[key] - used[key], 0)
+                raise InsufficientCapacity(f"Not enough {key}: {amount} requested, {free:g} left")
+
+    def pick_cpus(self, count: int):
+        # Prefer the NUMA node whose least-loaded cores are least loaded
+        groups = [sorted(cpus) for cpus in self.nodes.values() if len(cpus) >= count] or [self.cores]
+        best = None
+        for cpus in groups:
+            chosen = sorted(cpus, key=lambda c: self._load[c])[:count]
+            score = sum(self._load[c] for c in chosen)
+            if best is None or score < best[0]:
+                best = (score, chosen)
+        return sorted(best[1])
+
+    def reserve(self, name: str, ram_gb: float, cpu: int, disk_gb: float, cpus=None):
+        if name in self._alloc:
+            return self._alloc[name][3]
+        if cpus is None:
+            self.check(ram_gb, cpu, disk_gb)
+            cpus = self.pick_cpus(cpu)
+        cpus = [c for c in cpus if c in self._load]
+        self._alloc[name] = (ram_gb, cpu, disk_gb, cpus)
+        for c in cpus:
+            self._load[c] += 1
+        return cpus
+
+    def release(self, name: str):
+        alloc = self._alloc.pop(name, None)
+        if alloc is not None:
+            for c in alloc[3]:
+                self._load[c] -= 1
+
+    def rebuild(self, records):
+        # records: iterable of (name, dict) from the DB or create jobs.
+        # Existing VPSes are accounted as-is, even past the ratios.
+        count = 0
+        for name, vps in records:
+            if not vps or "ram_gb" not in vps:
+                continue
+            cpuset = vps.get("cpuset")
+            self.reserve(vps.get("name", name), vps.get("ram_gb", 1), vps.get("cpu", 1), vps.get("disk_gb", 10),
+                         cpus=parse_cpulist(cpuset) if cpuset else [])
+            count += 1
+        return count
+
+    def core_loads(self):
+        return {node: [self._load[c] for c in sorted(cpus)] for node, cpus in self.nodes.items()}
+
+
+def detect_topology():
+    nodes = {}
+    for path in glob.glob("/sys/devices/system/node/node*/cpulist"):
+        node = int(path.split("/")[-2][len("node"):])
+        with open(path) as f:
+            cpus = parse_cpulist(f.read())
+        if cpus:
+            nodes[node] = cpus
+    if not nodes:
+        nodes = {0: sorted(os.sched_getaffinity(0))}
+    return nodes
+
+
+def detect_ram_gb():
+    with open("/proc/meminfo") as f:
+        for line in f:
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) / 1024 ** 2
+    return 0
@@ -0,0 +1,125 @@
+import asyncio
+
+from capacity import HostCapacity, InsufficientCapacity
+from ipam import IPPoolExhausted
+
+
+# ---------------- Node ---------------- #
+# Everything that belongs to one container host: its backend (LXD or
+# classic LXC), the addresses on its macvlan segment and its capacity.
+class Node:
+    def __init__(self, name: str, backend, ipam):
+        self.name = name
+        self.backend = backend
+        self.ipam = ipam
+        self.capacity = None  # filled in by Cluster.discover from backend.resources()
+
+    def free_ips(self):
+        return sum(subnet.free for subnet in self.ipam.subnets)
+
+    def headroom(self):
+        # Smallest free fraction of any resource, used to rank nodes
+        used, limits = self.capacity.allocated(), self.capacity.limits()
+        return min(((limits[k] - used[k]) / limits[k] for k in limits if limits[k]), default=0)
+
+
+def topology(resources: dict):
+    # /1.0/resources cpu section -> {numa node: [cpu ids]}
+    nodes = {}
+    for socket in resources.get("cpu", {}).get("sockets", []):
+        for core in socket.get("cores", []):
+            for thread in core.get("threads", []):
+                if thread.get("online", True):
+                    nodes.setdefault(thread.get("numa_node", 0), []).append(thread["id"])
+    return nodes
+
+
+# ---------------- Cluster ---------------- #
+# VPS records carry the name of the node they live on; records from before
+# multi-host support belong to the default (first) node.
+class Cluster:
+    def __init__(self, nodes: list, cpu_ratio: float = 4.0, ram_ratio: float = 1.0, disk_ratio: float = 1.0):
+        self.nodes = {node.name: node for node in nodes}
+        self.default = nodes[0].name
+        self.ratios = {"cpu_ratio": cpu_ratio, "ram_ratio": ram_ratio, "disk_ratio": disk_ratio}
+
+    def __iter__(self):
+        return iter(self.nodes.values())
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def get(self, host: str = None):
+        node = self.nodes.get(host or self.default)
+        if node is None:
+            raise KeyError(f"Unknown host {host}")
+        return node
+
+    async def gather(self, fn):
+        # Runs fn(node) on every node at once -> {node name: result or exception}
+        nodes = list(self)
+        results = await asyncio.gather(*(fn(node) for node in nodes), return_exceptions=True)
+        return {node.name: result for node, result in zip(nodes, results)}
+
+    async def collect(self, fn, what: str):
+        # Fan-out for fn(node) -> dict; an unreachable node only loses its own part
+        merged = {}
+        for host, result in (await self.gather(fn)).items():
+            if isinstance(result, Exception):
+                print(f"⚠️ {host}: {what} failed: {result}")
+            else:
+                merged.update(result)
+        return merged
+
+    async def _discover(self, node: Node):
+        nodes, ram_gb, disk_gb = await node.backend.resources()
+        if disk_gb is None:
+            print(f"⚠️ {node.name}: disk capacity not enforced")
+        node.capacity = HostCapacity(nodes, ram_gb, disk_gb or 0, **self.ratios)
+
+    async def discover(self):
+        for host, result in (await self.gather(self._discover)).items():
+            if isinstance(result, Exception):
+                print(f"⚠️ {host}: unreachable, no VPS will be placed there: {result}")
+
+    def rebuild(self, records):
+        # records: iterable of (name, dict) from the DB or create jobs
+        ips = placed = 0
+        for name, vps in records:
+            node = self.nodes.get(vps.get("host") or self.default)
+            if node is None:
+                print(f"⚠️ {vps.get('name', name)} is on unknown host {vps.get('host')}")
+                continue
+            ips += node.ipam.rebuild([(name, vps)])
+            if node.capacity is not None:
+                placed += node.capacity.rebuild([(name, vps)])
+        return ips, placed
+
+    def place(self, name: str, ram_gb: float, cpu: int, disk_gb: float):
+        # Most headroom first; a node must fit the VPS and have a free address
+        candidates = [n for n in self if n.capacity is not None and n.free_ips()]
+        candidates.sort(key=lambda n: n.headroom(), reverse=True)
+        reasons = []
+        for node in candidates:
+            try:
+                cpus = node.capacity.reserve(name, ram_gb, cpu, disk_gb)
+            except InsufficientCapacity as e:
+                reasons.append(f"{node.name}: {e}")
+                continue
+            try:
+                ip, _ = node.ipam.allocate()
+            except IPPoolExhausted as e:
+                node.capacity.release(name)
+                reasons.append(f"{node.name}: {e}")
+                continue
+            return node, ip, cpus
+        raise InsufficientCapacity("; ".join(reasons) or "No reachable host")
+
+    def release(self, host: str, name: str, ip: str = None):
+        node = self.nodes.get(host or self.default)
+        if node is None:
+            return
+        if ip:
+            node.ipam.release(ip)
+        if node.capacity is not None:
+            node.capacity.release(name)
@@ -0,0 +1,54 @@
+import hashlib
+import json
+import os
+
+import discord
+
+
+def fingerprint(tree, guild=None):
+    # Hash of exactly what tree.sync() would upload for this scope
+    payload = sorted((cmd.to_dict(tree) for cmd in tree.get_commands(guild=guild)),
+                     key=lambda cmd: (cmd.get("type", 1), cmd["name"]))
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+# ---------------- Command Sync ---------------- #
+# Discord keeps the uploaded command tree, so it only has to be uploaded
+# again when the commands in the code changed. The fingerprint of each
+# upload is kept per application and scope ("global" or a guild id);
+# deleting the file forces a full sync on the next start.
+class CommandSync:
+    def __init__(self, path: str):
+        self.path = path
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self, state: dict):
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2, sort_keys=True)
+        os.replace(tmp, self.path)
+
+    async def sync(self, tree, app_id: int, guild_ids=()):
+        # guild_ids: sync a copy of the global commands to just these guilds,
+        # which Discord applies instantly -> {scope: commands uploaded, None if unchanged}
+        state = self._load()
+        results = {}
+        for guild in [discord.Object(id=g) for g in guild_ids] or [None]:
+            if guild is not None:
+                tree.copy_global_to(guild=guild)
+            scope = str(guild.id) if guild else "global"
+            key = f"{app_id}:{scope}"
+            digest = fingerprint(tree, guild)
+            if state.get(key) == digest:
+                results[scope] = None
+                continue
+            results[scope] = len(await tree.sync(guild=guild))
+            state[key] = digest
+            self._save(state)
+        return results
@@ -0,0 +1,83 @@
+import asyncio
+import codecs
+import time
+from collections import deque
+
+MESSAGE_LIMIT = 2000  # characters Discord accepts in one message
+LINE_LIMIT = 300  # longest title or footer kept, the output gets the rest
+
+
+def clip(line: str, limit: int = LINE_LIMIT):
+    return line if len(line) <= limit else line[:limit - 1] + "…"
+
+
+# ---------------- Live Output ---------------- #
+# Mirrors the tail of a running command into one Discord message. Only the
+# last `limit` characters are kept, and however chatty the command is the
+# message is edited at most once per `interval` seconds.
+class LiveOutput:
+    def __init__(self, message, title: str, limit: int = 1800, interval: float = 2.0):
+        self.message = message
+        self.title = title
+        self.limit = limit
+        self.interval = interval
+        self.total = 0  # bytes received
+        self._tail = deque()
+        self._size = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._next_edit = 0.0
+        self._timer = None
+        self._broken = False
+        self._finished = False
+        self._lock = asyncio.Lock()  # one edit at a time, so none lands after the final one
+
+    def write(self, data: bytes):
+        self.total += len(data)
+        text = self._decoder.decode(data)
+        if not text:
+            return
+        self._tail.append(text)
+        self._size += len(text)
+        while self._size - len(self._tail[0]) >= self.limit:
+            self._size -= len(self._tail.popleft())
+        if self._timer is None and not self._broken:
+            self._timer = asyncio.create_task(self._flush())
+
+    def render(self, footer: str = None):
+        title = clip(self.title)
+        footer = clip(footer) if footer else None
+        # Output gets what the title, footer, fences and newlines leave of the message
+        budget = MESSAGE_LIMIT - len(title) - (len(footer) + 1 if footer else 0) - len("\n```\n\n```")
+        text = "".join(self._tail).replace("```", "`\u200b``")  # keep the code block closed
+        lines = [title, f"```\n{text[-min(self.limit, budget):] or ' '}\n```"]
+        if footer:
+            lines.append(footer)
+        return "\n".join(lines)
+
+    async def _edit(self, footer: str = None, final: bool = False, **edit):
+        async with self._lock:
+            if self._broken or (self._finished and not final):
+                return
+            try:
+                await self.message.edit(content=self.render(footer), **edit)
+            except Exception as e:
+                # Message gone or interaction token expired, stop pushing to it
+                print(f"⚠️ Live output dropped: {e}")
+                self._broken = True
+            self._next_edit = time.monotonic() + self.interval
+
+    async def _flush(self):
+        try:
+            await asyncio.sleep(max(self._next_edit - time.monotonic(), 0))
+        finally:
+            self._timer = None
+        await self._edit("⏳ running…")
+
+    async def finish(self, footer: str, **edit):
+        # A progress edit already in flight completes first, later ones are skipped
+        self._finished = True
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._tail.append(self._decoder.decode(b"", final=True))
+        await self._edit(footer, final=True, **edit)
@@ -0,0 +1,1348 @@
+import argparse
+import asyncio
+import fcntl
+import sys
+import time
+import discord
+from discord import app_commands
+from discord.ext import commands
+from vpsdb import open_db
+from backend import RESERVED_PREFIXES, BackendError
+from backups import BackupReader, BackupWriter, Repository, ID_FORMAT
+from commandsync import CommandSync
+from console import LiveOutput
+from execstream import ExecTimeout
+from readiness import INIT_CHECK, NotReady, format_timings, wait_ready
+from jobs import JobQueue
+from status import StatusCache
+from dashboard import LiveDashboard
+from usage import FIELDS, MetricsCollector, format_bytes
+from capacity import InsufficientCapacity, format_cpulist
+from cluster import Cluster, Node
+from bulk import SELECTOR_HELP, parse_create_csv, run_batch, select, summarize
+from guard import Busy, OperationGuard, RateLimiter
+from nameindex import NameIndex
+from rendercache import RenderCache
+from telemetry import TracedStore, instrument_discord, registry, span, start_exporter, traced
+
+TOKEN = ""
+OWNER_ID = 1405866008127864852   # Only this user can run /create-vps
+RELEASES = {"ubuntu": "22.04", "debian": "12"}
+STATUS_TTL = 10  # seconds a bulk status snapshot is served before refetching
+LIVE_DEBOUNCE = 1.0  # seconds of quiet before open manage panels are re-rendered
+LIVE_CHANNEL_INTERVAL = 2.0  # minimum seconds between live edits in one channel
+METRICS_INTERVAL = 15  # seconds between resource samples of all instances
+METRICS_HISTORY = 240  # samples kept per instance (1h at 15s)
+CPU_OVERCOMMIT = 4.0  # vCPUs handed out per physical core
+RAM_OVERCOMMIT = 1.0  # GB of VPS RAM per GB of host RAM
+DISK_OVERCOMMIT = 1.0  # GB of VPS disk per GB of backend storage (thin pools can go higher)
+BOOT_TIMEOUT = 120  # seconds to wait for a new VPS to be running, booted and online
+EXEC_TIMEOUT = 300  # longest an /exec command may run before it is killed
+LOGS_FOLLOW = 60  # seconds /logs keeps following new lines
+OUTPUT_INTERVAL = 2.0  # minimum seconds between edits of a live output message
+NAMES_INTERVAL = 5  # seconds between checks for VPS records changed by another process
+OUTPUT_TAIL = 1800  # characters of command output shown
+LIST_PAGE_SIZE = 10  # VPS per /list page
+BACKUP_DIR = "/var/lib/vps-backups"  # deduplicated, compressed backups of every VPS
+BACKUP_INTERVAL_HOURS = 24  # a VPS is backed up once its newest backup is this old, 0 disables
+BACKUP_KEEP = 7  # backups kept per VPS
+BACKUP_ORPHAN_DAYS = 30  # backups of a deleted VPS are kept this long after its last backup
+BACKUP_CONCURRENCY = 2  # VPS backed up at once
+BACKUP_RATE_MB = 100  # MB/s each backup or restore may read, 0 = unlimited
+DB_FILE = "/var/lib/vps.db"  # use a .json path to keep the flat-file registry
+LEGACY_DB_FILE = "/var/lib/vps-db.json"  # imported once into a fresh SQLite DB
+JOBS_FILE = "/var/lib/vps-jobs.db"
+JOB_RETENTION_DAYS = 30  # finished jobs are kept this long, without their passwords
+ALLOCATOR_LOCK = "/var/lib/vps-allocator.lock"  # held by whichever process hands out addresses and capacity
+JOB_WORKERS = {"heavy": 2, "light": 8, "backup": BACKUP_CONCURRENCY}  # create/reinstall, start/stop/password, backup jobs at once
+BULK_CONCURRENCY = 8  # VPS handled at once by /bulk, /bulk-create and the CLI
+BULK_RETRIES = 2  # extra attempts per VPS before a bulk item counts as failed
+USER_RATE = (0.5, 5)  # interactions per second and burst allowed per user
+GLOBAL_RATE = (20, 40)  # interactions per second and burst across all users
+METRICS_LISTEN = ("127.0.0.1", 9108)  # Prometheus /metrics endpoint, None disables
+COMMANDS_FILE = "/var/lib/vps-commands.json"  # fingerprint of the last uploaded command tree
+SYNC_GUILDS = []  # guild ids to sync commands to instead of globally (instant updates while developing)
+
+
+class RateLimitedTree(app_commands.CommandTree):
+    # Every slash command passes the rate limits first; autocomplete fires
+    # per keystroke and is answered from memory, so it is exempt
+    async def interaction_check(self, interaction: discord.Interaction):
+        if interaction.type is discord.InteractionType.autocomplete:
+            return True
+        return await admit(interaction)
+
+
+intents = discord.Intents.default()
+intents.message_content = True
+bot = commands.Bot(command_prefix="!", intents=intents, tree_cls=RateLimitedTree)
+command_sync = CommandSync(COMMANDS_FILE)
+db = TracedStore(open_db(DB_FILE, import_from=LEGACY_DB_FILE))
+jobs = JobQueue(JOBS_FILE, JOB_WORKERS, JOB_RETENTION_DAYS)
+guard = OperationGuard()
+limiter = RateLimiter(*USER_RATE, *GLOBAL_RATE)
+statuses = StatusCache(lambda: fetch_statuses(), ttl=STATUS_TTL)
+names = NameIndex()
+rendered = RenderCache()  # manage panels, /list rows and pages
+dashboard = LiveDashboard(debounce=LIVE_DEBOUNCE, channel_interval=LIVE_CHANNEL_INTERVAL)
+backup_repo = Repository(BACKUP_DIR)
+metrics = MetricsCollector(lambda: sample_usage(), interval=METRICS_INTERVAL, capacity=METRICS_HISTORY)
+registry.gauge("vps_job_queue_depth", "Jobs waiting per lane",
+               lambda: {lane: jobs.depth(lane) for lane in JOB_WORKERS}, label="lane")
+registry.gauge("vps_operations_in_flight", "VPS operations queued or running", guard.in_flight)
+registry.gauge("vps_live_panels", "Manage panels kept up to date", lambda: len(dashboard))
+cluster = None  # set by setup() from the entry point's nodes
+
+
+def setup(nodes: list):
+    # nodes: [Node] built by bot.py (LXD) or v2.py (classic LXC)
+    global cluster
+    cluster = Cluster(nodes, cpu_ratio=CPU_OVERCOMMIT, ram_ratio=RAM_OVERCOMMIT, disk_ratio=DISK_OVERCOMMIT)
+    return cluster
+
+
+# ---------------- Utils ---------------- #
+async def admit(interaction: discord.Interaction):
+    wait = limiter.check(interaction.user.id)
+    if wait:
+        await interaction.response.send_message(f"⏳ Slow down, try again in {wait:.1f}s.", ephemeral=True)
+        return False
+    return True
+
+
+def node_of(vps_name: str):
+    return cluster.get((db.get(vps_name) or {}).get("host"))
+
+
+def job_node(job):
+    # Create jobs carry their placement, everything else follows the record
+    host = job.params.get("host")
+    return cluster.get(host) if host else node_of(job.params["name"])
+
+
+def backup_key(name: str, vps: dict = None):
+    # Backups belong to the record's owner, not just the name
+    vps = vps or db.get(name, {})
+    return f"{vps.get('owner_id')}/{name}"
+
+
+async def exists_anywhere(name: str):
+    results = await cluster.gather(lambda node: node.backend.exists(name))
+    return any(result is True for result in results.values())
+
+
+def nic(node: Node, ip: str):
+    subnet = node.ipam.subnet_for(ip)
+    if subnet is None:
+        raise ValueError(f"No configured subnet contains {ip}")
+    return {"ip": ip, "prefixlen": subnet.prefixlen, "gateway": str(subnet.gateway), "parent": subnet.parent}
+
+
+async def launch(node: Node, name: str, os_type: str, ip: str, ram_gb: int = 1, cpu: int = 1,
+                 disk_gb: int = 10, cpuset: str = None, resumed: bool = False):
+    try:
+        await node.backend.launch(name, os_type, nic(node, ip), ram_gb, cpu, disk_gb, cpuset, resumed=resumed)
+    finally:
+        statuses.invalidate(name)
+
+
+async def set_password(node: Node, name: str, password: str):
+    # Passed via the environment so quotes in the password can't break the command
+    return await node.backend.exec(name, ["sh", "-c", 'echo "root:$VPS_PASSWORD" | chpasswd'],
+                                   environment={"VPS_PASSWORD": password})
+
+
+async def destroy(node: Node, name: str):
+    await node.backend.destroy(name)
+    statuses.invalidate(name)
+
+
+def boot_probes(node: Node, name: str, ip: str):
+    async def running():
+        return await node.backend.status(name) == "RUNNING"
+
+    async def init():
+        code, _, _ = await node.backend.exec(name, INIT_CHECK)
+        return code == 0
+
+    async def network():
+        return ip in await node.backend.addresses(name)
+
+    return [("running", running), ("init", init), ("network", network)]
+
+
+async def fetch_statuses():
+    return await cluster.collect(lambda node: node.backend.bulk_status(), "status query")
+
+
+async def get_status(vps_name: str):
+    return await statuses.get(vps_name)
+
+
+async def sample_usage():
+    return await cluster.collect(lambda node: node.backend.usage(), "metrics sample")
+
+
+async def watch_events(node: Node):
+    # Feeds the backend's state changes into the status cache and open manage panels
+    delay = 1
+    while True:
+        try:
+            # Events may have been missed while disconnected
+            statuses.invalidate()
+            async for name, status in node.backend.events():
+                delay = 1
+                if status:
+                    statuses.set(name, status)
+                else:
+                    statuses.invalidate(name)
+                dashboard.notify(name)
+        except BackendError as e:
+            print(f"⚠️ {node.name}: event stream lost: {e}")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 60)
+
+
+# ---------------- Jobs ---------------- #
+async def _create_launch(job):
+    p = job.params
+    await launch(job_node(job), p["name"], p["os"], p["ip"], p["ram_gb"], p["cpu"], p["disk_gb"], p.get("cpuset"),
+                 resumed=job.resumed)
+
+
+async def _create_boot(job):
+    p = job.params
+    try:
+        p["boot"] = await wait_ready(boot_probes(job_node(job), p["name"], p["ip"]), timeout=BOOT_TIMEOUT)
+    except NotReady as e:
+        p["boot"] = e.timings
+        p["warnings"].append(f"{e}, tried to set the password anyway.")
+
+
+async def _create_password(job):
+    p = job.params
+    try:
+        code, _, err = await set_password(job_node(job), p["name"], p["password"])
+    except BackendError as e:
+        code, err = 1, str(e)
+    if code != 0:
+        p["warnings"].append(f"Password set failed: {err} (but VPS created)")
+
+
+async def _pristine_snapshot(job):
+    backend = job_node(job).backend
+    if backend.pristine and not await backend.has_snapshot(job.params["name"], backend.pristine):
+        await backend.snapshot(job.params["name"], backend.pristine)
+
+
+async def _create_register(job):
+    p = job.params
+    db.put(p["name"], {
+        "owner_id": p["owner_id"], "ip": p["ip"], "password": p["password"], "name": p["name"],
+        "ram_gb": p["ram_gb"], "cpu": p["cpu"], "disk_gb": p["disk_gb"], "os": p["os"],
+        "cpuset": p.get("cpuset"), "host": job_node(job).name,
+    })
+    names.add(p["name"], p["owner_id"])
+
+
+async def _create_notify(job):
+    p = job.params
+    try:
+        owner = bot.get_user(p["owner_id"]) or await bot.fetch_user(p["owner_id"])
+        dm = await owner.create_dm()
+        embed = discord.Embed(
+            title="🌐 Your VPS is Ready!",
+            description="Here are your premium server details:",
+            color=discord.Color.green()
+        )
+        embed.add_field(name="🖥️ VPS Name", value=f"`{p['name']}`", inline=False)
+        embed.add_field(name="🌍 IP Address", value=f"`{p['ip']}`", inline=False)
+        embed.add_field(name="🔑 Root Password", value=f"`{p['password']}`", inline=False)
+        embed.add_field(name="💻 SSH Login", value=f"`ssh root@{p['ip']}`", inline=False)
+        embed.add_field(name="🛠️ Resources", value=f"`{p['ram_gb']}GB RAM | {p['cpu']} CPU | {p['disk_gb']}GB Disk`", inline=False)
+        embed.set_footer(text="🚀 Powered by PowerDev")
+        await dm.send(embed=embed)
+    except Exception:
+        p["warnings"].append("Could not DM owner.")
+
+
+async def _create_failed(job):
+    if job.stage in (None, "launch", "boot", "password", "snapshot"):
+        node = job_node(job)
+        await destroy(node, job.params["name"])
+        cluster.release(node.name, job.params["name"], job.params["ip"])
+
+
+async def _reinstall_delete(job):
+    await destroy(job_node(job), job.params["name"])
+
+
+async def _reinstall_launch(job):
+    p = job.params
+    await launch(job_node(job), p["name"], p["os"], p["ip"], p["ram_gb"], p["cpu"], p["disk_gb"], p.get("cpuset"),
+                 resumed=job.resumed)
+    db.update(p["name"], os=p["os"])
+
+
+async def _restore_snapshot(job):
+    name = job.params["name"]
+    backend = job_node(job).backend
+    try:
+        await backend.restore(name, backend.pristine)
+    finally:
+        statuses.invalidate(name)
+
+
+async def _restore_boot(job):
+    p = job.params
+    try:
+        await wait_ready(boot_probes(job_node(job), p["name"], p["ip"]), timeout=BOOT_TIMEOUT)
+    except NotReady:
+        pass  # the password stage reports the failure
+
+
+async def _restore_password(job):
+    # The snapshot holds the password from creation time, re-apply the current one
+    p = job.params
+    vps = db.get(p["name"], {})
+    if vps.get("password"):
+        code, _, err = await set_password(job_node(job), p["name"], vps["password"])
+        if code != 0:
+            raise ValueError(f"Restored, but setting the password failed: {err}")
+
+
+async def _reinstall_failed(job):
+    if job.stage == "delete":
+        await destroy(job_node(job), job.params["name"])
+
+
+async def _power(job):
+    backend = job_node(job).backend
+    try:
+        await getattr(backend, job.params["action"])(job.params["name"])
+    finally:
+        statuses.invalidate(job.params["name"])
+
+
+async def _password(job):
+    p = job.params
+    code, _, err = await set_password(job_node(job), p["name"], p["password"])
+    if code != 0:
+        raise ValueError(err or f"chpasswd exited with {code}")
+    db.update(p["name"], password=p["password"])
+
+
+async def _backup(job):
+    p = job.params
+    backend = job_node(job).backend
+    writer = BackupWriter(backup_repo, p["key"], await backup_repo.latest(p["key"]), BACKUP_RATE_MB)
+    await backend.backup(p["name"], writer)
+    manifest = await writer.save(backend.kind)
+    p["backup"] = manifest["id"]
+    p["stats"] = manifest["stats"]
+    await backup_repo.prune(p["key"], BACKUP_KEEP)
+
+
+async def _restore_backup(job):
+    p = job.params
+    backend = job_node(job).backend
+    manifest = await backup_repo.load(p["key"], p["backup"])
+    if manifest["backend"] != backend.kind:
+        raise ValueError(f"Backup {p['backup']} was taken on an {manifest['backend'].upper()} host")
+    try:
+        await backend.restore_backup(p["name"], BackupReader(backup_repo, manifest, BACKUP_RATE_MB))
+    finally:
+        statuses.invalidate(p["name"])
+
+
+async def _restore_configure(job):
+    # The backup brings the instance config of its day; the record's current
+    # address, limits and pinning win before it is started
+    p = job.params
+    node = job_node(job)
+    vps = db.get(p["name"], {})
+    try:
+        await node.backend.configure(p["name"], nic(node, vps.get("ip", p["ip"])), vps.get("ram_gb", 1),
+                                     vps.get("cpu", 1), vps.get("disk_gb", 10), vps.get("cpuset"))
+        if await node.backend.status(p["name"]) != "RUNNING":
+            await node.backend.start(p["name"])
+    finally:
+        statuses.invalidate(p["name"])
+
+
+jobs.register("create", "heavy", [
+    ("launch", _create_launch), ("boot", _create_boot), ("password", _create_password),
+    ("snapshot", _pristine_snapshot), ("register", _create_register), ("notify", _create_notify),
+], on_failure=_create_failed)
+jobs.register("reinstall", "heavy", [
+    ("delete", _reinstall_delete), ("launch", _reinstall_launch), ("snapshot", _pristine_snapshot),
+], on_failure=_reinstall_failed)
+jobs.register("restore", "heavy", [
+    ("restore", _restore_snapshot), ("boot", _restore_boot), ("password", _restore_password),
+])
+jobs.register("restore-backup", "heavy", [
+    ("restore", _restore_backup), ("configure", _restore_configure), ("boot", _restore_boot),
+    ("password", _restore_password),
+])
+jobs.register("backup", "backup", [("backup", _backup)])
+jobs.register("power", "light", [("power", _power)])
+jobs.register("password", "light", [("password", _password)])
+
+
+def progress_editor(message):
+    # Job listener that mirrors the job's stage into a followup message
+    async def listener(job):
+        if job.status in ("queued", "running"):
+            await message.edit(content=jobs.describe(job))
+    return listener
+
+
+# ---------------- Operations ---------------- #
+# Shared by the slash commands, the bulk commands and the CLI
+async def provision(name: str, password: str, owner_id: int, os_type: str = "ubuntu",
+                    ram_gb: int = 1, cpu: int = 1, disk_gb: int = 10, listener=None):
+    async def create():
+        if name.startswith(RESERVED_PREFIXES):
+            raise ValueError(f"VPS names starting with {' or '.join(f'`{p}`' for p in RESERVED_PREFIXES)} are reserved.")
+        if name in db or await exists_anywhere(name):
+            raise ValueError(f"VPS `{name}` already exists.")
+        try:
+            node, ip, cpus = cluster.place(name, ram_gb, cpu, disk_gb)
+        except InsufficientCapacity as e:
+            raise ValueError(f"No host has room: {e}")
+
+        params = {
+            "name": name, "password": password, "owner_id": owner_id, "ip": ip, "os": os_type, "host": node.name,
+            "ram_gb": ram_gb, "cpu": cpu, "disk_gb": disk_gb, "cpuset": format_cpulist(cpus), "warnings": [],
+        }
+        return await jobs.run("create", params, listener)
+
+    # Two creates of one name would both pass the exists check
+    return await guard.run(name, "create", create, queue=False)
+
+
+async def power_vps(name: str, action: str):
+    async def power():
+        job = await jobs.run("power", {"name": name, "action": action})
+        if job.status != "done":
+            raise ValueError(job.error)
+    await guard.run(name, action, power)
+
+
+async def remove_vps(name: str):
+    async def remove():
+        await destroy(node_of(name), name)
+        vps = db.pop(name, None)
+        names.remove(name)
+        if vps:
+            cluster.release(vps.get("host"), name, vps.get("ip"))
+    await guard.run(name, "delete", remove, queue=False)
+
+
+async def backup_vps(name: str, listener=None):
+    # Refused while another operation runs on the VPS, and the other way round
+    params = {"name": name, "key": backup_key(name)}
+    return await guard.run(name, "backup", lambda: jobs.run("backup", params, listener), queue=False)
+
+
+async def restore_vps(name: str, backup_id: str, listener=None):
+    params = {"name": name, "key": backup_key(name), "ip": db.get(name, {}).get("ip"), "backup": backup_id}
+    return await guard.run(name, "restore-backup", lambda: jobs.run("restore-backup", params, listener),
+                           queue=False)
+
+
+async def scheduled_backups():
+    # Hourly pass: every VPS whose newest backup is older than the interval
+    # is due; the backup lane keeps BACKUP_CONCURRENCY running at once.
+    # Backups of deleted VPS expire BACKUP_ORPHAN_DAYS after their last backup.
+    while True:
+        try:
+            due = []
+            if BACKUP_INTERVAL_HOURS:
+                due = [name for name, vps in db.items()
+                       if await backup_repo.age(backup_key(name, vps)) > BACKUP_INTERVAL_HOURS * 3600]
+            if due:
+                async def one(name):
+                    job = await backup_vps(name)
+                    if job.status != "done":
+                        raise ValueError(f"failed at {job.current}: {job.error}")
+                print(summarize("backup", await run_batch(due, one, BACKUP_CONCURRENCY, retries=0), limit=10 ** 6))
+            expired = await backup_repo.expire({backup_key(name, vps) for name, vps in db.items()},
+                                               BACKUP_ORPHAN_DAYS * 86400)
+            if expired:
+                print(f"🧹 Backups of {len(expired)} deleted VPS expired: {', '.join(expired)}")
+            if due or expired:
+                removed, freed = await backup_repo.gc()
+                print(f"🧹 Backups: {removed} unused chunks removed, {format_bytes(freed)} freed")
+        except Exception as e:
+            print(f"⚠️ Scheduled backups failed: {e}")
+        await asyncio.sleep(3600)
+
+
+BULK_ACTIONS = ("start", "stop", "restart", "delete")
+
+
+async def bulk_action(action: str, names, concurrency: int = BULK_CONCURRENCY, retries: int = BULK_RETRIES,
+                      progress=None):
+    async def one(name):
+        if action == "delete":
+            await remove_vps(name)
+        else:
+            await power_vps(name, action)
+    return await run_batch(names, one, concurrency, retries, progress)
+
+
+async def bulk_create(specs, concurrency: int = BULK_CONCURRENCY, retries: int = BULK_RETRIES, progress=None):
+    async def one(spec):
+        job = await provision(spec["name"], spec["password"], spec["owner_id"], spec["os"],
+                              spec["ram_gb"], spec["cpu"], spec["disk_gb"])
+        if job.status != "done":
+            raise ValueError(f"failed at {job.current}: {job.error}")
+    return await run_batch(specs, one, concurrency, retries, progress, key=lambda spec: spec["name"])
+
+
+def batch_progress(message, action: str):
+    async def progress(done, failed, total):
+        await message.edit(content=f"⏳ Bulk {action}: {done}/{total} done, {failed} failed")
+    return progress
+
+
+# ---------------- Change Password Modal ---------------- #
+class ChangePasswordModal(discord.ui.Modal, title="🔑 Change VPS Root Password"):
+    def __init__(self, vps_name: str):
+        super().__init__()
+        self.vps_name = vps_name
+
+    new_password = discord.ui.TextInput(label="New Root Password", style=discord.TextStyle.short)
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await admit(interaction)
+
+    @traced("modal", "change-password")
+    async def on_submit(self, interaction: discord.Interaction):
+        await interaction.response.defer(ephemeral=True)
+        # Ensure container is running
+        status = await get_status(self.vps_name)
+        if status != "RUNNING":
+            await interaction.followup.send(f"❌ VPS must be running to change password. Current status: `{status}`", ephemeral=True)
+            return
+        job = await guard.run(self.vps_name, "password",
+                              lambda: jobs.run("password", {"name": self.vps_name, "password": self.new_password.value}))
+        if job.status == "done":
+            await interaction.followup.send(f"✅ Password updated for `{self.vps_name}`.", ephemeral=True)
+        else:
+            await interaction.followup.send(f"❌ Failed: {job.error}", ephemeral=True)
+
+
+# ---------------- Manage View ---------------- #
+class ManageView(discord.ui.View):
+    def __init__(self, vps_name: str, ip: str, owner_id: int):
+        super().__init__(timeout=900)
+        self.vps_name = vps_name
+        self.ip = ip
+        self.owner_id = owner_id
+
+    def render(self, status: str):
+        # Identical panels (same status and record) are built once and reused
+        vps = db.get(self.vps_name, {})
+        version = (status, self.ip, vps.get("password"), vps.get("ram_gb", 1), vps.get("cpu", 1), vps.get("disk_gb", 10))
+        return rendered.get(("panel", self.vps_name), version, lambda: self._build(status, vps))
+
+    def _build(self, status: str, vps: dict):
+        embed = discord.Embed(
+            title=f"⚙️ VPS Manager: {self.vps_name}",
+            description="Control your VPS with the buttons below:",
+            color=discord.Color.blurple()
+        )
+        embed.add_field(name="📡 Status", value=f"`{status}`", inline=False)
+        embed.add_field(name="💻 SSH", value=f"`ssh root@{self.ip}`", inline=False)
+        if vps.get("password"):
+            embed.add_field(name="🔑 Root Password", value=f"`{vps['password']}`", inline=False)
+        ram_gb = vps.get("ram_gb", 1)
+        cpu = vps.get("cpu", 1)
+        disk_gb = vps.get("disk_gb", 10)
+        embed.add_field(name="🛠️ Resources", value=f"`{ram_gb}GB RAM | {cpu} CPU | {disk_gb}GB Disk`", inline=False)
+        embed.set_footer(text="🚀 Powered by PowerDev")
+        return embed
+
+    def attach(self, interaction: discord.Interaction):
+        # Ephemeral panels can only be edited through the interaction that sent them
+        self.origin = interaction
+        dashboard.register(self.vps_name, id(self), interaction.channel_id, self.push, lifetime=self.timeout)
+
+    async def push(self):
+        status = await get_status(self.vps_name)
+        await self.origin.edit_original_response(embed=self.render(status), view=self)
+
+    async def on_timeout(self):
+        dashboard.unregister(self.vps_name, id(self))
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await admit(interaction)
+
+    async def update_embed(self, interaction: discord.Interaction, msg: str = None):
+        status = await get_status(self.vps_name)
+        if msg:
+            await interaction.followup.send(msg, ephemeral=True)
+        await interaction.message.edit(embed=self.render(status), view=self)
+
+    async def _power_action(self, interaction: discord.Interaction, action: str):
+        await interaction.response.defer(ephemeral=True)
+        if action not in ("start", "stop", "restart"):
+            await interaction.followup.send(f"❌ Failed to {action}: Unknown action", ephemeral=True)
+            return
+
+        try:
+            await power_vps(self.vps_name, action)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ Failed to {action}: {e}", ephemeral=True)
+            return
+        await self.update_embed(interaction, f"✅ VPS `{self.vps_name}` {action}ed.")
+
+    @discord.ui.button(label="Start", style=discord.ButtonStyle.success)
+    @traced("button")
+    async def start(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._power_action(interaction, "start")
+
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.danger)
+    @traced("button")
+    async def stop(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._power_action(interaction, "stop")
+
+    @discord.ui.button(label="Restart", style=discord.ButtonStyle.primary)
+    @traced("button")
+    async def restart(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self._power_action(interaction, "restart")
+
+    @discord.ui.button(label="Reinstall", style=discord.ButtonStyle.secondary)
+    @traced("button")
+    async def reinstall(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.defer(ephemeral=True)
+        vps = db.get(self.vps_name, {})
+        if not vps:
+            await interaction.followup.send("❌ VPS config not found.", ephemeral=True)
+            return
+        os_type = vps.get("os", "ubuntu")
+        params = {
+            "name": self.vps_name, "ip": self.ip, "os": os_type,
+            "ram_gb": vps.get("ram_gb", 1), "cpu": vps.get("cpu", 1), "disk_gb": vps.get("disk_gb", 10),
+            "cpuset": vps.get("cpuset"),
+        }
+
+        # Restoring the pristine snapshot is much faster than a rebuild
+        kind = "reinstall"
+        backend = node_of(self.vps_name).backend
+        if backend.pristine and await backend.has_snapshot(self.vps_name, backend.pristine):
+            kind = "restore"
+
+        message = await interaction.followup.send("🕒 Reinstall queued.", ephemeral=True, wait=True)
+        try:
+            job = await guard.run(self.vps_name, "reinstall", lambda: jobs.run(kind, params, progress_editor(message)),
+                                  queue=False)
+        except Busy as e:
+            await message.edit(content=f"❌ {e}")
+            return
+        if job.status == "done":
+            await message.edit(content=f"✅ Job #{job.id} `{kind}` finished in `{format_timings(job.timings)}`")
+            await self.update_embed(interaction, f"🔄 VPS `{self.vps_name}` reinstalled with {os_type.capitalize()}.")
+        else:
+            await message.edit(content=f"❌ Reinstall failed at {job.current}: {job.error}")
+
+    @discord.ui.button(label="Change Password", style=discord.ButtonStyle.blurple)
+    @traced("button")
+    async def change_password(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(ChangePasswordModal(self.vps_name))
+
+    @discord.ui.button(label="❌ Delete VPS", style=discord.ButtonStyle.red)
+    @traced("button")
+    async def delete_vps(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.owner_id and interaction.user.id != OWNER_ID:
+            await interaction.response.send_message("❌ You are not allowed.", ephemeral=True)
+            return
+        await interaction.response.defer(ephemeral=True)
+        try:
+            await remove_vps(self.vps_name)
+        except Busy as e:
+            await interaction.followup.send(f"❌ {e}", ephemeral=True)
+            return
+        dashboard.unregister(self.vps_name, id(self))
+        self.stop()
+        await interaction.followup.send(f"🗑️ VPS `{self.vps_name}` deleted.", ephemeral=True)
+        await interaction.message.delete()
+
+
+# ---------------- List View ---------------- #
+STATUS_ICONS = {"RUNNING": "🟢", "STOPPED": "🔴"}
+
+
+def list_row(name: str, vps: dict, status: str):
+    # -> (version, text); the version is everything the row shows
+    version = (status, vps.get("ip"), vps.get("ram_gb", 1), vps.get("cpu", 1), vps.get("disk_gb", 10), vps.get("os", "ubuntu"))
+    text = rendered.get(("row", name), version, lambda: (
+        f"{STATUS_ICONS.get(status, '⚪')} `{name}` {status.lower()}\n"
+        f"┗ `{vps.get('ip', '?')}` | {version[2]}GB RAM | {version[3]} CPU | {version[4]}GB Disk | {version[5]}"
+    ))
+    return version, text
+
+
+class ListView(discord.ui.View):
+    def __init__(self, owner_id: int, vps_names: list):
+        super().__init__(timeout=600)
+        self.owner_id = owner_id
+        self.vps_names = vps_names
+        self.page = 0
+        self.pages = max(1, -(-len(vps_names) // LIST_PAGE_SIZE))
+
+    async def render(self):
+        # Statuses come from one bulk snapshot; only this page's rows are rendered
+        page_names = self.vps_names[self.page * LIST_PAGE_SIZE:(self.page + 1) * LIST_PAGE_SIZE]
+        page_statuses = await asyncio.gather(*(get_status(name) for name in page_names))
+        rows = [list_row(name, db.get(name) or {}, status) for name, status in zip(page_names, page_statuses)]
+        self.previous_page.disabled = self.page == 0
+        self.next_page.disabled = self.page >= self.pages - 1
+        version = (self.pages, len(self.vps_names), tuple(page_names), tuple(v for v, _ in rows))
+        return rendered.get(("page", self.owner_id, self.page), version, lambda: self._build([t for _, t in rows]))
+
+    def _build(self, rows: list):
+        embed = discord.Embed(title="📋 Your VPS List", description="\n".join(rows), color=discord.Color.green())
+        embed.set_footer(text=f"Page {self.page + 1}/{self.pages} | {len(self.vps_names)} VPS | 🚀 Powered by PowerDev")
+        return embed
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await admit(interaction)
+
+    async def turn(self, interaction: discord.Interaction, delta: int):
+        self.page = min(max(self.page + delta, 0), self.pages - 1)
+        await interaction.response.edit_message(embed=await self.render(), view=self)
+
+    @discord.ui.button(label="◀ Prev", style=discord.ButtonStyle.secondary)
+    @traced("button", "list-prev")
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.turn(interaction, -1)
+
+    @discord.ui.button(label="Next ▶", style=discord.ButtonStyle.secondary)
+    @traced("button", "list-next")
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await self.turn(interaction, 1)
+
+
+# ---------------- Console ---------------- #
+def log_command(lines: int, follow: bool):
+    # journald where there is one, else the classic syslog files
+    journal = f"journalctl --no-pager -n {lines}" + (" -f" if follow else "")
+    files = f"tail -n {lines}" + (" -F" if follow else "") + " /var/log/syslog /var/log/messages 2>/dev/null"
+    return ["sh", "-c", f"if command -v journalctl >/dev/null; then exec {journal}; else exec {files}; fi"]
+
+
+class StopView(discord.ui.View):
+    def __init__(self, owner_id: int, timeout: float):
+        super().__init__(timeout=timeout)
+        self.owner_id = owner_id
+        self.task = None
+
+    async def interaction_check(self, interaction: discord.Interaction):
+        return await admit(interaction)
+
+    @discord.ui.button(label="Stop", style=discord.ButtonStyle.danger)
+    @traced("button", "stop-command")
+    async def stop_command(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("❌ You are not allowed.", ephemeral=True)
+            return
+        await interaction.response.defer()
+        if self.task is not None:
+            self.task.cancel()
+
+
+async def stream_command(interaction: discord.Interaction, name: str, command: list, timeout: float, title: str):
+    # Runs command in the VPS and mirrors its output into a followup message
+    # until it exits, times out or the Stop button is pressed
+    view = StopView(interaction.user.id, timeout=timeout + 60)
+    message = await interaction.followup.send(f"{title}\n⏳ starting…", view=view, ephemeral=True, wait=True)
+    output = LiveOutput(message, title, OUTPUT_TAIL, OUTPUT_INTERVAL)
+
+    async def run():
+        stream = await node_of(name).backend.stream(name, command)
+        try:
+            async for _, chunk in stream.chunks(timeout):
+                output.write(chunk)
+            return await stream.wait()
+        finally:
+            await stream.close()
+
+    view.task = asyncio.create_task(run())
+    await asyncio.wait([view.task])
+    view.stop()
+    if view.task.cancelled():
+        footer = "🛑 Stopped."
+    elif isinstance(view.task.exception(), ExecTimeout):
+        footer = f"⏱️ {view.task.exception()}, command killed."
+    elif view.task.exception() is not None:
+        footer = f"❌ Failed: {view.task.exception()}"
+    else:
+        code = view.task.result()
+        footer = f"{'✅' if code == 0 else '⚠️'} Exited with code `{code}`."
+    await output.finish(f"{footer} `{format_bytes(output.total)}` of output.", view=None)
+
+
+# ---------------- Commands ---------------- #
+async def prepare():
+    db.start()
+    await cluster.discover()
+    # Addresses and capacity held by unfinished create jobs aren't in the DB yet
+    in_use, placed = cluster.rebuild(db.items() + [(job.id, job.params) for job in jobs.active()])
+    print(f"✅ IPAM: {in_use} addresses in use")
+    print(f"✅ Capacity: {placed} VPS placed on {len(cluster)} hosts")
+    rebuild_names()
+    print(f"✅ Names: {len(names)} VPS indexed")
+
+
+names_version = None  # db.version the name index was last rebuilt from
+
+
+def rebuild_names():
+    global names_version
+    names_version = db.version
+    names.rebuild(db.items())
+
+
+async def watch_names():
+    # Our own creates and deletes update the index directly; this picks up
+    # records changed by another process (e.g. the CLI) off the autocomplete path
+    while True:
+        await asyncio.sleep(NAMES_INTERVAL)
+        try:
+            if db.version != names_version:
+                rebuild_names()
+                print(f"🔄 Names: {len(names)} VPS re-indexed")
+        except Exception as e:
+            print(f"⚠️ Name index refresh failed: {e}")
+
+
+STARTED = time.monotonic()
+startup = {}  # phase -> seconds, reported once the bot is ready
+
+
+async def timed(phase: str, coro):
+    began = time.monotonic()
+    try:
+        with span("startup", phase):
+            return await coro
+    finally:
+        startup[phase] = time.monotonic() - began
+
+
+async def sync_commands():
+    # Only uploads the command tree when it changed since the last upload;
+    # runs once per process, not on every gateway reconnect
+    for scope, count in (await command_sync.sync(bot.tree, bot.application_id, SYNC_GUILDS)).items():
+        if count is None:
+            print(f"✅ Commands unchanged ({scope}), sync skipped")
+        else:
+            print(f"✅ Synced {count} commands ({scope})")
+
+
+@bot.event
+async def setup_hook():
+    instrument_discord(bot.http)
+    with span("startup", "setup_hook"):
+        await timed("prepare", prepare())
+        jobs.start()
+        for node in cluster:
+            node.backend.start_background()
+            asyncio.create_task(watch_events(node))
+        metrics.start()
+        asyncio.create_task(watch_names())
+        asyncio.create_task(scheduled_backups())
+        # Independent of each other, so they run at once
+        phases = {"sync": sync_commands(), "statuses": statuses.refresh()}
+        if METRICS_LISTEN:
+            phases["exporter"] = start_exporter(*METRICS_LISTEN)
+        results = await asyncio.gather(*(timed(p, c) for p, c in phases.items()), return_exceptions=True)
+        for phase, result in zip(phases, results):
+            if isinstance(result, Exception):
+                print(f"❌ Startup {phase} failed: {result}")
+
+
+@bot.event
+async def on_ready():
+    print(f"✅ Logged in as {bot.user}")
+    if "ready" not in startup:
+        startup["ready"] = time.monotonic() - STARTED
+        phases = " | ".join(f"{p} {t:.1f}s" for p, t in startup.items() if p != "ready")
+        print(f"⏱️ Startup: {phases} | ready after {startup['ready']:.1f}s")
+
+
+@bot.tree.command(name="create-vps", description="Create a new VPS")
+@app_commands.describe(
+    name="VPS name",
+    password="Root password",
+    owner="Owner user",
+    os_type="OS type (ubuntu or debian)",
+    ram_gb="RAM in GB (default: 1)",
+    cpu="CPU cores (default: 1)",
+    disk_gb="Disk size in GB (default: 10)"
+)
+@traced("command", "create-vps")
+async def create_vps(interaction: discord.Interaction, name: str, password: str, owner: discord.Member,
+                     os_type: str = "ubuntu", ram_gb: int = 1, cpu: int = 1, disk_gb: int = 10):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    message = await interaction.followup.send("🕒 VPS creation queued.", ephemeral=True, wait=True)
+    try:
+        job = await provision(name, password, owner.id, os_type, ram_gb, cpu, disk_gb, progress_editor(message))
+    except ValueError as e:
+        await message.edit(content=f"❌ {e}")
+        return
+    if job.status != "done":
+        await message.edit(content=f"❌ VPS create failed at {job.current}: {job.error}")
+        return
+
+    params = job.params
+    timings = f"{format_timings(job.timings)} (boot: {format_timings(params['boot'])})"
+    print(f"⏱️ {name}: {timings}")
+    warnings = "".join(f"\n⚠️ {w}" for w in params["warnings"])
+    await message.edit(content=f"✅ VPS `{name}` created for {owner.mention} (IP: {params['ip']}, host: {params['host']})\n⏱️ `{timings}`{warnings}")
+
+
+@bot.tree.command(name="manage", description="Manage your VPS")
+@traced("command", "manage")
+async def manage(interaction: discord.Interaction, name: str):
+    vps = db.get(name)
+    if not vps:
+        await interaction.response.send_message("❌ VPS not found.", ephemeral=True)
+        return
+    if interaction.user.id != vps["owner_id"]:
+        await interaction.response.send_message("❌ You are not the owner.", ephemeral=True)
+        return
+
+    status = await get_status(name)
+    view = ManageView(name, vps["ip"], vps["owner_id"])
+    await interaction.response.send_message(embed=view.render(status), view=view, ephemeral=True)
+    view.attach(interaction)
+
+
+async def console_target(interaction: discord.Interaction, name: str):
+    # The VPS record if the user may run commands in it and it is running, else answers and returns None
+    vps = db.get(name)
+    if not vps:
+        await interaction.response.send_message("❌ VPS not found.", ephemeral=True)
+        return None
+    if interaction.user.id != vps["owner_id"] and interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ You are not the owner.", ephemeral=True)
+        return None
+    status = await get_status(name)
+    if status != "RUNNING":
+        await interaction.response.send_message(f"❌ VPS must be running. Current status: `{status}`", ephemeral=True)
+        return None
+    return vps
+
+
+@bot.tree.command(name="exec", description="Run a command in your VPS and watch its output")
+@app_commands.describe(
+    name="VPS name",
+    command="Shell command, run as root with sh -c",
+    timeout=f"Seconds before it is killed (default and max: {EXEC_TIMEOUT})"
+)
+@traced("command", "exec")
+async def exec_cmd(interaction: discord.Interaction, name: str, command: str, timeout: int = EXEC_TIMEOUT):
+    if not await console_target(interaction, name):
+        return
+    await interaction.response.defer(ephemeral=True)
+    timeout = min(max(timeout, 1), EXEC_TIMEOUT)
+    await stream_command(interaction, name, ["sh", "-c", command], timeout, f"💻 `{name}` $ `{command[:200]}`")
+
+
+@bot.tree.command(name="logs", description="Show the system log of your VPS")
+@app_commands.describe(
+    name="VPS name",
+    lines="Lines from the end of the log (default: 50)",
+    follow=f"Keep showing new lines for {LOGS_FOLLOW}s"
+)
+@traced("command", "logs")
+async def logs(interaction: discord.Interaction, name: str, lines: int = 50, follow: bool = False):
+    if not await console_target(interaction, name):
+        return
+    await interaction.response.defer(ephemeral=True)
+    lines = min(max(lines, 1), 1000)
+    await stream_command(interaction, name, log_command(lines, follow), LOGS_FOLLOW if follow else 30,
+                         f"📜 `{name}` system log")
+
+
+async def backup_target(interaction: discord.Interaction, name: str):
+    # True if the user may back up or restore the VPS, else answers
+    vps = db.get(name)
+    if not vps:
+        await interaction.response.send_message("❌ VPS not found.", ephemeral=True)
+        return False
+    if interaction.user.id != vps["owner_id"] and interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ You are not the owner.", ephemeral=True)
+        return False
+    return True
+
+
+def describe_backup(backup_id: str, stats: dict):
+    return (f"`{backup_id}`: {stats['files']} files, {format_bytes(stats['read'])} read, "
+            f"{stats['unchanged']} unchanged, {format_bytes(stats['stored'])} added to the repository "
+            f"in {stats['seconds']:.0f}s")
+
+
+@bot.tree.command(name="backup", description="Back up your VPS")
+@app_commands.describe(name="VPS name")
+@traced("command", "backup")
+async def backup_cmd(interaction: discord.Interaction, name: str):
+    if not await backup_target(interaction, name):
+        return
+    await interaction.response.defer(ephemeral=True)
+    message = await interaction.followup.send("🕒 Backup queued.", ephemeral=True, wait=True)
+    try:
+        job = await backup_vps(name, progress_editor(message))
+    except Busy as e:
+        await message.edit(content=f"❌ {e}")
+        return
+    if job.status == "done":
+        await message.edit(content=f"✅ Backup of `{name}` {describe_backup(job.params['backup'], job.params['stats'])}")
+    else:
+        await message.edit(content=f"❌ Backup failed: {job.error}")
+
+
+@bot.tree.command(name="restore", description="Restore your VPS from a backup")
+@app_commands.describe(
+    name="VPS name",
+    backup="Backup to restore (default: the newest)",
+    confirm="Required: everything written since the backup is lost"
+)
+@traced("command", "restore")
+async def restore_cmd(interaction: discord.Interaction, name: str, backup: str = None, confirm: bool = False):
+    if not await backup_target(interaction, name):
+        return
+    ids = backup_repo.ids(backup_key(name))
+    if not ids or (backup and backup not in ids):
+        await interaction.response.send_message("❌ Backup not found.", ephemeral=True)
+        return
+    backup = backup or ids[0]
+    if not confirm:
+        await interaction.response.send_message(
+            f"⚠️ `{name}` will be replaced by backup `{backup}`. Run again with `confirm: True`.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    message = await interaction.followup.send("🕒 Restore queued.", ephemeral=True, wait=True)
+    try:
+        job = await restore_vps(name, backup, progress_editor(message))
+    except Busy as e:
+        await message.edit(content=f"❌ {e}")
+        return
+    if job.status == "done":
+        await message.edit(content=f"✅ `{name}` restored from backup `{backup}` in `{format_timings(job.timings)}`")
+    else:
+        await message.edit(content=f"❌ Restore failed at {job.current}: {job.error}")
+
+
+@bot.tree.command(name="delete-vps", description="Admin: Delete a VPS")
+@traced("command", "delete-vps")
+async def delete_vps(interaction: discord.Interaction, name: str):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+    if name not in db:
+        await interaction.response.send_message("❌ VPS not found.", ephemeral=True)
+        return
+    try:
+        await remove_vps(name)
+    except Busy as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    await interaction.response.send_message(f"🗑️ VPS `{name}` deleted.", ephemeral=True)
+
+
+@bot.tree.command(name="bulk", description="Admin: Start, stop, restart or delete many VPS")
+@app_commands.describe(
+    action="start, stop, restart or delete",
+    selector=SELECTOR_HELP,
+    confirm="Required to delete",
+    concurrency=f"VPS handled at once (default: {BULK_CONCURRENCY})",
+    retries=f"Extra attempts per VPS (default: {BULK_RETRIES})"
+)
+@traced("command", "bulk")
+async def bulk(interaction: discord.Interaction, action: str, selector: str, confirm: bool = False,
+               concurrency: int = BULK_CONCURRENCY, retries: int = BULK_RETRIES):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+    if action not in BULK_ACTIONS:
+        await interaction.response.send_message("❌ Action must be start, stop, restart or delete.", ephemeral=True)
+        return
+    try:
+        names = select(db.items(), selector)
+    except ValueError as e:
+        await interaction.response.send_message(f"❌ {e}", ephemeral=True)
+        return
+    if not names:
+        await interaction.response.send_message("📭 No VPS match that selector.", ephemeral=True)
+        return
+    if action == "delete" and not confirm:
+        preview = ", ".join(f"`{n}`" for n in names[:20]) + (" …" if len(names) > 20 else "")
+        await interaction.response.send_message(
+            f"⚠️ This deletes {len(names)} VPS: {preview}\nRun again with `confirm: True`.", ephemeral=True)
+        return
+
+    await interaction.response.defer(ephemeral=True)
+    message = await interaction.followup.send(f"🕒 Bulk {action} of {len(names)} VPS queued.", ephemeral=True, wait=True)
+    results = await bulk_action(action, names, concurrency, retries, batch_progress(message, action))
+    await message.edit(content=summarize(action, results))
+
+
+@bot.tree.command(name="bulk-create", description="Admin: Create VPS from a CSV file")
+@app_commands.describe(
+    specs="CSV with a header row: name,password,owner_id and optional os,ram_gb,cpu,disk_gb",
+    concurrency=f"VPS handled at once (default: {BULK_CONCURRENCY})",
+    retries=f"Extra attempts per VPS (default: {BULK_RETRIES})"
+)
+@traced("command", "bulk-create")
+async def bulk_create_cmd(interaction: discord.Interaction, specs: discord.Attachment,
+                          concurrency: int = BULK_CONCURRENCY, retries: int = BULK_RETRIES):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+    await interaction.response.defer(ephemeral=True)
+    try:
+        rows = parse_create_csv((await specs.read()).decode())
+    except (ValueError, UnicodeDecodeError) as e:
+        await interaction.followup.send(f"❌ Bad CSV: {e}", ephemeral=True)
+        return
+
+    message = await interaction.followup.send(f"🕒 Bulk create of {len(rows)} VPS queued.", ephemeral=True, wait=True)
+    results = await bulk_create(rows, concurrency, retries, batch_progress(message, "create"))
+    await message.edit(content=summarize("create", results))
+
+
+@bot.tree.command(name="list", description="List your VPS")
+@traced("command", "list")
+async def list_vps(interaction: discord.Interaction):
+    user_vps = db.by_owner(interaction.user.id)
+    if not user_vps:
+        await interaction.response.send_message("📭 You have no VPS.", ephemeral=True)
+        return
+    view = ListView(interaction.user.id, sorted(user_vps))
+    embed = await view.render()
+    if view.pages == 1:
+        view = discord.utils.MISSING  # nothing to page through
+    await interaction.response.send_message(embed=embed, view=view, ephemeral=True)
+
+
+@bot.tree.command(name="stats", description="Live resource usage of your VPS")
+@traced("command", "stats")
+async def stats(interaction: discord.Interaction, name: str):
+    vps = db.get(name)
+    if not vps:
+        await interaction.response.send_message("❌ VPS not found.", ephemeral=True)
+        return
+    if interaction.user.id != vps["owner_id"] and interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ You are not the owner.", ephemeral=True)
+        return
+    usage = metrics.summary(name)
+    if not usage:
+        await interaction.response.send_message(f"📭 No samples for `{name}` yet, is it running?", ephemeral=True)
+        return
+
+    cpu, mem, rx, tx = usage["cpu"], usage["memory"], usage["rx"], usage["tx"]
+    embed = discord.Embed(title=f"📊 VPS Stats: {name}", color=discord.Color.blurple())
+    embed.add_field(name="🧠 CPU", value=f"`{cpu['now']:.1f}% now | p50 {cpu['p50']:.1f}% | p95 {cpu['p95']:.1f}%`", inline=False)
+    embed.add_field(name="💾 Memory", value=f"`{format_bytes(mem['now'])} of {vps.get('ram_gb', 1)}GB | p95 {format_bytes(mem['p95'])}`", inline=False)
+    if "disk" in node_of(name).backend.usage_fields:
+        embed.add_field(name="🗄️ Disk", value=f"`{format_bytes(usage['disk']['now'])} of {vps.get('disk_gb', 10)}GB`", inline=False)
+    embed.add_field(name="🌐 Network", value=f"`in {format_bytes(rx['now'])}/s (p95 {format_bytes(rx['p95'])}/s) | "
+                                            f"out {format_bytes(tx['now'])}/s (p95 {format_bytes(tx['p95'])}/s)`", inline=False)
+    embed.set_footer(text=f"{usage['samples']} samples over {usage['window'] / 60:.0f} min | 🚀 Powered by PowerDev")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="top", description="Admin: Busiest VPS by resource")
+@app_commands.describe(resource="cpu, memory, disk, rx or tx", count="How many to show (default: 10)")
+@traced("command", "top")
+async def top(interaction: discord.Interaction, resource: str = "cpu", count: int = 10):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+    # Classic LXC hosts don't report disk usage
+    fields = [f for f in FIELDS if any(f in node.backend.usage_fields for node in cluster)]
+    if resource not in fields:
+        await interaction.response.send_message(f"❌ Resource must be {', '.join(fields)}.", ephemeral=True)
+        return
+    rows = metrics.top(resource, count)
+    if not rows:
+        await interaction.response.send_message("📭 No samples yet.", ephemeral=True)
+        return
+
+    def fmt(value):
+        if resource == "cpu":
+            return f"{value:.1f}%"
+        return format_bytes(value) + ("/s" if resource in ("rx", "tx") else "")
+
+    lines = [f"`{n}` {fmt(now)} (p95 {fmt(p95)})" for n, now, p95 in rows]
+    embed = discord.Embed(title=f"📈 Top {len(rows)} by {resource}", color=discord.Color.orange())
+    embed.add_field(name="Servers", value="\n".join(lines), inline=False)
+    embed.set_footer(text="🚀 Powered by PowerDev")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="capacity", description="Admin: Host capacity and headroom")
+@traced("command", "capacity")
+async def capacity_cmd(interaction: discord.Interaction):
+    if interaction.user.id != OWNER_ID:
+        await interaction.response.send_message("❌ Not allowed.", ephemeral=True)
+        return
+    embed = discord.Embed(title="🏗️ Host Capacity", color=discord.Color.orange())
+    for node in cluster:
+        if node.capacity is None:
+            embed.add_field(name=f"🖥️ {node.name}", value="`unreachable at startup`", inline=False)
+            continue
+        used, limits, physical = node.capacity.allocated(), node.capacity.limits(), node.capacity.physical()
+        lines = []
+        for key, unit in (("cpu", " vCPU"), ("ram", "GB"), ("disk", "GB")):
+            if not physical[key]:
+                lines.append(f"{key:<4} {used[key]:g}{unit} allocated, size unknown")
+                continue
+            lines.append(f"{key:<4} {used[key]:g}/{limits[key]:g}{unit} "
+                         f"({physical[key]:g} x {node.capacity.ratios[key]:g}), "
+                         f"{max(limits[key] - used[key], 0):g}{unit} free")
+        lines.append(f"ips  {node.free_ips()} free")
+        for numa, counts in node.capacity.core_loads().items():
+            lines.append(f"numa {numa}: " + " ".join(str(n) for n in counts))
+        text = "\n".join(lines)
+        embed.add_field(name=f"🖥️ {node.name}", value=f"```{text}```", inline=False)
+    embed.set_footer(text="🚀 Powered by PowerDev")
+    await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+@bot.tree.command(name="ping", description="Check bot latency")
+@traced("command", "ping")
+async def ping(interaction: discord.Interaction):
+    await interaction.response.send_message(f"🏓 Pong! `{round(bot.latency*1000)}ms`", ephemeral=True)
+
+
+# ---------------- Autocomplete ---------------- #
+def name_choices(owner_id: int, current: str):
+    # owner_id=None suggests every VPS; statuses come from the cache, never a fetch
+    choices = []
+    for name in names.search(current, owner_id):
+        status = statuses.peek(name)
+        choices.append(app_commands.Choice(name=f"{name} {STATUS_ICONS.get(status, '⚪')} {status.lower()}"[:100], value=name))
+    return choices
+
+
+async def own_names(interaction: discord.Interaction, current: str):
+    return name_choices(interaction.user.id, current)
+
+
+async def visible_names(interaction: discord.Interaction, current: str):
+    # Commands the admin may use on any VPS
+    return name_choices(None if interaction.user.id == OWNER_ID else interaction.user.id, current)
+
+
+async def admin_names(interaction: discord.Interaction, current: str):
+    return name_choices(None, current) if interaction.user.id == OWNER_ID else []
+
+
+async def backup_ids(interaction: discord.Interaction, current: str):
+    # Backups of the VPS already picked in the name option, newest first
+    name = interaction.namespace.name
+    vps = db.get(name) if name else None
+    if not vps or (interaction.user.id != vps["owner_id"] and interaction.user.id != OWNER_ID):
+        return []
+    choices = []
+    for backup_id in backup_repo.ids(backup_key(name, vps)):
+        if current in backup_id:
+            when = time.strftime("%Y-%m-%d %H:%M UTC", time.strptime(backup_id, ID_FORMAT))
+            choices.append(app_commands.Choice(name=when, value=backup_id))
+    return choices[:25]
+
+
+manage.autocomplete("name")(own_names)
+delete_vps.autocomplete("name")(admin_names)
+stats.autocomplete("name")(visible_names)
+exec_cmd.autocomplete("name")(visible_names)
+logs.autocomplete("name")(visible_names)
+backup_cmd.autocomplete("name")(visible_names)
+restore_cmd.autocomplete("name")(visible_names)
+restore_cmd.autocomplete("backup")(backup_ids)
+
+
+# ---------------- CLI ---------------- #
+# python3 bot.py|v2.py bulk <start|stop|restart|delete> <selector> [--yes]
+# python3 bot.py|v2.py bulk create specs.csv
+# Runs next to the bot without logging in; its jobs are not resumed by the
+# bot. IPAM and capacity live in memory of one process, so `create` and
+# `delete` refuse to run while the bot (or another create or delete) holds
+# the allocator lock; use /bulk-create or /bulk then.
+allocator = None  # open ALLOCATOR_LOCK file, held until the process exits
+
+
+def hold_allocator():
+    # -> True if this process now owns address and capacity allocation
+    global allocator
+    if allocator is None:
+        f = open(ALLOCATOR_LOCK, "a")
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            f.close()
+            return False
+        allocator = f
+    return True
+
+
+async def run_cli(args):
+    if args.action in ("create", "delete") and not hold_allocator():
+        command = "/bulk-create" if args.action == "create" else "/bulk delete"
+        print(f"❌ The bot is running and owns IP and capacity allocation, use {command} instead.")
+        return 1
+    await prepare()
+    jobs.start(resume=False)  # active jobs belong to the running bot
+
+    async def progress(done, failed, total):
+        print(f"⏳ {done}/{total} done, {failed} failed")
+
+    try:
+        if args.action == "create":
+            with open(args.target) as f:
+                specs = parse_create_csv(f.read())
+            results = await bulk_create(specs, args.concurrency, args.retries, progress)
+        else:
+            names = select(db.items(), args.target)
+            if args.action == "delete" and not args.yes:
+                print(f"⚠️ Would delete {len(names)} VPS: {', '.join(names)}\nRun again with --yes.")
+                return 1
+            results = await bulk_action(args.action, names, args.concurrency, args.retries, progress)
+        print(summarize(args.action, results, limit=10 ** 6))
+        return 1 if any(results.values()) else 0
+    finally:
+        await db.close()
+        for node in cluster:
+            await node.backend.close()
+
+
+def cli(argv, prog: str):
+    parser = argparse.ArgumentParser(prog=prog, description="Bulk VPS operations without Discord")
+    sub = parser.add_subparsers(dest="command", required=True)
+    bulk_parser = sub.add_parser("bulk", help="start, stop, restart, delete or create many VPS")
+    bulk_parser.add_argument("action", choices=BULK_ACTIONS + ("create",))
+    bulk_parser.add_argument("target", help=f"selector ({SELECTOR_HELP}), or the CSV file for create")
+    bulk_parser.add_argument("--concurrency", type=int, default=BULK_CONCURRENCY)
+    bulk_parser.add_argument("--retries", type=int, default=BULK_RETRIES)
+    bulk_parser.add_argument("--yes", action="store_true", help="confirm a bulk delete")
+    args = parser.parse_args(argv)
+    return asyncio.run(run_cli(args))
+
+
+def main(nodes: list, prog: str):
+    setup(nodes)
+    if len(sys.argv) > 1:
+        sys.exit(cli(sys.argv[1:], prog))
+    if not hold_allocator():
+        sys.exit("❌ Another bot or a CLI bulk create or delete is running, it owns IP and capacity allocation.")
+    bot.run(TOKEN)
+    db.flush()
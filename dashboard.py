@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+
+# ---------------- Live Dashboard ---------------- #
+# Open ManageView messages register an edit callback per VPS. notify(name)
+# debounces bursts of state changes into one round of edits, and edits to
+# the same channel are spaced at least channel_interval apart.
+class LiveDashboard:
+    def __init__(self, debounce: float = 1.0, channel_interval: float = 2.0):
+        self.debounce = debounce
+        self.channel_interval = channel_interval
+        self._entries = {}  # vps name -> {key: (channel_id, edit, expires)}
+        self._timers = {}
+        self._channel_ready = {}
+        self._channel_locks = {}
+
+    def register(self, name: str, key, channel_id: int, edit, lifetime: float = 900):
+        self._entries.setdefault(name, {})[key] = (channel_id, edit, time.monotonic() + lifetime)
+
+    def unregister(self, name: str, key):
+        entries = self._entries.get(name)
+        if entries is not None:
+            entries.pop(key, None)
+            if not entries:
+                self._entries.pop(name, None)
+
+    def __len__(self):
+        return sum(len(entries) for entries in self._entries.values())
+
+    def notify(self, name: str):
+        if name in self._entries and name not in self._timers:
+            self._timers[name] = asyncio.create_task(self._flush(name))
+
+    async def _flush(self, name: str):
+        try:
+            await asyncio.sleep(self.debounce)
+        finally:
+            self._timers.pop(name, None)
+        now = time.monotonic()
+        edits = []
+        for key, (channel_id, edit, expires) in list(self._entries.get(name, {}).items()):
+            if expires <= now:
+                self.unregister(name, key)
+            else:
+                edits.append(self._edit(name, key, channel_id, edit))
+        await asyncio.gather(*edits)
+
+    async def _edit(self, name: str, key, channel_id: int, edit):
+        lock = self._channel_locks.setdefault(channel_id, asyncio.Lock())
+        async with lock:
+            wait = self._channel_ready.get(channel_id, 0) - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            try:
+                await edit()
+            except Exception as e:
+                # Message gone or interaction token expired, stop pushing to it
+                print(f"⚠️ Live update for {name} dropped: {e}")
+                self.unregister(name, key)
+            self._channel_ready[channel_id] = time.monotonic() + self.channel_interval
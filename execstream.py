@@ -0,0 +1,74 @@
+import asyncio
+import inspect
+import time
+
+CHUNK = 4096  # bytes per read from a pipe or websocket
+QUEUE_CHUNKS = 16  # chunks buffered per command before its readers pause
+
+
+class ExecTimeout(Exception):
+    pass
+
+
+# ---------------- Exec Stream ---------------- #
+# One command running inside a container. A reader task per output stream
+# feeds (fd, bytes) chunks into a small bounded queue; when the consumer
+# falls behind, the readers stop reading and the pipe's own backpressure
+# pauses the command, so memory stays bounded however much it prints.
+# Backends build one from read functions (-> bytes, b"" at EOF) plus
+# wait (-> exit code), kill and close callbacks.
+class ExecStream:
+    def __init__(self, readers: dict, wait, kill, close=None):
+        self.queue = asyncio.Queue(QUEUE_CHUNKS)
+        self.returncode = None
+        self.error = None
+        self._wait = wait
+        self._kill = kill
+        self._close = close
+        self._tasks = [asyncio.create_task(self._pump(fd, read)) for fd, read in readers.items()]
+
+    async def _pump(self, fd: str, read):
+        try:
+            while True:
+                chunk = await read()
+                if not chunk:
+                    break
+                await self.queue.put((fd, chunk))
+        except Exception as e:
+            self.error = e  # the stream is cut short, wait() still reports the exit code
+        await self.queue.put((fd, None))
+
+    async def chunks(self, timeout: float):
+        # Yields (fd, bytes) until every stream hits EOF, raises ExecTimeout
+        # once timeout seconds have passed
+        deadline = time.monotonic() + timeout
+        remaining_streams = len(self._tasks)
+        while remaining_streams:
+            try:
+                fd, chunk = await asyncio.wait_for(self.queue.get(), max(deadline - time.monotonic(), 0))
+            except asyncio.TimeoutError:
+                raise ExecTimeout(f"Timed out after {timeout:g}s")
+            if chunk is None:
+                remaining_streams -= 1
+            else:
+                yield fd, chunk
+
+    async def wait(self):
+        self.returncode = await self._wait()
+        return self.returncode
+
+    async def close(self):
+        # Kills the command unless it already exited; safe to call twice
+        for task in self._tasks:
+            task.cancel()
+        if self.returncode is None:
+            try:
+                result = self._kill()
+                if inspect.isawaitable(result):
+                    await result
+            except (ProcessLookupError, ConnectionError):
+                pass  # exited on its own meanwhile
+        if self._close is not None:
+            result, self._close = self._close(), None
+            if inspect.isawaitable(result):
+                await result
@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+# Repeating these while one is already pending has no extra effect, so
+# duplicates join the pending call instead of running again
+IDEMPOTENT = ("start", "stop", "restart", "reinstall", "delete")
+
+
+class Busy(ValueError):
+    pass
+
+
+# ---------------- Operation Guard ---------------- #
+# One lock per VPS so two operations never touch the same container at
+# once. An identical idempotent action that is already queued or running
+# is joined; anything else waits its turn, or is rejected with Busy when
+# queue=False (used for destructive actions).
+class OperationGuard:
+    def __init__(self):
+        self._locks = {}
+        self._pending = {}  # vps name -> {action: future}
+
+    def busy(self, name: str):
+        return [key if isinstance(key, str) else key[0] for key in self._pending.get(name, {})]
+
+    def in_flight(self):
+        return sum(len(pending) for pending in self._pending.values())
+
+    async def run(self, name: str, action: str, fn, queue: bool = True):
+        pending = self._pending.setdefault(name, {})
+        if action in IDEMPOTENT and action in pending:
+            return await asyncio.shield(pending[action])
+        if pending and not queue:
+            raise Busy(f"`{', '.join(self.busy(name))}` is already in progress on `{name}`, try again when it finishes.")
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(lambda f: f.cancelled() or f.exception())  # joiners are optional
+        key = action if action in IDEMPOTENT else (action, object())
+        pending[key] = future
+        try:
+            async with self._locks.setdefault(name, asyncio.Lock()):
+                result = await fn()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            pending.pop(key, None)
+            if not pending:
+                self._pending.pop(name, None)
+                self._locks.pop(name, None)
+
+
+# ---------------- Rate Limits ---------------- #
+class TokenBucket:
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate  # tokens per second
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def take(self):
+        # 0 when a token was taken, otherwise seconds until one is available
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+    def __init__(self, user_rate: float, user_burst: int, global_rate: float, global_burst: int):
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self._users = {}
+
+    def check(self, user_id: int):
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            if len(self._users) > 10000:
+                self._prune()
+            bucket = self._users[user_id] = TokenBucket(self.user_rate, self.user_burst)
+        wait = bucket.take()
+        if wait:
+            return wait
+        wait = self.global_bucket.take()
+        if wait:
+            bucket.tokens += 1  # not the user's fault, give the token back
+        return wait
+
+    def _prune(self):
+        # Full buckets carry no state worth keeping
+        for user_id, bucket in list(self._users.items()):
+            bucket._refill()
+            if bucket.tokens >= bucket.burst:
+                del self._users[user_id]
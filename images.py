@@ -0,0 +1,75 @@
+import asyncio
+
+from lxd import LXDError, image_source
+
+
+# ---------------- Image Cache ---------------- #
+# Pins a local copy of each supported image under a "vps/<os>/<release>"
+# alias so launches never go to the remote server. On zfs/btrfs pools LXD
+# also keeps an optimized volume per image, making every launch a CoW clone.
+class ImageCache:
+    def __init__(self, lxd, releases: dict, refresh_hours: float = 24):
+        self.lxd = lxd
+        self.releases = releases
+        self.refresh_hours = refresh_hours
+        self._cached = set()
+        self._lock = asyncio.Lock()
+        self._task = None
+
+    @staticmethod
+    def alias(os_type: str, release: str):
+        return f"vps/{os_type}/{release}"
+
+    def source(self, os_type: str):
+        release = self.releases.get(os_type, "12")
+        alias = self.alias(os_type, release)
+        if alias in self._cached:
+            return {"type": "image", "alias": alias}
+        return image_source(os_type, release)
+
+    async def _fingerprint(self, alias: str):
+        try:
+            return (await self.lxd.call("GET", f"/1.0/images/aliases/{alias}"))["target"]
+        except LXDError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    async def ensure(self, os_type: str):
+        release = self.releases[os_type]
+        alias = self.alias(os_type, release)
+        async with self._lock:
+            if alias in self._cached:
+                return
+            if await self._fingerprint(alias) is None:
+                print(f"📥 Caching image {os_type}/{release}")
+                await self.lxd.call("POST", "/1.0/images", {
+                    "source": image_source(os_type, release),
+                    "aliases": [{"name": alias}],
+                    "auto_update": True,
+                })
+            self._cached.add(alias)
+
+    async def refresh(self):
+        for os_type, release in self.releases.items():
+            fingerprint = await self._fingerprint(self.alias(os_type, release))
+            if fingerprint is None:
+                continue
+            try:
+                await self.lxd.call("POST", f"/1.0/images/{fingerprint}/refresh")
+            except LXDError as e:
+                print(f"⚠️ Image refresh for {os_type}/{release} failed: {e}")
+
+    async def _run(self):
+        for os_type in self.releases:
+            try:
+                await self.ensure(os_type)
+            except LXDError as e:
+                print(f"⚠️ Image cache for {os_type} failed, launching from the remote: {e}")
+        while True:
+            await asyncio.sleep(self.refresh_hours * 3600)
+            await self.refresh()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
@@ -0,0 +1,151 @@
+import ipaddress
+import re
+import subprocess
+import threading
+
+
+class IPPoolExhausted(ValueError):
+    pass
+
+
+# ---------------- Subnet ---------------- #
+# One bit per address (set = in use) plus a stack of free offsets. The stack
+# may hold stale entries for addresses marked used behind its back (rebuild,
+# reserve); those are skipped on pop, so allocate and release stay O(1)
+# amortized without scanning the bitmap.
+class Subnet:
+    def __init__(self, cidr: str, gateway: str = None, parent: str = None,
+                 first: int = 1, last: int = None, reserved=()):
+        self.network = ipaddress.ip_network(cidr, strict=False)
+        if self.network.prefixlen > 30:
+            raise ValueError(f"Subnet {cidr} is too small")
+        size = self.network.num_addresses
+        self.gateway = ipaddress.ip_address(gateway) if gateway else self.network[1]
+        self.parent = parent
+        # Network and broadcast addresses are never in [first, last].
+        self.first = max(first, 1)
+        self.last = size - 2 if last is None else min(last, size - 2)
+        self._reserved = {self._offset(self.gateway)}
+        self._reserved.update(self._offset(ipaddress.ip_address(ip)) for ip in reserved
+                              if ipaddress.ip_address(ip) in self.network)
+        self._bitmap = bytearray((size + 7) // 8)
+        self._free = [o for o in range(self.last, self.first - 1, -1) if o not in self._reserved]
+        self.capacity = len(self._free)
+        self.used = 0
+
+    @property
+    def prefixlen(self):
+        return self.network.prefixlen
+
+    @property
+    def free(self):
+        return self.capacity - self.used
+
+    def __contains__(self, ip):
+        return ipaddress.ip_address(ip) in self.network
+
+    def _offset(self, ip):
+        return int(ip) - int(self.network.network_address)
+
+    def _allocatable(self, offset):
+        return self.first <= offset <= self.last and offset not in self._reserved
+
+    def _test(self, offset):
+        return self._bitmap[offset >> 3] & (1 << (offset & 7))
+
+    def _set(self, offset):
+        if self._test(offset):
+            return False
+        self._bitmap[offset >> 3] |= 1 << (offset & 7)
+        self.used += 1
+        return True
+
+    def allocate(self):
+        while self._free:
+            offset = self._free.pop()
+            if self._set(offset):
+                return str(self.network.network_address + offset)
+        return None
+
+    def mark_used(self, ip):
+        offset = self._offset(ipaddress.ip_address(ip))
+        return self._allocatable(offset) and self._set(offset)
+
+    def release(self, ip):
+        offset = self._offset(ipaddress.ip_address(ip))
+        if not self._allocatable(offset) or not self._test(offset):
+            return False
+        self._bitmap[offset >> 3] &= ~(1 << (offset & 7)) & 0xFF
+        self.used -= 1
+        self._free.append(offset)
+        return True
+
+
+# ---------------- IPAM ---------------- #
+class IPAM:
+    def __init__(self, subnets):
+        self.subnets = subnets
+        self._lock = threading.Lock()  # allocations never await, this covers to_thread callers
+
+    def subnet_for(self, ip: str):
+        for subnet in self.subnets:
+            if ip in subnet:
+                return subnet
+        return None
+
+    def allocate(self, parent: str = None):
+        with self._lock:
+            for subnet in self.subnets:
+                if parent is not None and subnet.parent != parent:
+                    continue
+                ip = subnet.allocate()
+                if ip:
+                    return ip, subnet
+        raise IPPoolExhausted("IP pool exhausted. Add another subnet to IP_SUBNETS.")
+
+    def release(self, ip: str):
+        subnet = self.subnet_for(ip) if ip else None
+        if subnet is None:
+            return False
+        with self._lock:
+            return subnet.release(ip)
+
+    def rebuild(self, records):
+        count = 0
+        with self._lock:
+            for _, vps in records:
+                subnet = self.subnet_for(vps.get("ip")) if vps.get("ip") else None
+                if subnet is not None and subnet.mark_used(vps["ip"]):
+                    count += 1
+        return count
+
+    def usage(self):
+        return [(str(s.network), s.parent, s.used, s.capacity) for s in self.subnets]
+
+
+def detect_host_subnet(first: int = 100, last: int = 254):
+    # Same heuristic the old next_ip.txt bootstrap used: the /24 of the host's
+    # default-route source address, handing out .100 upwards.
+    try:
+        result = subprocess.run(['ip', 'route', 'get', '1'], capture_output=True, text=True, check=True)
+    except Exception as e:
+        raise ValueError(f"IP auto-detection failed: {e}. Configure IP_SUBNETS manually.")
+    src = re.search(r'src\s+(\d+\.\d+\.\d+\.\d+)', result.stdout)
+    if not src:
+        raise ValueError("Could not parse host IP. Configure IP_SUBNETS manually.")
+    via = re.search(r'via\s+(\d+\.\d+\.\d+\.\d+)', result.stdout)
+    return Subnet(f"{src.group(1)}/24", gateway=via.group(1) if via else None,
+                  first=first, last=last, reserved=[src.group(1)])
+
+
+def build_ipam(config, default_parent: str = None):
+    if not config:
+        subnet = detect_host_subnet()
+        subnet.parent = default_parent
+        return IPAM([subnet])
+    subnets = []
+    for entry in config:
+        entry = dict(entry)
+        entry.setdefault("parent", default_parent)
+        subnets.append(Subnet(**entry))
+    return IPAM(subnets)
@@ -0,0 +1,222 @@
+import asyncio
+import json
+import os
+import sqlite3
+import time
+
+from telemetry import current_trace, span
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    kind TEXT NOT NULL,
+    lane TEXT NOT NULL,
+    params TEXT NOT NULL,
+    stage TEXT,
+    status TEXT NOT NULL,
+    error TEXT,
+    created REAL NOT NULL,
+    updated REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_status_idx ON jobs (status);
+"""
+
+ACTIVE = ("queued", "running")
+SECRETS = ("password",)  # params only needed to resume a job, dropped once it finished
+
+
+class Job:
+    def __init__(self, id, kind, lane, params, stage=None, status="queued", error=None):
+        self.id = id
+        self.kind = kind
+        self.lane = lane
+        self.params = params
+        self.stage = stage  # last completed stage
+        self.status = status
+        self.error = error
+        self.current = None  # stage in progress
+        self.resumed = False
+
+    @property
+    def timings(self):
+        return self.params.setdefault("timings", {})
+
+    def describe(self, stages):
+        names = [n for n, _ in stages]
+        if self.status == "running" and self.current:
+            return f"⏳ Job #{self.id} `{self.kind}`: {self.current} ({names.index(self.current) + 1}/{len(names)})"
+        if self.status == "done":
+            return f"✅ Job #{self.id} `{self.kind}` finished."
+        if self.status == "failed":
+            return f"❌ Job #{self.id} `{self.kind}` failed at {self.current}: {self.error}"
+        return f"🕒 Job #{self.id} `{self.kind}` queued."
+
+
+# ---------------- Job Queue ---------------- #
+# Jobs are split into named stages. The last completed stage and the job's
+# params are persisted after every stage, so a restart resumes each active
+# job right after the stage it finished. Each lane has its own workers.
+# Finished jobs are kept without their secrets for retention_days.
+class JobQueue:
+    def __init__(self, path: str, workers: dict, retention_days: float = 30):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(SCHEMA)
+        self.workers = workers
+        self.retention_days = retention_days
+        self._kinds = {}
+        self._queues = {}
+        self._tasks = []
+        self._listeners = {}
+        self._done = {}
+
+    def register(self, kind: str, lane: str, stages, on_failure=None):
+        if lane not in self.workers:
+            raise ValueError(f"Unknown job lane {lane}")
+        self._kinds[kind] = (lane, stages, on_failure)
+
+    # ---- persistence ---- #
+    def _save(self, job: Job):
+        params = job.params
+        if job.status not in ACTIVE:
+            params = {k: v for k, v in params.items() if k not in SECRETS}
+        self._conn.execute(
+            "UPDATE jobs SET params = ?, stage = ?, status = ?, error = ?, updated = ? WHERE id = ?",
+            (json.dumps(params), job.stage, job.status, job.error, time.time(), job.id)
+        )
+
+    def _prune(self):
+        # Finished jobs past the retention window go; the rest lose their secrets
+        # (rows written before secrets were dropped at the end of a job)
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            cur = self._conn.execute(
+                "DELETE FROM jobs WHERE status NOT IN (?, ?) AND updated < ?",
+                ACTIVE + (time.time() - self.retention_days * 86400,)
+            )
+            for key in SECRETS:
+                self._conn.execute(
+                    "UPDATE jobs SET params = json_remove(params, ?) WHERE status NOT IN (?, ?) "
+                    "AND json_extract(params, ?) IS NOT NULL", (f"$.{key}",) + ACTIVE + (f"$.{key}",)
+                )
+        return cur.rowcount
+
+    def active(self):
+        rows = self._conn.execute(
+            "SELECT id, kind, lane, params, stage, status, error FROM jobs WHERE status IN (?, ?) ORDER BY id",
+            ACTIVE
+        )
+        return [Job(r[0], r[1], r[2], json.loads(r[3]), r[4], r[5], r[6]) for r in rows]
+
+    def get(self, job_id: int):
+        row = self._conn.execute(
+            "SELECT id, kind, lane, params, stage, status, error FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        return Job(row[0], row[1], row[2], json.loads(row[3]), row[4], row[5], row[6]) if row else None
+
+    # ---- submission ---- #
+    def submit(self, kind: str, params: dict, listener=None):
+        lane, _, _ = self._kinds[kind]
+        params.setdefault("trace", current_trace())  # logs of the job share the submitter's correlation id
+        now = time.time()
+        cur = self._conn.execute(
+            "INSERT INTO jobs (kind, lane, params, status, created, updated) VALUES (?, ?, ?, 'queued', ?, ?)",
+            (kind, lane, json.dumps(params), now, now)
+        )
+        job = Job(cur.lastrowid, kind, lane, params)
+        if listener is not None:
+            self._listeners[job.id] = listener
+        self._done[job.id] = asyncio.get_running_loop().create_future()
+        self._queues[lane].put_nowait(job)
+        return job
+
+    async def wait(self, job: Job):
+        return await asyncio.shield(self._done[job.id])
+
+    async def run(self, kind: str, params: dict, listener=None):
+        return await self.wait(self.submit(kind, params, listener))
+
+    def depth(self, lane: str):
+        return self._queues[lane].qsize()
+
+    def describe(self, job: Job):
+        return job.describe(self._kinds[job.kind][1])
+
+    # ---- workers ---- #
+    async def _notify(self, job: Job):
+        listener = self._listeners.get(job.id)
+        if listener is None:
+            return
+        try:
+            await listener(job)
+        except Exception as e:
+            print(f"⚠️ Job #{job.id} progress update failed: {e}")
+
+    async def _execute(self, job: Job):
+        with span("job", job.kind, trace_id=job.params.get("trace") or f"job-{job.id}", job=job.id) as s:
+            await self._run_stages(job)
+            s.error = job.error
+        self._listeners.pop(job.id, None)
+        done = self._done.pop(job.id, None)
+        if done is not None and not done.done():
+            done.set_result(job)
+
+    async def _run_stages(self, job: Job):
+        _, stages, on_failure = self._kinds[job.kind]
+        names = [n for n, _ in stages]
+        start = names.index(job.stage) + 1 if job.stage in names else 0
+        job.status = "running"
+        try:
+            for name, fn in stages[start:]:
+                job.current = name
+                self._save(job)
+                await self._notify(job)
+                began = time.monotonic()
+                with span("stage", f"{job.kind}.{name}"):
+                    await fn(job)
+                job.timings[name] = job.timings.get(name, 0) + time.monotonic() - began
+                job.stage = name
+                self._save(job)
+            job.status = "done"
+        except Exception as e:
+            job.status = "failed"
+            job.error = str(e) or type(e).__name__
+            if on_failure is not None:
+                try:
+                    await on_failure(job)
+                except Exception as cleanup_error:
+                    print(f"⚠️ Job #{job.id} cleanup failed: {cleanup_error}")
+        self._save(job)
+        print(f"📋 Job #{job.id} {job.kind} {job.status}" + (f": {job.error}" if job.error else ""))
+        await self._notify(job)
+
+    async def _worker(self, lane: str):
+        queue = self._queues[lane]
+        while True:
+            job = await queue.get()
+            try:
+                await self._execute(job)
+            finally:
+                queue.task_done()
+
+    def start(self, resume: bool = True):
+        # resume=False leaves active jobs to the process that owns them (e.g. the CLI next to the bot)
+        if self._tasks:
+            return
+        removed = self._prune()
+        if removed:
+            print(f"🧹 Removed {removed} finished jobs older than {self.retention_days} days")
+        loop = asyncio.get_running_loop()
+        for lane in self.workers:
+            self._queues[lane] = asyncio.Queue()
+        for job in self.active() if resume else []:
+            if job.kind not in self._kinds:
+                continue
+            job.resumed = True
+            self._done[job.id] = loop.create_future()
+            self._queues[job.lane].put_nowait(job)
+            print(f"🔁 Resuming job #{job.id} {job.kind} after stage {job.stage or '-'}")
+        for lane, count in self.workers.items():
+            for _ in range(count):
+                self._tasks.append(asyncio.create_task(self._worker(lane)))
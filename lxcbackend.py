@@ -0,0 +1,494 @@
+import asyncio
+import os
+import re
+import shutil
+import signal
+import tempfile
+import time
+
+from backend import Backend, BackendError
+from backups import in_background
+from capacity import detect_ram_gb, detect_topology
+from execstream import CHUNK, ExecStream
+from lxcconfig import ConfigStore
+from telemetry import span
+
+try:
+    import lxc  # liblxc bindings (python3-lxc); without them the lxc-* tools are used
+except ImportError:
+    lxc = None
+
+MONITOR_LINE = re.compile(r"'(?P<name>[^']+)' changed state to \[(?P<state>\w+)\]")
+ATTACH_PATH = "PATH=/usr/local/sbin:/usr/local/bin:/usr/sbin:/usr/bin:/sbin:/bin"
+# Config keys owned by configure(); everything else stays as the template wrote it
+MANAGED_KEYS = ("lxc.net.", "lxc.cgroup.", "lxc.cgroup2.", "lxc.cap.", "lxc.apparmor.")
+
+
+def vps_config(nic: dict, ram_gb: int, cpu: int, cpuset: str = None):
+    if cpuset:
+        cpus = cpuset  # cores picked by the capacity scheduler
+    elif cpu > 1:
+        cpus = f"0-{cpu-1}"
+    else:
+        cpus = "0"  # Limit to 1 core by default
+    return [
+        ("lxc.net.0.type", "macvlan"),
+        ("lxc.net.0.link", nic["parent"]),
+        ("lxc.net.0.name", "eth0"),
+        ("lxc.net.0.flags", "up"),
+        ("lxc.net.0.ipv4", f"{nic['ip']}/{nic['prefixlen']}"),
+        ("lxc.net.0.ipv4.gateway", nic["gateway"]),
+        ("lxc.net.0.ipv4.dns", "8.8.8.8 1.1.1.1"),
+        ("lxc.cgroup.devices.allow", "a"),
+        ("lxc.cap.drop", ""),
+        ("lxc.apparmor.profile", "unconfined"),
+        ("lxc.cgroup2.memory.max", ram_gb * 1024 * 1024 * 1024),  # bytes
+        ("lxc.cgroup.cpuset.cpus", cpus),
+    ]
+
+
+def _first_pid(cgroup: str):
+    # systemd inside the container moves init into a child cgroup
+    for path, _, _ in os.walk(cgroup):
+        with open(f"{path}/cgroup.procs") as f:
+            pid = f.readline().strip()
+        if pid:
+            return pid
+    return None
+
+
+def read_usage(cgroup_root: str):
+    # Plain file reads from cgroup v2 and the container's netns, no lxc-* calls
+    samples = {}
+    for entry in os.listdir(cgroup_root):
+        if not entry.startswith("lxc.payload."):
+            continue
+        cgroup = os.path.join(cgroup_root, entry)
+        sample = {"cpu": 0, "memory": 0, "rx": 0, "tx": 0}
+        try:
+            with open(f"{cgroup}/cpu.stat") as f:
+                for line in f:
+                    if line.startswith("usage_usec "):
+                        sample["cpu"] = int(line.split()[1]) * 1000
+            with open(f"{cgroup}/memory.current") as f:
+                sample["memory"] = int(f.read())
+            pid = _first_pid(cgroup)
+            if pid:
+                with open(f"/proc/{pid}/net/dev") as f:
+                    for line in f:
+                        iface, _, counters = line.partition(":")
+                        if iface.strip() == "eth0":
+                            fields = counters.split()
+                            sample["rx"], sample["tx"] = int(fields[0]), int(fields[8])
+        except (OSError, ValueError):
+            continue  # container stopped mid-read
+        samples[entry[len("lxc.payload."):]] = sample
+    return samples
+
+
+# ---------------- LXC backend ---------------- #
+# Classic LXC on this host. Containers are driven in-process through the
+# liblxc bindings (blocking calls run in a worker thread) when they are
+# installed, otherwise through the lxc-* tools. New VPSes are cloned from a
+# local, never-started template container per OS
+# (tmpl-<os>-<release>-<stamp>), so the download template runs once per
+# refresh instead of once per VPS.
+class LXCBackend(Backend):
+    kind = "lxc"
+    usage_fields = ("cpu", "memory", "rx", "tx")
+
+    def __init__(self, path: str = "/var/lib/lxc", releases: dict = None, pristine: str = "snap0",
+                 cow_clone: bool = False, template_refresh_hours: float = 24,
+                 cgroup_root: str = "/sys/fs/cgroup", bindings: bool = True):
+        self.path = path
+        self.releases = releases or {}
+        self.pristine = pristine  # liblxc names snapshots snap0, snap1, ... in order
+        self.cow_clone = cow_clone  # btrfs/zfs/overlay storage: clone templates copy-on-write
+        self.template_refresh_hours = template_refresh_hours
+        self.cgroup_root = cgroup_root
+        self.lib = lxc if bindings else None
+        self.configs = ConfigStore()
+        self.templates = {}
+        self._template_lock = asyncio.Lock()
+        self._task = None
+
+    async def run(self, *args):
+        with span("subprocess", args[0]):
+            proc = await asyncio.create_subprocess_exec(
+                *args, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            out, err = await proc.communicate()
+        return proc.returncode, out.decode().strip(), err.decode().strip()
+
+    async def _call(self, op: str, fn, *args):
+        with span("liblxc", op):
+            return await asyncio.to_thread(fn, *args)
+
+    def _container(self, name: str):
+        return self.lib.Container(name, self.path)
+
+    async def resources(self):
+        try:
+            disk_gb = shutil.disk_usage(self.path).total / 1024 ** 3
+        except OSError as e:
+            print(f"⚠️ {self.path} size unknown: {e}")
+            disk_gb = None
+        return detect_topology(), detect_ram_gb(), disk_gb
+
+    # ---- templates ---- #
+    async def _names(self):
+        if self.lib:
+            return list(await self._call("list", lambda: self.lib.list_containers(config_path=self.path)))
+        code, out, _ = await self.run("lxc-ls", "-1", "-P", self.path)
+        return out.split() if code == 0 else []
+
+    async def list_templates(self, os_type: str):
+        prefix = f"tmpl-{os_type}-{self.releases[os_type]}-"
+        return sorted(n for n in await self._names() if n.startswith(prefix))
+
+    async def _download(self, name: str, os_type: str, release: str, *extra):
+        args = ("-d", os_type, "-r", release, "-a", "amd64", *extra)
+        if self.lib:
+            if not await self._call("create", lambda: self._container(name).create("download", 0, args)):
+                raise BackendError(f"Download of {os_type}/{release} into {name} failed")
+            return
+        code, _, err = await self.run("lxc-create", "-t", "download", "-n", name, "-P", self.path, "--", *args)
+        if code != 0:
+            raise BackendError(err)
+
+    async def build_template(self, os_type: str):
+        release = self.releases[os_type]
+        name = f"tmpl-{os_type}-{release}-{time.strftime('%Y%m%d%H%M')}"
+        print(f"📥 Building template {name}")
+        try:
+            await self._download(name, os_type, release)
+        except BackendError as e:
+            raise BackendError(f"Template build failed: {e}")
+        self.templates[os_type] = name
+        return name
+
+    async def ensure_template(self, os_type: str):
+        async with self._template_lock:
+            if os_type not in self.templates:
+                existing = await self.list_templates(os_type)
+                if existing:
+                    self.templates[os_type] = existing[-1]
+                else:
+                    await self.build_template(os_type)
+            return self.templates[os_type]
+
+    async def refresh_templates(self):
+        for os_type in self.releases:
+            try:
+                await self.build_template(os_type)  # swapped in once built, creates keep using the old one
+            except BackendError as e:
+                print(f"⚠️ {e}")
+            # Older templates go once nothing is cloned from them any more
+            for old in (await self.list_templates(os_type))[:-1]:
+                await self.destroy(old)
+
+    async def _template_refresher(self):
+        for os_type in self.releases:
+            try:
+                await self.ensure_template(os_type)
+            except BackendError as e:
+                print(f"⚠️ {e}")
+        while True:
+            await asyncio.sleep(self.template_refresh_hours * 3600)
+            await self.refresh_templates()
+
+    def start_background(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._template_refresher())
+
+    # ---- containers ---- #
+    async def _clone(self, template: str, name: str):
+        if self.lib:
+            flags = self.lib.LXC_CLONE_SNAPSHOT if self.cow_clone else 0
+            clone = await self._call("clone", lambda: self._container(template).clone(name, self.path, flags))
+            return (True, "") if clone else (False, "liblxc clone failed")
+        clone = ["-s"] if self.cow_clone else []
+        code, _, err = await self.run("lxc-copy", "-n", template, "-N", name, "-P", self.path, *clone)
+        return code == 0, err
+
+    async def create(self, name: str, os_type: str, disk_gb: int):
+        if os_type in self.releases:
+            try:
+                template = await self.ensure_template(os_type)
+                ok, err = await self._clone(template, name)
+                if ok:
+                    return
+                print(f"⚠️ Clone of {template} failed, using the download template: {err}")
+            except BackendError as e:
+                print(f"⚠️ {e}")
+        await self._download(name, os_type, self.releases.get(os_type, "12"), "-D", f"{disk_gb}G")
+
+    async def configure(self, name: str, nic: dict, ram_gb: int, cpu: int, disk_gb: int, cpuset: str = None):
+        try:
+            await self.configs.update(f"{self.path}/{name}/config", MANAGED_KEYS, vps_config(nic, ram_gb, cpu, cpuset))
+        except FileNotFoundError:
+            raise BackendError("LXC config not found")
+
+    async def launch(self, name: str, os_type: str, nic: dict, ram_gb: int = 1, cpu: int = 1,
+                     disk_gb: int = 10, cpuset: str = None, resumed: bool = False):
+        if not (resumed and await self.exists(name)):
+            await self.create(name, os_type, disk_gb)
+        await self.configure(name, nic, ram_gb, cpu, disk_gb, cpuset)
+        # Taken while still stopped, right after configuration
+        if self.pristine and not await self.has_snapshot(name, self.pristine):
+            await self.snapshot(name, self.pristine)
+        if await self.status(name) != "RUNNING":
+            await self.start(name)
+
+    async def start(self, name: str):
+        if self.lib:
+            if not await self._call("start", lambda: self._container(name).start()):
+                raise BackendError(f"Failed to start {name}")
+            return
+        code, _, err = await self.run("lxc-start", "-n", name, "-P", self.path, "-d")
+        if code != 0:
+            raise BackendError(err)
+
+    async def stop(self, name: str, force: bool = False):
+        if self.lib:
+            def stop():
+                c = self._container(name)
+                if not c.running:
+                    return False
+                return c.stop() if force else (c.shutdown(30) or c.stop())
+            if not await self._call("stop", stop):
+                raise BackendError(f"{name} is not running")
+            return
+        code, _, err = await self.run("lxc-stop", "-n", name, "-P", self.path, *(["-k"] if force else ["-t", "30"]))
+        if code != 0:
+            raise BackendError(err)
+
+    async def restart(self, name: str):
+        try:
+            await self.stop(name)
+        except BackendError:
+            pass  # already stopped
+        try:
+            await self.start(name)
+        except BackendError as e:
+            raise BackendError(f"Restart failed after stop: {e}") from e
+
+    async def status(self, name: str):
+        if self.lib:
+            return await self._call("state", lambda: self._container(name).state if self._container(name).defined else "unknown")
+        code, out, _ = await self.run("lxc-info", "-n", name, "-P", self.path, "-sH")
+        if code == 0 and out:
+            for line in out.split('\n'):
+                # -H prints the bare state; older lxc-info still prefixes "State:"
+                if line.startswith("State:"):
+                    return line.split(":", 1)[1].strip()
+                return line.strip()
+        return "unknown"
+
+    async def bulk_status(self):
+        if self.lib:
+            return await self._call("state", lambda: {
+                c.name: c.state for c in self.lib.list_containers(as_object=True, config_path=self.path)
+            })
+        # One lxc-ls for every container instead of one lxc-info per lookup
+        code, out, err = await self.run("lxc-ls", "-f", "-F", "NAME,STATE", "-P", self.path)
+        if code != 0:
+            raise BackendError(err)
+        result = {}
+        for line in out.splitlines()[1:]:
+            fields = line.split()
+            if len(fields) >= 2:
+                result[fields[0]] = fields[1]
+        return result
+
+    async def exists(self, name: str):
+        if self.lib:
+            return await self._call("defined", lambda: self._container(name).defined)
+        code, _, _ = await self.run("lxc-info", "-n", name, "-P", self.path)
+        return code == 0
+
+    async def exec(self, name: str, command: list, environment: dict = None):
+        env = [ATTACH_PATH] + [f"{k}={v}" for k, v in (environment or {}).items()]
+        if self.lib:
+            def attach():
+                with tempfile.TemporaryFile() as out, tempfile.TemporaryFile() as err:
+                    status = self._container(name).attach_wait(
+                        self.lib.attach_run_command, command, env_policy=self.lib.LXC_ATTACH_CLEAR_ENV,
+                        extra_env_vars=env, stdout=out, stderr=err,
+                    )
+                    out.seek(0)
+                    err.seek(0)
+                    code = os.waitstatus_to_exitcode(status) if status >= 0 else status
+                    return code, out.read().decode().strip(), err.read().decode().strip()
+            return await self._call("attach", attach)
+        args = [a for var in env for a in ("--set-var", var)]
+        return await self.run("lxc-attach", "-n", name, "-P", self.path, "--clear-env", *args, "--", *command)
+
+    async def stream(self, name: str, command: list, environment: dict = None):
+        env = [ATTACH_PATH] + [f"{k}={v}" for k, v in (environment or {}).items()]
+        if self.lib:
+            return await self._attach_stream(name, command, env)
+        args = [a for var in env for a in ("--set-var", var)]
+        proc = await asyncio.create_subprocess_exec(
+            "lxc-attach", "-n", name, "-P", self.path, "--clear-env", *args, "--", *command,
+            stdin=asyncio.subprocess.DEVNULL, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE,
+            limit=CHUNK,
+        )
+        return ExecStream({"stdout": lambda: proc.stdout.read(CHUNK), "stderr": lambda: proc.stderr.read(CHUNK)},
+                          proc.wait, proc.kill)
+
+    async def _attach_stream(self, name: str, command: list, env: list):
+        def attach():
+            out_r, out_w = os.pipe()
+            err_r, err_w = os.pipe()
+            null = os.open(os.devnull, os.O_RDONLY)
+            try:
+                pid = self._container(name).attach(
+                    self.lib.attach_run_command, command, env_policy=self.lib.LXC_ATTACH_CLEAR_ENV,
+                    extra_env_vars=env, stdin=null, stdout=out_w, stderr=err_w,
+                )
+            finally:
+                for fd in (null, out_w, err_w):
+                    os.close(fd)
+            if pid < 0:
+                os.close(out_r)
+                os.close(err_r)
+                raise BackendError(f"Attach to {name} failed")
+            return pid, out_r, err_r
+
+        pid, out_r, err_r = await self._call("attach", attach)
+        loop = asyncio.get_running_loop()
+        readers, transports = {}, []
+        for fd, pipe in (("stdout", out_r), ("stderr", err_r)):
+            reader = asyncio.StreamReader(limit=CHUNK)
+            transport, _ = await loop.connect_read_pipe(lambda r=reader: asyncio.StreamReaderProtocol(r),
+                                                        os.fdopen(pipe, "rb", 0))
+            readers[fd] = lambda r=reader: r.read(CHUNK)
+            transports.append(transport)
+
+        async def wait():
+            _, status = await asyncio.to_thread(os.waitpid, pid, 0)
+            return os.waitstatus_to_exitcode(status)
+
+        async def close():
+            for transport in transports:
+                transport.close()
+            try:
+                await asyncio.to_thread(os.waitpid, pid, 0)  # reap it if nobody waited
+            except ChildProcessError:
+                pass
+
+        return ExecStream(readers, wait, lambda: os.kill(pid, signal.SIGKILL), close)
+
+    async def addresses(self, name: str):
+        if self.lib:
+            return list(await self._call("get_ips", lambda: self._container(name).get_ips(interface="eth0", family="inet")))
+        code, out, _ = await self.run("lxc-info", "-n", name, "-P", self.path, "-iH")
+        return out.split() if code == 0 else []
+
+    async def destroy(self, name: str):
+        self.configs.forget(f"{self.path}/{name}/config")
+        if self.lib:
+            def destroy():
+                c = self._container(name)
+                if c.running:
+                    c.shutdown(30) or c.stop()
+                if c.defined:
+                    for snapshot in c.snapshot_list() or ():
+                        c.snapshot_destroy(snapshot[0])
+                    c.destroy()
+            await self._call("destroy", destroy)
+            return
+        await self.run("lxc-stop", "-n", name, "-P", self.path, "-t", "30")
+        await self.run("lxc-destroy", "-n", name, "-P", self.path, "-s")
+
+    async def snapshot(self, name: str, snapshot: str):
+        # LXC names snapshots itself (snap0, snap1, ...), so only the pristine
+        # one, the first a container gets, can be asked for by name
+        if snapshot != self.pristine:
+            raise BackendError(f"LXC can't name snapshots, only {self.pristine} is supported")
+        if self.lib:
+            if not await self._call("snapshot", lambda: self._container(name).snapshot()):
+                raise BackendError("Snapshot failed")
+        else:
+            code, _, err = await self.run("lxc-snapshot", "-n", name, "-P", self.path)
+            if code != 0:
+                raise BackendError(f"Snapshot failed: {err}")
+        if not await self.has_snapshot(name, snapshot):
+            raise BackendError(f"Snapshot of {name} was not taken as {snapshot}")
+
+    async def has_snapshot(self, name: str, snapshot: str):
+        if self.lib:
+            snapshots = await self._call("snapshot_list", lambda: self._container(name).snapshot_list())
+            return any(s[0] == snapshot for s in snapshots or ())
+        code, out, _ = await self.run("lxc-snapshot", "-n", name, "-P", self.path, "-L")
+        return code == 0 and any(line.split()[0] == snapshot for line in out.splitlines() if line.strip())
+
+    async def restore(self, name: str, snapshot: str):
+        try:
+            await self.stop(name)
+        except BackendError:
+            pass  # already stopped
+        if self.lib:
+            if not await self._call("snapshot_restore", lambda: self._container(name).snapshot_restore(snapshot)):
+                raise BackendError("Restore failed")
+        else:
+            code, _, err = await self.run("lxc-snapshot", "-n", name, "-P", self.path, "-r", snapshot)
+            if code != 0:
+                raise BackendError(f"Restore failed: {err}")
+        await self.start(name)
+
+    async def backup(self, name: str, writer):
+        # Config and rootfs straight from the container directory, snapshots left out
+        await writer.from_tree(f"{self.path}/{name}", skip=("snaps",))
+
+    async def restore_backup(self, name: str, reader):
+        # Extracted next to the container while it keeps running, then swapped in
+        target, staging, old = f"{self.path}/{name}", f"{self.path}/.restore-{name}", f"{self.path}/.old-{name}"
+        for leftover in (staging, old):  # from an interrupted restore
+            await in_background(shutil.rmtree, leftover, True)
+        try:
+            await reader.extract(staging)
+        except BaseException:
+            await in_background(shutil.rmtree, staging, True)
+            raise
+
+        def swap():
+            os.makedirs(old, exist_ok=True)
+            for entry in os.listdir(staging):
+                if os.path.lexists(f"{target}/{entry}"):
+                    os.rename(f"{target}/{entry}", f"{old}/{entry}")
+                os.rename(f"{staging}/{entry}", f"{target}/{entry}")
+            os.rmdir(staging)
+
+        try:
+            await self.stop(name, force=True)
+        except BackendError:
+            pass  # already stopped
+        await asyncio.to_thread(swap)
+        self.configs.forget(f"{target}/config")
+        await in_background(shutil.rmtree, old, True)
+
+    async def usage(self):
+        return await asyncio.to_thread(read_usage, self.cgroup_root)
+
+    async def events(self):
+        # lxc-monitor streams every container's state transitions; liblxc has
+        # no binding for it
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "lxc-monitor", "-P", self.path, "-n", ".*",
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+            )
+        except OSError as e:
+            raise BackendError(f"lxc-monitor unavailable: {e}")
+        try:
+            async for line in proc.stdout:
+                match = MONITOR_LINE.search(line.decode())
+                if match:
+                    yield match["name"], match["state"]
+            await proc.wait()
+            raise BackendError(f"lxc-monitor exited with {proc.returncode}")
+        finally:
+            if proc.returncode is None:
+                proc.kill()
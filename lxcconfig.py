@@ -0,0 +1,117 @@
+import asyncio
+import os
+import tempfile
+
+
+# ---------------- Model ---------------- #
+# An LXC config file as an ordered list of lines. Comments, blank lines and
+# keys nobody manages keep their exact text, so a rewrite only touches the
+# keys that actually changed.
+class LXCConfig:
+    def __init__(self, lines: list = None):
+        self.lines = lines or []  # [(key or None, value, raw text)]
+
+    @classmethod
+    def parse(cls, text: str):
+        lines = []
+        for raw in text.splitlines():
+            stripped = raw.strip()
+            if not stripped or stripped.startswith("#") or "=" not in stripped:
+                lines.append((None, None, raw))
+                continue
+            key, _, value = stripped.partition("=")
+            lines.append((key.strip(), value.strip(), raw))
+        return cls(lines)
+
+    def render(self):
+        return "".join(raw + "\n" for _, _, raw in self.lines)
+
+    def copy(self):
+        return LXCConfig(list(self.lines))
+
+    def get(self, key: str):
+        # Every value of key in file order; list keys like lxc.cgroup.devices.allow repeat
+        return [value for k, value, _ in self.lines if k == key]
+
+    def update(self, prefixes: tuple, entries: list):
+        # Makes the keys under prefixes exactly entries [(key, value)]. A key
+        # whose values are unchanged keeps its lines, a changed key is
+        # rewritten where it first appeared, new keys are appended and keys
+        # no longer wanted are dropped. -> set of keys that changed
+        wanted = {}
+        for key, value in entries:
+            wanted.setdefault(key, []).append(str(value))
+        changed = set()
+        lines, seen = [], set()
+        for key, value, raw in self.lines:
+            if key is None or not key.startswith(prefixes):
+                lines.append((key, value, raw))
+                continue
+            if key in seen:
+                continue
+            seen.add(key)
+            if key not in wanted:
+                changed.add(key)
+            elif self.get(key) == wanted[key]:
+                lines += [line for line in self.lines if line[0] == key]
+            else:
+                changed.add(key)
+                lines += [(key, v, f"{key} = {v}") for v in wanted[key]]
+        for key, values in wanted.items():
+            if key not in seen:
+                changed.add(key)
+                lines += [(key, v, f"{key} = {v}") for v in values]
+        self.lines = lines
+        return changed
+
+
+# ---------------- Store ---------------- #
+# Parsed configs cached by path and keyed by mtime, so repeated reconfigures
+# don't re-read the file; anyone editing it by hand just causes a re-parse.
+# File I/O runs in a worker thread and writes go through a temporary file
+# and rename, so a crash mid-write never leaves a truncated config.
+class ConfigStore:
+    def __init__(self):
+        self._cache = {}  # path -> ((mtime_ns, size), LXCConfig)
+
+    def _load(self, path: str):
+        st = os.stat(path)
+        cached = self._cache.get(path)
+        if cached and cached[0] == (st.st_mtime_ns, st.st_size):
+            return cached[1].copy()
+        with open(path) as f:
+            config = LXCConfig.parse(f.read())
+        self._cache[path] = ((st.st_mtime_ns, st.st_size), config)
+        return config.copy()
+
+    def _write(self, path: str, config: LXCConfig):
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".config-")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(config.render())
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, os.stat(path).st_mode & 0o7777)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        st = os.stat(path)
+        self._cache[path] = ((st.st_mtime_ns, st.st_size), config.copy())
+
+    def _update(self, path: str, prefixes: tuple, entries: list):
+        config = self._load(path)
+        changed = config.update(prefixes, entries)
+        if changed:
+            self._write(path, config)
+        return changed
+
+    async def read(self, path: str):
+        return await asyncio.to_thread(self._load, path)
+
+    async def update(self, path: str, prefixes: tuple, entries: list):
+        # -> set of keys that changed; the file is left alone when none did
+        return await asyncio.to_thread(self._update, path, prefixes, entries)
+
+    def forget(self, path: str):
+        self._cache.pop(path, None)
@@ -0,0 +1,316 @@
+import asyncio
+import re
+import ssl
+import aiohttp
+
+from backend import BackendError
+from backups import BLOCK
+from execstream import ExecStream
+from telemetry import span
+
+LXD_SOCKET = "/var/snap/lxd/common/lxd/unix.socket"
+IMAGE_SERVER = "https://images.linuxcontainers.org"
+
+# Instance names, operation ids and fingerprints in a path -> {id}, so spans
+# and metrics are labelled per endpoint rather than per VPS
+_ROUTE_ID = re.compile(r"(/(?:instances|operations|images|profiles|storage-pools|snapshots|backups|logs|aliases|volumes)/)[^/?]+")
+
+
+def route_of(path: str):
+    return _ROUTE_ID.sub(r"\1{id}", path.partition("?")[0])
+
+
+class LXDError(BackendError):
+    def __init__(self, message: str, code: int = None):
+        super().__init__(message)
+        self.code = code
+
+
+# ---------------- LXD REST client ---------------- #
+# One pooled aiohttp session on the daemon's unix socket, or on a remote
+# daemon's HTTPS endpoint authenticated with a trusted client certificate.
+# Async operations are awaited through /1.0/operations/<id>/wait.
+class LXDClient:
+    def __init__(self, socket_path: str = LXD_SOCKET, pool_size: int = 16, timeout: float = 300,
+                 url: str = None, cert: str = None, key: str = None, server_cert: str = None):
+        self.socket_path = socket_path
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.url = url.rstrip("/") if url else None
+        self.cert = cert
+        self.key = key
+        self.server_cert = server_cert  # pin a self-signed server certificate
+        self.base = self.url or "http://lxd"
+        self._session = None
+        self._profiles = set()  # profiles known to exist on the daemon
+        self._profile_lock = asyncio.Lock()
+
+    def _connector(self):
+        if not self.url:
+            return aiohttp.UnixConnector(path=self.socket_path, limit=self.pool_size)
+        context = ssl.create_default_context(cafile=self.server_cert)
+        if self.server_cert:
+            context.check_hostname = False  # LXD certificates are issued for the hostname, not the address
+        context.load_cert_chain(self.cert, self.key)
+        return aiohttp.TCPConnector(ssl=context, limit=self.pool_size)
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            connector = self._connector()
+            self._session = aiohttp.ClientSession(
+                connector=connector, timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method: str, path: str, body=None, params=None, client_timeout: aiohttp.ClientTimeout = None):
+        # client_timeout overrides the session's timeout, for waits on long operations
+        session = self._get_session()
+        extra = {"timeout": client_timeout} if client_timeout else {}
+        with span("lxd", f"{method} {route_of(path)}"):
+            try:
+                async with session.request(method, f"{self.base}{path}", json=body, params=params, **extra) as resp:
+                    data = await resp.json(content_type=None)
+            except aiohttp.ClientError as e:
+                raise LXDError(f"LXD request failed: {e}")
+            except asyncio.TimeoutError:
+                raise LXDError(f"LXD request timed out after {(client_timeout or session.timeout).total}s")
+            if data.get("type") == "error":
+                raise LXDError(data.get("error") or "unknown error", data.get("error_code"))
+            return data
+
+    async def raw(self, path: str):
+        session = self._get_session()
+        with span("lxd", f"GET {route_of(path)}"):
+            try:
+                async with session.get(f"{self.base}{path}") as resp:
+                    return await resp.read()
+            except aiohttp.ClientError as e:
+                raise LXDError(f"LXD request failed: {e}")
+            except asyncio.TimeoutError:
+                raise LXDError(f"LXD request timed out after {self.timeout}s")
+
+    async def wait(self, response, timeout: int = None):
+        if response.get("type") != "async":
+            return response.get("metadata")
+        op = response["operation"]
+        # Image pulls and imports can outlast the session's total timeout; the
+        # wait is only bounded by the operation's own timeout, if it has one
+        limit = aiohttp.ClientTimeout(total=timeout + 30 if timeout else None, sock_connect=self.timeout)
+        data = await self.request("GET", f"{op}/wait", params={"timeout": str(timeout or -1)}, client_timeout=limit)
+        meta = data.get("metadata") or {}
+        if meta.get("status") != "Success":
+            raise LXDError(meta.get("err") or f"Operation {meta.get('status', 'failed')}")
+        return meta
+
+    async def call(self, method: str, path: str, body=None, params=None, timeout: int = None):
+        return await self.wait(await self.request(method, path, body, params), timeout)
+
+    # ---- instances ---- #
+    async def instance(self, name: str):
+        return await self.call("GET", f"/1.0/instances/{name}")
+
+    async def exists(self, name: str):
+        try:
+            await self.instance(name)
+            return True
+        except LXDError as e:
+            if e.code == 404:
+                return False
+            raise
+
+    async def state(self, name: str):
+        return await self.call("GET", f"/1.0/instances/{name}/state")
+
+    async def status(self, name: str):
+        return (await self.instance(name))["status"].upper()
+
+    async def create(self, definition: dict, start: bool = False):
+        # "start" creates and boots the instance as a single operation
+        return await self.call("POST", "/1.0/instances", dict(definition, start=start))
+
+    async def update(self, name: str, patch: dict):
+        return await self.call("PATCH", f"/1.0/instances/{name}", patch)
+
+    async def rename(self, name: str, new_name: str):
+        return await self.call("POST", f"/1.0/instances/{name}", {"name": new_name})
+
+    async def snapshot(self, name: str, snapshot: str):
+        return await self.call("POST", f"/1.0/instances/{name}/snapshots", {"name": snapshot})
+
+    async def has_snapshot(self, name: str, snapshot: str):
+        try:
+            await self.call("GET", f"/1.0/instances/{name}/snapshots/{snapshot}")
+            return True
+        except LXDError as e:
+            if e.code == 404:
+                return False
+            raise
+
+    async def restore(self, name: str, snapshot: str):
+        return await self.call("PUT", f"/1.0/instances/{name}", {"restore": snapshot})
+
+    async def change_state(self, name: str, action: str, timeout: int = 30, force: bool = False):
+        body = {"action": action, "timeout": timeout, "force": force}
+        return await self.call("PUT", f"/1.0/instances/{name}/state", body)
+
+    async def delete(self, name: str, force: bool = False):
+        if force:
+            try:
+                await self.change_state(name, "stop", timeout=-1, force=True)
+            except LXDError:
+                pass  # already stopped
+        return await self.call("DELETE", f"/1.0/instances/{name}")
+
+    async def exec(self, name: str, command: list, environment: dict = None):
+        body = {
+            "command": command, "environment": environment or {},
+            "record-output": True, "interactive": False, "wait-for-websocket": False,
+        }
+        meta = await self.call("POST", f"/1.0/instances/{name}/exec", body)
+        result = meta.get("metadata") or {}
+        logs = result.get("output") or {}
+        out, err = await asyncio.gather(
+            self.raw(logs["1"]) if "1" in logs else asyncio.sleep(0, b""),
+            self.raw(logs["2"]) if "2" in logs else asyncio.sleep(0, b""),
+        )
+        for path in logs.values():
+            try:
+                await self.request("DELETE", path)
+            except LXDError:
+                pass
+        return result.get("return", -1), out.decode().strip(), err.decode().strip()
+
+    async def exec_stream(self, name: str, command: list, environment: dict = None):
+        # Output arrives over the operation's websockets as it is written,
+        # instead of being recorded to log files and fetched at the end
+        body = {
+            "command": command, "environment": environment or {},
+            "record-output": False, "interactive": False, "wait-for-websocket": True,
+        }
+        response = await self.request("POST", f"/1.0/instances/{name}/exec", body)
+        op = response["operation"]
+        fds = ((response.get("metadata") or {}).get("metadata") or {}).get("fds") or {}
+        session = self._get_session()
+        sockets = {}
+        try:
+            # The command only starts once every websocket is connected
+            for fd in ("0", "1", "2", "control"):
+                sockets[fd] = await session.ws_connect(f"{self.base}{op}/websocket?secret={fds[fd]}",
+                                                       timeout=None, receive_timeout=None)
+            await sockets["0"].close()  # no stdin
+        except (aiohttp.ClientError, KeyError) as e:
+            for ws in sockets.values():
+                await ws.close()
+            raise LXDError(f"LXD exec stream failed: {e}")
+
+        def reader(ws):
+            async def read():
+                msg = await ws.receive()
+                return msg.data if msg.type == aiohttp.WSMsgType.BINARY else b""
+            return read
+
+        async def wait():
+            meta = await self.wait(response)
+            return (meta.get("metadata") or {}).get("return", -1)
+
+        async def kill():
+            await sockets["control"].send_json({"command": "signal", "signal": 9})
+
+        async def close():
+            for ws in sockets.values():
+                await ws.close()
+
+        return ExecStream({"stdout": reader(sockets["1"]), "stderr": reader(sockets["2"])}, wait, kill, close)
+
+    # ---- backups ---- #
+    async def create_backup(self, name: str, backup: str, timeout: int = None):
+        # Uncompressed, so unchanged files give the same blocks in every export.
+        # Snapshots are included so a restore keeps the pristine snapshot
+        # reinstalls roll back to; their files mostly dedupe against the instance's.
+        return await self.call("POST", f"/1.0/instances/{name}/backups", {
+            "name": backup, "instance_only": False, "optimized_storage": False, "compression_algorithm": "none",
+        }, timeout=timeout)
+
+    async def delete_backup(self, name: str, backup: str):
+        return await self.call("DELETE", f"/1.0/instances/{name}/backups/{backup}")
+
+    async def export_backup(self, name: str, backup: str):
+        # Yields the backup tarball in blocks as it is read; no total timeout
+        session = self._get_session()
+        try:
+            async with session.get(f"{self.base}/1.0/instances/{name}/backups/{backup}/export",
+                                   timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout)) as resp:
+                if resp.status >= 400:
+                    data = await resp.json(content_type=None)
+                    raise LXDError(data.get("error") or f"HTTP {resp.status}", resp.status)
+                async for block in resp.content.iter_chunked(BLOCK):
+                    yield block
+        except aiohttp.ClientError as e:
+            raise LXDError(f"LXD backup export failed: {e}")
+        except asyncio.TimeoutError:
+            raise LXDError(f"LXD backup export stalled for {self.timeout}s")
+
+    async def import_backup(self, name: str, blocks, pool: str = None, timeout: int = None):
+        # Creates instance `name` from a backup tarball streamed from `blocks`
+        headers = {"Content-Type": "application/octet-stream", "X-LXD-name": name}
+        if pool:
+            headers["X-LXD-pool"] = pool
+        session = self._get_session()
+        with span("lxd", "POST /1.0/instances (backup)"):
+            try:
+                async with session.post(f"{self.base}/1.0/instances", data=blocks, headers=headers,
+                                        timeout=aiohttp.ClientTimeout(total=None, sock_read=self.timeout)) as resp:
+                    data = await resp.json(content_type=None)
+            except aiohttp.ClientError as e:
+                raise LXDError(f"LXD backup import failed: {e}")
+            except asyncio.TimeoutError:
+                raise LXDError(f"LXD backup import stalled for {self.timeout}s")
+        if data.get("type") == "error":
+            raise LXDError(data.get("error") or "unknown error", data.get("error_code"))
+        return await self.wait(data, timeout)
+
+    # ---- events ---- #
+    async def events(self, types: str = "lifecycle"):
+        # Yields event dicts until the websocket closes; callers reconnect
+        session = self._get_session()
+        try:
+            async with session.ws_connect(f"{self.base}/1.0/events?type={types}", timeout=None,
+                                          receive_timeout=None, heartbeat=30) as ws:
+                async for msg in ws:
+                    if msg.type == aiohttp.WSMsgType.TEXT:
+                        yield msg.json()
+                    elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+        except aiohttp.ClientError as e:
+            raise LXDError(f"LXD event stream failed: {e}")
+
+    # ---- profiles ---- #
+    async def ensure_profile(self, name: str, config: dict, devices: dict):
+        if name in self._profiles:
+            return name
+        async with self._profile_lock:
+            if name in self._profiles:
+                return name
+            try:
+                await self.call("GET", f"/1.0/profiles/{name}")
+            except LXDError as e:
+                if e.code != 404:
+                    raise
+                await self.call("POST", "/1.0/profiles", {
+                    "name": name, "config": config, "devices": devices,
+                    "description": "Managed by the VPS bot",
+                })
+            self._profiles.add(name)
+        return name
+
+
+def image_source(os_type: str, release: str):
+    return {
+        "type": "image", "mode": "pull", "protocol": "simplestreams",
+        "server": IMAGE_SERVER, "alias": f"{os_type}/{release}",
+    }
@@ -0,0 +1,239 @@
+import secrets
+import time
+
+from backend import Backend, BackendError
+from cluster import topology
+from images import ImageCache
+from lxd import LXDError
+from warmpool import POOL_KEY, WarmPool
+
+# Lifecycle actions whose resulting state is known without asking LXD
+EVENT_STATUS = {
+    "instance-started": "RUNNING", "instance-restarted": "RUNNING",
+    "instance-stopped": "STOPPED", "instance-shutdown": "STOPPED", "instance-created": "STOPPED",
+}
+BACKUP_TIMEOUT = 4 * 3600  # longest LXD may take to write or import one backup tarball
+
+
+def nic_device(nic: dict):
+    return {
+        "type": "nic", "network": nic["parent"], "name": "eth0",
+        "ipv4.address": f"{nic['ip']}/{nic['prefixlen']}",
+        "ipv4.gateway": nic["gateway"],
+        "ipv4.dns.addresses": "8.8.8.8,1.1.1.1",
+    }
+
+
+def cpu_pinning(cpuset: str):
+    # limits.cpu takes a count or a set; a lone "3" would mean three CPUs
+    if not cpuset:
+        return {}
+    return {"limits.cpu": cpuset if "," in cpuset or "-" in cpuset else f"{cpuset}-{cpuset}"}
+
+
+# ---------------- LXD backend ---------------- #
+# One LXD daemon driven over its REST API, with a local image cache and a
+# warm pool of stopped spares.
+class LXDBackend(Backend):
+    kind = "lxd"
+
+    def __init__(self, lxd, releases: dict, storage_pool: str = "default", pristine: str = "pristine",
+                 image_refresh_hours: float = 24, pool_targets: dict = None, pool_max: int = 10,
+                 pool_min_free_gb: int = 50):
+        self.lxd = lxd
+        self.storage_pool = storage_pool
+        self.pristine = pristine
+        self.images = ImageCache(lxd, releases, image_refresh_hours)
+        self.pool = WarmPool(lxd, self.images.source, pool_targets or {}, max_total=pool_max,
+                             storage_pool=storage_pool, min_free_gb=pool_min_free_gb)
+
+    async def resources(self):
+        resources = await self.lxd.call("GET", "/1.0/resources")
+        disk_gb = None
+        try:
+            pool = await self.lxd.call("GET", f"/1.0/storage-pools/{self.storage_pool}/resources")
+            disk_gb = pool["space"]["total"] / 1024 ** 3
+        except LXDError as e:
+            print(f"⚠️ Storage pool {self.storage_pool} size unknown: {e}")
+        return topology(resources), resources["memory"]["total"] / 1024 ** 3, disk_gb
+
+    async def tier_profile(self, ram_gb: int, cpu: int, disk_gb: int):
+        # One profile per size tier, e.g. vps-1g-1c-10g; created once, then cached
+        return await self.lxd.ensure_profile(
+            f"vps-{ram_gb}g-{cpu}c-{disk_gb}g",
+            {"limits.memory": f"{ram_gb}GB", "limits.cpu": str(cpu)},
+            {"root": {"type": "disk", "path": "/", "pool": self.storage_pool, "size": f"{disk_gb}GB"}},
+        )
+
+    async def create(self, name: str, os_type: str, disk_gb: int):
+        await self.lxd.create({"name": name, "source": self.images.source(os_type), "profiles": ["default"]})
+
+    async def configure(self, name: str, nic: dict, ram_gb: int, cpu: int, disk_gb: int, cpuset: str = None):
+        profile = await self.tier_profile(ram_gb, cpu, disk_gb)
+        await self.lxd.update(name, {"profiles": ["default", profile], "devices": {"eth0": nic_device(nic)},
+                                     "config": cpu_pinning(cpuset)})
+
+    async def launch(self, name: str, os_type: str, nic: dict, ram_gb: int = 1, cpu: int = 1,
+                     disk_gb: int = 10, cpuset: str = None, resumed: bool = False):
+        profile = await self.tier_profile(ram_gb, cpu, disk_gb)
+        devices = {"eth0": nic_device(nic)}
+        config = cpu_pinning(cpuset)
+        if resumed and await self._finish_launch(name, ["default", profile], devices, config):
+            return
+
+        # Fast path: adopt a pre-created spare (rename, configure, start)
+        pooled = self.pool.take(os_type)
+        if pooled:
+            try:
+                await self.lxd.rename(pooled, name)
+                await self.lxd.update(name, {"profiles": ["default", profile], "devices": devices, "config": config})
+                await self.lxd.change_state(name, "start")
+                return
+            except LXDError as e:
+                print(f"⚠️ Pooled instance {pooled} unusable, launching {name} from the image: {e}")
+                await self.destroy(pooled)
+                await self.destroy(name)
+
+        # The whole instance (limits, root disk, NIC) is defined up front and
+        # created + started in one operation, so there is no half-configured window.
+        await self.lxd.create({
+            "name": name,
+            "source": self.images.source(os_type),
+            "profiles": ["default", profile],
+            "devices": devices,
+            "config": config,
+        }, start=True)
+
+    async def _finish_launch(self, name: str, profiles: list, devices: dict, config: dict):
+        # A restart may have interrupted the pool path between the rename and
+        # the start, leaving a stopped instance with the spare's config; bring
+        # it in line and start it. False when there is no instance yet.
+        try:
+            inst = await self.lxd.instance(name)
+        except LXDError as e:
+            if e.code == 404:
+                return False
+            raise
+        current = inst.get("config") or {}
+        stale = {POOL_KEY: ""} if POOL_KEY in current else {}  # "" unsets the key
+        if (stale or inst.get("profiles") != profiles or (inst.get("devices") or {}).get("eth0") != devices["eth0"]
+                or any(current.get(k) != v for k, v in config.items())):
+            await self.lxd.update(name, {"profiles": profiles, "devices": devices, "config": dict(config, **stale)})
+        if inst["status"].upper() != "RUNNING":
+            await self.lxd.change_state(name, "start")
+        return True
+
+    async def start(self, name: str):
+        await self.lxd.change_state(name, "start")
+
+    async def stop(self, name: str, force: bool = False):
+        await self.lxd.change_state(name, "stop", timeout=30, force=force)
+
+    async def restart(self, name: str):
+        await self.lxd.change_state(name, "restart", timeout=30)
+
+    async def status(self, name: str):
+        return await self.lxd.status(name)
+
+    async def bulk_status(self):
+        # One request for every instance instead of one `lxc info` per lookup
+        instances = await self.lxd.call("GET", "/1.0/instances", params={"recursion": "1"})
+        return {inst["name"]: inst["status"].upper() for inst in instances}
+
+    async def exists(self, name: str):
+        return await self.lxd.exists(name)
+
+    async def exec(self, name: str, command: list, environment: dict = None):
+        return await self.lxd.exec(name, command, environment)
+
+    async def stream(self, name: str, command: list, environment: dict = None):
+        return await self.lxd.exec_stream(name, command, environment)
+
+    async def addresses(self, name: str):
+        state = await self.lxd.state(name)
+        eth0 = (state.get("network") or {}).get("eth0") or {}
+        return [a.get("address") for a in eth0.get("addresses", []) if a.get("family", "inet") == "inet"]
+
+    async def destroy(self, name: str):
+        try:
+            await self.lxd.delete(name, force=True)
+        except LXDError:
+            pass
+
+    async def snapshot(self, name: str, snapshot: str):
+        await self.lxd.snapshot(name, snapshot)
+
+    async def has_snapshot(self, name: str, snapshot: str):
+        return await self.lxd.has_snapshot(name, snapshot)
+
+    async def restore(self, name: str, snapshot: str):
+        if await self.lxd.status(name) == "RUNNING":
+            await self.lxd.change_state(name, "stop", timeout=30, force=True)
+        await self.lxd.restore(name, snapshot)
+        await self.lxd.change_state(name, "start")
+
+    async def backup(self, name: str, writer):
+        # LXD writes the export to its backups directory, from where it is
+        # streamed and deduplicated; the tarball is deleted right after
+        backup = f"vpsbot-{int(time.time())}"
+        await self.lxd.create_backup(name, backup, BACKUP_TIMEOUT)
+        try:
+            await writer.from_tar(self.lxd.export_backup(name, backup))
+        finally:
+            try:
+                await self.lxd.delete_backup(name, backup)
+            except LXDError as e:
+                print(f"⚠️ Backup tarball {backup} of {name} not deleted: {e}")
+
+    async def restore_backup(self, name: str, reader):
+        # Imported next to the instance (config, devices and snapshots come
+        # with it), and only swapped in once the import succeeded
+        # A reserved prefix and a random token, so it can never be someone's VPS
+        staging = f"restore-{secrets.token_hex(4)}"
+        if await self.lxd.exists(staging):
+            raise BackendError(f"Restore staging name {staging} is already taken, try again")
+        try:
+            await self.lxd.import_backup(staging, reader.tar_blocks(), self.storage_pool, BACKUP_TIMEOUT)
+        except BaseException:
+            await self.destroy(staging)
+            raise
+        # From here on the restored copy is the only one left, never delete it
+        await self.destroy(name)
+        try:
+            await self.lxd.rename(staging, name)
+        except LXDError as e:
+            raise BackendError(f"{name} was deleted but the restored copy could not be renamed, "
+                               f"it is kept as {staging}: {e}")
+
+    async def usage(self):
+        # recursion=2 includes every instance's state, one request per sample
+        instances = await self.lxd.call("GET", "/1.0/instances", params={"recursion": "2"})
+        samples = {}
+        for inst in instances:
+            state = inst.get("state") or {}
+            if inst["status"] != "Running":
+                continue
+            net = ((state.get("network") or {}).get("eth0") or {}).get("counters") or {}
+            samples[inst["name"]] = {
+                "cpu": (state.get("cpu") or {}).get("usage", 0),
+                "memory": (state.get("memory") or {}).get("usage", 0),
+                "disk": ((state.get("disk") or {}).get("root") or {}).get("usage", 0),
+                "rx": net.get("bytes_received", 0),
+                "tx": net.get("bytes_sent", 0),
+            }
+        return samples
+
+    async def events(self):
+        async for event in self.lxd.events("lifecycle"):
+            meta = event.get("metadata") or {}
+            source = meta.get("source", "").split("?")[0]
+            if source.startswith("/1.0/instances/"):
+                yield source[len("/1.0/instances/"):].split("/")[0], EVENT_STATUS.get(meta.get("action"))
+        raise BackendError("LXD event stream closed")
+
+    def start_background(self):
+        self.images.start()
+        self.pool.start()
+
+    async def close(self):
+        await self.lxd.close()
@@ -0,0 +1,63 @@
+import bisect
+
+
+# ---------------- Name Index ---------------- #
+# Sorted, lower-cased VPS names, globally and per owner, so autocomplete is
+# a binary search instead of a DB scan. Prefix matches come first, then
+# names merely containing what was typed. Kept current by add/remove on
+# create and delete.
+class NameIndex:
+    def __init__(self):
+        self._all = []  # [(lower name, name)] sorted
+        self._owners = {}  # owner id -> [(lower name, name)] sorted
+        self._owner_of = {}  # name -> owner id
+
+    def __len__(self):
+        return len(self._owner_of)
+
+    def rebuild(self, records):
+        # records: iterable of (name, dict) from the DB
+        self._all, self._owners, self._owner_of = [], {}, {}
+        for name, vps in records:
+            self._owner_of[name] = vps.get("owner_id")
+            self._owners.setdefault(vps.get("owner_id"), []).append((name.lower(), name))
+        self._all = sorted((name.lower(), name) for name in self._owner_of)
+        for entries in self._owners.values():
+            entries.sort()
+        return len(self)
+
+    def add(self, name: str, owner_id: int):
+        if name in self._owner_of:
+            self.remove(name)
+        self._owner_of[name] = owner_id
+        bisect.insort(self._all, (name.lower(), name))
+        bisect.insort(self._owners.setdefault(owner_id, []), (name.lower(), name))
+
+    def remove(self, name: str):
+        if name not in self._owner_of:
+            return
+        owner_id = self._owner_of.pop(name)
+        for entries in (self._all, self._owners.get(owner_id, [])):
+            i = bisect.bisect_left(entries, (name.lower(), name))
+            if i < len(entries) and entries[i][1] == name:
+                del entries[i]
+        if not self._owners.get(owner_id):
+            self._owners.pop(owner_id, None)
+
+    def search(self, typed: str, owner_id: int = None, limit: int = 25):
+        # owner_id=None searches every VPS (admins)
+        entries = self._all if owner_id is None else self._owners.get(owner_id, [])
+        typed = typed.lower()
+        found = []
+        for lower, name in entries[bisect.bisect_left(entries, (typed,)):]:
+            if not lower.startswith(typed) or len(found) >= limit:
+                break
+            found.append(name)
+        if typed and len(found) < limit:
+            seen = set(found)
+            for lower, name in entries:
+                if typed in lower and name not in seen:
+                    found.append(name)
+                    if len(found) >= limit:
+                        break
+        return found
@@ -0,0 +1,53 @@
+import asyncio
+import time
+
+
+class NotReady(Exception):
+    def __init__(self, phase: str, timings: dict):
+        super().__init__(f"Timed out waiting for {phase}")
+        self.phase = phase
+        self.timings = timings
+
+
+# Shell check for "init has finished booting". Non-systemd images pass as
+# soon as exec works; "degraded" still means boot completed.
+INIT_CHECK = [
+    "sh", "-c",
+    "command -v systemctl >/dev/null || exit 0; "
+    "s=$(systemctl is-system-running 2>/dev/null); [ \"$s\" = running ] || [ \"$s\" = degraded ]",
+]
+
+
+# ---------------- Probing ---------------- #
+async def wait_for(probe, deadline: float, initial: float = 0.2, factor: float = 1.5, max_delay: float = 2.0):
+    delay = initial
+    while True:
+        try:
+            if await probe():
+                return True
+        except Exception:
+            pass  # probes fail while the container is still coming up
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        await asyncio.sleep(min(delay, remaining))
+        delay = min(delay * factor, max_delay)
+
+
+async def wait_ready(probes, timeout: float = 120):
+    # probes: ordered [(phase, async () -> bool)], all sharing one deadline
+    timings = {}
+    deadline = time.monotonic() + timeout
+    for phase, probe in probes:
+        start = time.monotonic()
+        ok = await wait_for(probe, deadline)
+        timings[phase] = time.monotonic() - start
+        if not ok:
+            raise NotReady(phase, timings)
+    return timings
+
+
+def format_timings(timings: dict):
+    total = sum(timings.values())
+    parts = " | ".join(f"{p} {t:.1f}s" for p, t in timings.items())
+    return f"{parts} | total {total:.1f}s"
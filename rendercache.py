@@ -0,0 +1,34 @@
+from collections import OrderedDict
+
+
+# ---------------- Render Cache ---------------- #
+# Memoizes rendered output (embeds, list rows) per slot. Each get() passes
+# the version of the data behind the slot, e.g. a tuple of the fields
+# shown; render() only runs when that differs from the cached version.
+# Least recently used slots are dropped past max_entries.
+class RenderCache:
+    def __init__(self, max_entries: int = 4096):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # slot -> (version, value)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, slot, version, render):
+        entry = self._entries.get(slot)
+        if entry is not None and entry[0] == version:
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        value = render()
+        self._entries[slot] = (version, value)
+        self._entries.move_to_end(slot)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def forget(self, slot):
+        self._entries.pop(slot, None)
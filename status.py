@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+
+# ---------------- Status Cache ---------------- #
+# Answers get(name) from one bulk snapshot of every instance's state. The
+# snapshot is refetched when it is older than the TTL or when an entry was
+# invalidated by a lifecycle action; concurrent refreshes share one fetch.
+class StatusCache:
+    def __init__(self, fetch_all, ttl: float = 10):
+        self.fetch_all = fetch_all  # async () -> {name: status}
+        self.ttl = ttl
+        self._statuses = {}
+        self._fetched = 0.0
+        self._stale = set()
+        self._inflight = None
+
+    def _fresh(self, name: str = None):
+        if time.monotonic() - self._fetched > self.ttl:
+            return False
+        return name is None or name not in self._stale
+
+    async def _fetch(self):
+        stale = set(self._stale)
+        try:
+            self._statuses = await self.fetch_all()
+            self._fetched = time.monotonic()
+            self._stale -= stale
+        finally:
+            self._inflight = None
+
+    async def refresh(self):
+        if self._inflight is None:
+            self._inflight = asyncio.ensure_future(self._fetch())
+        await asyncio.shield(self._inflight)
+
+    async def get(self, name: str):
+        if not self._fresh(name):
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"⚠️ Status refresh failed: {e}")
+                return "unknown"
+        return self._statuses.get(name, "unknown")
+
+    async def all(self):
+        if not self._fresh():
+            await self.refresh()
+        return dict(self._statuses)
+
+    def peek(self, name: str):
+        # Last known status without triggering a fetch
+        return self._statuses.get(name, "unknown")
+
+    def set(self, name: str, status: str):
+        self._statuses[name] = status
+        self._stale.discard(name)
+
+    def invalidate(self, name: str = None):
+        if name is None:
+            self._fetched = 0.0
+        else:
+            self._stale.add(name)
@@ -0,0 +1,211 @@
+import contextvars
+import functools
+import inspect
+import json
+import time
+import uuid
+from contextlib import contextmanager
+
+from aiohttp import web
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+MAX_CHILDREN = 50  # child spans kept per log line
+
+_current = contextvars.ContextVar("span", default=None)
+
+
+class Span:
+    def __init__(self, kind: str, name: str, trace_id: str, parent=None, attrs: dict = None):
+        self.kind = kind
+        self.name = name
+        self.trace_id = trace_id
+        self.parent = parent
+        self.attrs = attrs or {}
+        self.start = time.monotonic()
+        self.duration = 0.0
+        self.error = None
+        self.children = []
+
+
+# ---------------- Registry ---------------- #
+# Histograms and error counters keyed by (kind, name), plus gauges that are
+# read from callbacks at scrape time.
+class Registry:
+    def __init__(self):
+        self.histograms = {}  # (kind, name) -> [bucket counts..., sum, count]
+        self.errors = {}
+        self.in_flight = {}
+        self.gauges = []
+
+    def observe(self, kind: str, name: str, seconds: float, error: bool):
+        h = self.histograms.get((kind, name))
+        if h is None:
+            h = self.histograms[(kind, name)] = [0] * len(BUCKETS) + [0.0, 0]
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                h[i] += 1
+        h[-2] += seconds
+        h[-1] += 1
+        if error:
+            self.errors[(kind, name)] = self.errors.get((kind, name), 0) + 1
+
+    def gauge(self, name: str, help_text: str, fn, label: str = None):
+        # fn() -> number, or {label value: number} when label is given
+        self.gauges.append((name, help_text, fn, label))
+
+    def render(self):
+        out = [
+            "# HELP vps_span_seconds Duration of commands, buttons, jobs and backend calls",
+            "# TYPE vps_span_seconds histogram",
+        ]
+        for (kind, name), h in sorted(self.histograms.items()):
+            labels = f'kind="{kind}",name="{name}"'
+            for bound, count in zip(BUCKETS, h):
+                out.append(f'vps_span_seconds_bucket{{{labels},le="{bound}"}} {count}')
+            out.append(f'vps_span_seconds_bucket{{{labels},le="+Inf"}} {h[-1]}')
+            out.append(f"vps_span_seconds_sum{{{labels}}} {h[-2]:.6f}")
+            out.append(f"vps_span_seconds_count{{{labels}}} {h[-1]}")
+        out += ["# HELP vps_span_errors_total Spans that ended with an exception", "# TYPE vps_span_errors_total counter"]
+        for (kind, name), count in sorted(self.errors.items()):
+            out.append(f'vps_span_errors_total{{kind="{kind}",name="{name}"}} {count}')
+        out += ["# HELP vps_spans_in_flight Spans currently open", "# TYPE vps_spans_in_flight gauge"]
+        for kind, count in sorted(self.in_flight.items()):
+            out.append(f'vps_spans_in_flight{{kind="{kind}"}} {count}')
+        for name, help_text, fn, label in self.gauges:
+            out += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+            try:
+                value = fn()
+            except Exception as e:
+                print(f"⚠️ Gauge {name} failed: {e}")
+                continue
+            if label is None:
+                out.append(f"{name} {value}")
+            else:
+                out += [f'{name}{{{label}="{k}"}} {v}' for k, v in sorted(value.items())]
+        return "\n".join(out) + "\n"
+
+
+registry = Registry()
+
+
+def _log(s: Span):
+    record = {
+        "ts": round(time.time(), 3), "trace": s.trace_id, "kind": s.kind, "name": s.name,
+        "ms": round(s.duration * 1000, 1), "status": "error" if s.error else "ok",
+    }
+    if s.error:
+        record["error"] = s.error
+    if s.attrs:
+        record.update(s.attrs)
+    if s.children:
+        record["spans"] = [
+            {"kind": k, "name": n, "ms": round(d * 1000, 1), **({"error": e} if e else {})}
+            for k, n, d, e in s.children
+        ]
+    print(json.dumps(record, ensure_ascii=False, default=str))
+
+
+# ---------------- Spans ---------------- #
+@contextmanager
+def span(kind: str, name: str, trace_id: str = None, **attrs):
+    # Child of the current span when there is one, else a new root that is
+    # logged as one JSON line with its children when it ends
+    parent = _current.get()
+    if trace_id is None:
+        trace_id = parent.trace_id if parent else uuid.uuid4().hex[:16]
+    s = Span(kind, name, trace_id, parent, attrs)
+    token = _current.set(s)
+    registry.in_flight[kind] = registry.in_flight.get(kind, 0) + 1
+    try:
+        yield s
+    except BaseException as e:
+        s.error = str(e) or type(e).__name__
+        raise
+    finally:
+        _current.reset(token)
+        registry.in_flight[kind] -= 1
+        s.duration = time.monotonic() - s.start
+        registry.observe(kind, name, s.duration, s.error is not None)
+        if parent is not None:
+            if len(parent.children) < MAX_CHILDREN:
+                parent.children.append((kind, name, s.duration, s.error))
+            parent.children.extend(s.children[:MAX_CHILDREN - len(parent.children)])
+        else:
+            _log(s)
+
+
+def current_trace():
+    s = _current.get()
+    return s.trace_id if s else None
+
+
+def traced(kind: str, name: str = None):
+    # For slash commands, buttons and modals: the interaction id becomes the
+    # correlation id, so every backend call it makes is logged under it
+    def decorate(fn):
+        label = name or fn.__name__
+
+        @functools.wraps(fn)
+        async def wrapper(*args, **kwargs):
+            interaction = next((a for a in args if hasattr(a, "followup") and hasattr(a, "user")), None)
+            attrs = {}
+            if interaction is not None:
+                attrs["user"] = interaction.user.id
+            trace_id = str(interaction.id) if interaction is not None else None
+            with span(kind, label, trace_id=trace_id, **attrs):
+                return await fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def instrument_discord(http):
+    # Every REST call discord.py makes (sends, edits, followups) becomes a
+    # "discord" span, labelled with the route template rather than the URL
+    original = http.request
+
+    async def request(route, **kwargs):
+        with span("discord", f"{route.method} {route.path}"):
+            return await original(route, **kwargs)
+
+    http.request = request
+
+
+class TracedStore:
+    # Wraps a VPS store so every call shows up as a "db" span
+    def __init__(self, store):
+        self._store = store
+
+    def __getattr__(self, attr):
+        value = getattr(self._store, attr)
+        if not callable(value):
+            return value
+        if inspect.iscoroutinefunction(value):
+            async def call(*args, **kwargs):
+                with span("db", attr):
+                    return await value(*args, **kwargs)
+        else:
+            def call(*args, **kwargs):
+                with span("db", attr):
+                    return value(*args, **kwargs)
+        return call
+
+    def __contains__(self, name):
+        with span("db", "contains"):
+            return name in self._store
+
+    def __len__(self):
+        return len(self._store)
+
+
+# ---------------- Exporter ---------------- #
+async def start_exporter(host: str = "127.0.0.1", port: int = 9108):
+    async def metrics(request):
+        return web.Response(text=registry.render(), content_type="text/plain", charset="utf-8")
+
+    app = web.Application()
+    app.router.add_get("/metrics", metrics)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host, port).start()
+    print(f"✅ Metrics on http://{host}:{port}/metrics")
+    return runner
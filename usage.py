@@ -0,0 +1,137 @@
+import asyncio
+import time
+from array import array
+
+FIELDS = ("cpu", "memory", "disk", "rx", "tx")  # cpu in ns, the rest in bytes
+COUNTERS = ("cpu", "rx", "tx")  # cumulative, reported as per-second rates
+
+
+def percentile(values, pct: float):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def format_bytes(n: float):
+    for unit in ("B", "KB", "MB", "GB"):
+        if abs(n) < 1024:
+            return f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.1f}TB"
+
+
+# ---------------- Ring Buffer ---------------- #
+# Fixed-size time series for one instance: one flat array per field, so
+# memory stays constant no matter how long the bot runs.
+class Ring:
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", [0.0]) * capacity
+        self.values = {field: array("d", [0.0]) * capacity for field in FIELDS}
+        self.head = 0
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, ts: float, sample: dict):
+        self.times[self.head] = ts
+        for field in FIELDS:
+            self.values[field][self.head] = sample.get(field, 0)
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def _indexes(self):
+        start = (self.head - self.count) % self.capacity
+        return [(start + i) % self.capacity for i in range(self.count)]
+
+    def column(self, field: str):
+        values = self.values[field]
+        return [values[i] for i in self._indexes()]
+
+    def rates(self, field: str):
+        # Per-second deltas between consecutive samples; a counter going
+        # backwards means the container restarted, that interval is skipped
+        idx = self._indexes()
+        values = self.values[field]
+        rates = []
+        for prev, cur in zip(idx, idx[1:]):
+            dt = self.times[cur] - self.times[prev]
+            delta = values[cur] - values[prev]
+            if dt > 0 and delta >= 0:
+                rates.append(delta / dt)
+        return rates
+
+    def window(self):
+        if self.count < 2:
+            return 0.0
+        idx = self._indexes()
+        return self.times[idx[-1]] - self.times[idx[0]]
+
+
+# ---------------- Collector ---------------- #
+# Samples every instance in one pass per interval. sample_all returns
+# {name: {"cpu": ns, "memory": bytes, "disk": bytes, "rx": bytes, "tx": bytes}}.
+class MetricsCollector:
+    def __init__(self, sample_all, interval: float = 15, capacity: int = 240):
+        self.sample_all = sample_all
+        self.interval = interval
+        self.capacity = capacity
+        self.rings = {}
+        self._task = None
+
+    async def collect(self):
+        samples = await self.sample_all()
+        now = time.monotonic()
+        for name, sample in samples.items():
+            ring = self.rings.get(name)
+            if ring is None:
+                ring = self.rings[name] = Ring(self.capacity)
+            ring.append(now, sample)
+        for name in set(self.rings) - set(samples):
+            del self.rings[name]  # deleted or stopped
+        return len(samples)
+
+    def _value(self, ring: Ring, field: str):
+        if field in COUNTERS:
+            rates = ring.rates(field)
+            if field == "cpu":
+                rates = [r / 1e7 for r in rates]  # ns/s -> % of one core
+            return rates
+        return ring.column(field)
+
+    def summary(self, name: str):
+        ring = self.rings.get(name)
+        if ring is None or len(ring) == 0:
+            return None
+        result = {"samples": len(ring), "window": ring.window()}
+        for field in FIELDS:
+            values = self._value(ring, field)
+            result[field] = {
+                "now": values[-1] if values else 0.0,
+                "p50": percentile(values, 50),
+                "p95": percentile(values, 95),
+            }
+        return result
+
+    def top(self, field: str, n: int = 10):
+        ranked = []
+        for name, ring in self.rings.items():
+            values = self._value(ring, field)
+            if values:
+                ranked.append((name, values[-1], percentile(values, 95)))
+        ranked.sort(key=lambda row: row[1], reverse=True)
+        return ranked[:n]
+
+    async def _run(self):
+        while True:
+            try:
+                await self.collect()
+            except Exception as e:
+                print(f"⚠️ Metrics sample failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
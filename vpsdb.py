@@ -0,0 +1,274 @@
+import asyncio
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+
+
+# ---------------- VPS Registry ---------------- #
+# Records live in memory; writes mark the registry dirty and a background
+# task coalesces them into a single atomic rewrite of the JSON file.
+class VPSRegistry:
+    def __init__(self, path: str, flush_delay: float = 1.0, watch_interval: float = 2.0):
+        self.path = path
+        self.flush_delay = flush_delay
+        self.watch_interval = watch_interval
+        self._data = {}
+        self._mtime = None
+        self._dirty = False
+        self.version = 0  # bumped whenever the records are (re)loaded from disk
+        self._wake = None
+        self._task = None
+        self._closing = False
+        self.load()
+
+    def _stat_mtime(self):
+        try:
+            return os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def load(self):
+        mtime = self._stat_mtime()
+        if mtime is None:
+            self._data = {}
+        else:
+            with open(self.path, "r") as f:
+                self._data = json.load(f)
+        self._mtime = mtime
+        self._dirty = False
+        self.version += 1
+
+    # ---- reads ---- #
+    def get(self, name: str, default=None):
+        return self._data.get(name, default)
+
+    def __contains__(self, name):
+        return name in self._data
+
+    def __len__(self):
+        return len(self._data)
+
+    def items(self):
+        return list(self._data.items())
+
+    def by_owner(self, owner_id: int):
+        return [n for n, v in self._data.items() if v["owner_id"] == owner_id]
+
+    def by_ip(self, ip: str):
+        for n, v in self._data.items():
+            if v.get("ip") == ip:
+                return n
+        return None
+
+    # ---- writes ---- #
+    def put(self, name: str, record: dict):
+        self._data[name] = record
+        self._mark_dirty()
+
+    def update(self, name: str, **fields):
+        if name not in self._data:
+            return False
+        self._data[name].update(fields)
+        self._mark_dirty()
+        return True
+
+    def pop(self, name: str, default=None):
+        record = self._data.pop(name, default)
+        self._mark_dirty()
+        return record
+
+    def _mark_dirty(self):
+        self._dirty = True
+        if self._wake is not None:
+            self._wake.set()
+
+    # ---- persistence ---- #
+    def _write(self, payload: str):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".vps-db.", dir=directory)
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(payload)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self._mtime = self._stat_mtime()
+
+    def flush(self):
+        if not self._dirty:
+            return
+        self._dirty = False
+        self._write(json.dumps(self._data))
+
+    async def _flush_async(self):
+        # Serialize on the loop so the snapshot is consistent, write off it.
+        self._dirty = False
+        payload = json.dumps(self._data)
+        try:
+            await asyncio.to_thread(self._write, payload)
+        except Exception as e:
+            self._dirty = True
+            print(f"❌ DB flush failed: {e}")
+
+    def _check_external_edit(self):
+        mtime = self._stat_mtime()
+        if mtime == self._mtime:
+            return
+        if self._dirty:
+            # Our pending write wins; it will overwrite the external edit.
+            print("⚠️ DB file changed on disk while writes were pending, keeping in-memory state")
+            return
+        try:
+            self.load()
+            print(f"🔄 Reloaded {len(self._data)} VPS records from {self.path}")
+        except (OSError, ValueError) as e:
+            print(f"❌ DB reload failed: {e}")
+
+    async def _run(self):
+        while not self._closing:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.watch_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._closing:
+                break
+            if self._dirty:
+                await asyncio.sleep(self.flush_delay)  # coalesce bursts of writes
+                await self._flush_async()
+            else:
+                self._check_external_edit()
+
+    def start(self):
+        if self._task is None:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._closing = True
+            self._wake.set()
+            await self._task
+            self._task = None
+        if self._dirty:
+            await self._flush_async()
+
+
+# ---------------- SQLite Store ---------------- #
+# Same surface as VPSRegistry, but owner/IP lookups are index queries.
+# Indexed columns are split out of the record; the rest is stored as JSON.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS vps (
+    name TEXT PRIMARY KEY,
+    owner_id INTEGER NOT NULL,
+    ip TEXT,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS vps_owner_idx ON vps (owner_id);
+CREATE INDEX IF NOT EXISTS vps_ip_idx ON vps (ip);
+"""
+
+
+class SQLiteStore:
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    @property
+    def version(self):
+        # Changes when another connection (e.g. the CLI) commits, not on our own writes
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    # ---- reads ---- #
+    def get(self, name: str, default=None):
+        row = self._conn.execute("SELECT data FROM vps WHERE name = ?", (name,)).fetchone()
+        return json.loads(row[0]) if row else default
+
+    def __contains__(self, name):
+        return self._conn.execute("SELECT 1 FROM vps WHERE name = ?", (name,)).fetchone() is not None
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM vps").fetchone()[0]
+
+    def items(self):
+        return [(n, json.loads(d)) for n, d in self._conn.execute("SELECT name, data FROM vps")]
+
+    def by_owner(self, owner_id: int):
+        rows = self._conn.execute("SELECT name FROM vps WHERE owner_id = ? ORDER BY name", (owner_id,))
+        return [r[0] for r in rows]
+
+    def by_ip(self, ip: str):
+        row = self._conn.execute("SELECT name FROM vps WHERE ip = ?", (ip,)).fetchone()
+        return row[0] if row else None
+
+    # ---- writes ---- #
+    def put(self, name: str, record: dict):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO vps (name, owner_id, ip, data) VALUES (?, ?, ?, ?)",
+            (name, record["owner_id"], record.get("ip"), json.dumps(record))
+        )
+
+    def update(self, name: str, **fields):
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            record = self.get(name)
+            if record is None:
+                return False
+            record.update(fields)
+            self.put(name, record)
+        return True
+
+    def pop(self, name: str, default=None):
+        record = self.get(name, default)
+        self._conn.execute("DELETE FROM vps WHERE name = ?", (name,))
+        return record
+
+    def import_json(self, json_path: str):
+        with open(json_path, "r") as f:
+            records = json.load(f)
+        with self._conn:
+            self._conn.execute("BEGIN IMMEDIATE")
+            for name, record in records.items():
+                self.put(name, record)
+        return len(records)
+
+    # Writes are committed immediately, so these only exist for parity.
+    def start(self):
+        pass
+
+    def flush(self):
+        pass
+
+    async def close(self):
+        self._conn.close()
+
+
+def open_db(path: str, import_from: str = None):
+    if not path.endswith((".db", ".sqlite", ".sqlite3")):
+        return VPSRegistry(path)
+    fresh = not os.path.exists(path)
+    store = SQLiteStore(path)
+    if fresh and import_from and os.path.exists(import_from):
+        count = store.import_json(import_from)
+        print(f"📦 Imported {count} VPS records from {import_from} into {path}")
+    return store
+
+
+if __name__ == "__main__":
+    # One-shot migration: python vpsdb.py /var/lib/vps-db.json /var/lib/vps.db
+    if len(sys.argv) != 3:
+        print(f"Usage: {sys.argv[0]} <vps-db.json> <vps.db>")
+        sys.exit(1)
+    count = SQLiteStore(sys.argv[2]).import_json(sys.argv[1])
+    print(f"✅ Imported {count} VPS records into {sys.argv[2]}")
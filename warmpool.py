@@ -0,0 +1,94 @@
+import asyncio
+import secrets
+
+from lxd import LXDError
+
+POOL_KEY = "user.vps-pool"  # marks pooled instances, value is the OS type
+
+
+# ---------------- Warm Pool ---------------- #
+# Keeps stopped, unconfigured instances per OS type so /create-vps only has
+# to rename, configure and start one. Refills in the background, one build
+# at a time, within a total cap and a storage headroom check.
+class WarmPool:
+    def __init__(self, lxd, source, targets: dict, max_total: int = 10,
+                 storage_pool: str = "default", min_free_gb: int = 50, interval: float = 300):
+        self.lxd = lxd
+        self.source = source  # os_type -> instance "source" dict
+        self.targets = targets
+        self.max_total = max_total
+        self.storage_pool = storage_pool
+        self.min_free_gb = min_free_gb
+        self.interval = interval
+        self._ready = {os_type: [] for os_type in targets}
+        self._wake = asyncio.Event()
+        self._task = None
+
+    def size(self, os_type: str = None):
+        if os_type is not None:
+            return len(self._ready.get(os_type, []))
+        return sum(len(names) for names in self._ready.values())
+
+    async def scan(self):
+        instances = await self.lxd.call("GET", "/1.0/instances", params={"recursion": "1"})
+        for inst in instances:
+            os_type = inst.get("config", {}).get(POOL_KEY)
+            if (os_type in self._ready and inst["name"].startswith("pool-")
+                    and inst["status"] == "Stopped" and inst["name"] not in self._ready[os_type]):
+                self._ready[os_type].append(inst["name"])
+
+    def take(self, os_type: str):
+        names = self._ready.get(os_type)
+        if not names:
+            return None
+        name = names.pop()
+        self._wake.set()
+        return name
+
+    async def _has_headroom(self):
+        if self.size() >= self.max_total:
+            return False
+        try:
+            res = await self.lxd.call("GET", f"/1.0/storage-pools/{self.storage_pool}/resources")
+        except LXDError:
+            return False
+        free_gb = (res["space"]["total"] - res["space"]["used"]) / 1024 ** 3
+        return free_gb >= self.min_free_gb
+
+    async def _build(self, os_type: str):
+        name = f"pool-{os_type}-{secrets.token_hex(3)}"
+        await self.lxd.create({
+            "name": name,
+            "source": self.source(os_type),
+            "profiles": ["default"],
+            "config": {POOL_KEY: os_type},
+        })
+        self._ready[os_type].append(name)
+
+    async def refill(self):
+        for os_type, target in self.targets.items():
+            while self.size(os_type) < target:
+                if not await self._has_headroom():
+                    return
+                try:
+                    await self._build(os_type)
+                except LXDError as e:
+                    print(f"⚠️ Warm pool build for {os_type} failed: {e}")
+                    break
+
+    async def _run(self):
+        try:
+            await self.scan()
+        except LXDError as e:
+            print(f"⚠️ Warm pool scan failed: {e}")
+        while True:
+            await self.refill()
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())